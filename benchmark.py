@@ -0,0 +1,460 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from datetime import datetime
+from types import SimpleNamespace
+import cv2
+import numpy as np
+from fake_camera import FakeVideoCapture
+from metrics import STAGE_LATENCY
+
+# Testy wydajności potoku przechwytywanie -> detekcja -> zapis bez kamery USB i bez produkcyjnej bazy danych.
+#   python benchmark.py --output wyniki.json
+#   python benchmark.py --detector model --variant yolo12s --backend onnx --scenarios single_image,capture_fps
+# Wynik (JSON) zawiera środowisko, konfigurację i wyniki scenariuszy, więc kolejne przebiegi
+# (warianty modelu, backendy, wersje) można porównywać automatycznie.
+
+BENCHMARK_VERSION = 1
+SCENARIOS = ('single_image', 'capture_fps', 'pollers', 'db_insert')
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_IMAGES = [os.path.join(current_dir, "images", "test.jpg"), os.path.join(current_dir, "images", "test2.jpg")]
+BENCHMARK_CAMERA_ID = "benchmark"
+
+
+class FakeModel:
+    """Zastępnik modelu YOLO: stały czas inferencji (partia + obraz) i stałe detekcje (człowiek i pies)."""
+
+    def __init__(self, batch_ms=5.0, image_ms=15.0):
+        self.batch_ms = batch_ms
+        self.image_ms = image_ms
+
+    def _result(self, source):
+        height, width = (source.shape[:2] if isinstance(source, np.ndarray) else (720, 1280))
+        boxes = [
+            SimpleNamespace(cls=np.array([0.0]), conf=np.array([0.87]),
+                            xyxy=np.array([[width * 0.1, height * 0.2, width * 0.3, height * 0.9]])),
+            SimpleNamespace(cls=np.array([16.0]), conf=np.array([0.64]),
+                            xyxy=np.array([[width * 0.5, height * 0.6, width * 0.7, height * 0.9]]))
+        ]
+        return SimpleNamespace(boxes=boxes)
+
+    def predict(self, sources, **kwargs):
+        sources = sources if isinstance(sources, list) else [sources]
+        time.sleep((self.batch_ms + self.image_ms * len(sources)) / 1000.0)
+        return [self._result(source) for source in sources]
+
+
+class FakeModelLoader:
+    """Zastępnik BackgroundModelLoader z FakeModel - gotowy od razu."""
+
+    def __init__(self, model, imgsz=640):
+        self.model = model
+        self.info = {'variant': 'fake', 'backend': 'fake', 'imgsz': imgsz, 'path': None}
+
+    def start(self):
+        pass
+
+    def is_ready(self):
+        return True
+
+    def get(self, timeout=None):
+        return self.model
+
+    def status(self):
+        return {'state': 'ready', 'info': self.info, 'error': None, 'load_seconds': 0.0, 'warmup_seconds': 0.0}
+
+
+class MemoryDetectionWriter:
+    """
+    Zastępnik DetectionWriter w pamięci procesu: przyjmuje detekcje jak prawdziwy writer, ale zamiast
+    zapisu do PostgreSQL liczy wiersze (opcjonalnie z opóźnieniem write_ms na każdą paczkę).
+    """
+
+    def __init__(self, write_ms=0.0):
+        self.write_ms = write_ms
+        self.rows_written = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        pass
+
+    def add(self, obiekt, procent, czas=None, kamera=None):
+        return self.add_many([(obiekt, procent, czas, kamera)]) == 1
+
+    def add_many(self, rows):
+        rows = list(rows)
+        if self.write_ms:
+            time.sleep(self.write_ms / 1000.0)
+        with self._lock:
+            self.rows_written += len(rows)
+            self.batches += 1
+        return len(rows)
+
+    def flush(self, timeout=10.0):
+        return True
+
+    def close(self, timeout=10.0):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {'queue_depth': 0, 'rows_written': self.rows_written, 'batches': self.batches}
+
+
+def latency_summary(samples):
+    """Statystyki czasów (s): liczba, średnia, min, max i percentyle w milisekundach."""
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples) * 1000.0
+    return {
+        'count': len(samples),
+        'mean_ms': float(values.mean()),
+        'min_ms': float(values.min()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max())
+    }
+
+def stage_summaries(stages=('grab', 'decode', 'inference', 'encode', 'write')):
+    """Średnie i kwantyle czasów etapów z histogramów metryk (w milisekundach)."""
+    result = {}
+    for stage in stages:
+        summary = STAGE_LATENCY.summary(stage=stage)
+        if summary is not None:
+            result[stage] = {key: (value * 1000.0 if key != 'count' else value) for key, value in summary.items()}
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=current_dir, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def describe_environment():
+    return {
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__
+    }
+
+def prepare_server(args, workdir):
+    """
+    Importuje serwer z komponentami zastępczymi: model (przy --detector fake), zapis detekcji
+    w pamięci, rejestr kamer z jedną kamerą benchmark w katalogu tymczasowym. Usługi serwera
+    (połączenie z bazą, skanowanie kamer USB) nie są uruchamiane.
+    """
+    # Konfiguracja modelu jest czytana przy imporcie serwera - zmienne środowiskowe mają pierwszeństwo przed model.env
+    os.environ['MODEL_VARIANT'] = args.variant
+    os.environ['MODEL_BACKEND'] = args.backend
+    os.environ['MODEL_IMGSZ'] = str(args.imgsz)
+    import serwer
+    from camera_worker import CameraRegistry
+
+    if args.detector == 'fake':
+        serwer.model_loader = FakeModelLoader(FakeModel(args.fake_batch_ms, args.fake_image_ms), imgsz=args.imgsz)
+    serwer.model_loader.start()
+    serwer.model_loader.get(timeout=serwer.MODEL_LOAD_TIMEOUT)
+    serwer.detection_writer = MemoryDetectionWriter(args.fake_db_write_ms)
+    serwer.services_started = True
+    serwer.inference_scheduler.start()
+
+    config_path = os.path.join(workdir, "cameras.json")
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump({'cameras': [{'id': BENCHMARK_CAMERA_ID, 'port': -1, 'width': args.width, 'height': args.height,
+                                'fps': args.camera_fps, 'interval': 1.0 / args.capture_fps,
+                                # Stały interwał - przepustowość mierzona przy zadanej liczbie zdjęć na sekundę
+                                'min_interval': 1.0 / args.capture_fps, 'max_interval': 1.0 / args.capture_fps,
+                                'motion': {'enabled': not args.no_motion_filter}}]}, f)
+    serwer.camera_registry = CameraRegistry(workdir, serwer.create_camera_worker, config_path=config_path)
+    return serwer
+
+def create_fake_capture(args, moving=True):
+    return FakeVideoCapture(source=args.camera_source, width=args.width, height=args.height, fps=args.camera_fps,
+                            moving=moving)
+
+def run_single_image(server, args):
+    """Opóźnienie detekcji jednego obrazu z pliku (harmonogram inferencji + model + przetworzenie wyników)."""
+    images = args.images or DEFAULT_IMAGES
+    for _ in range(args.warmup):
+        for image in images:
+            server.detect_objects(image)
+    samples = {image: [] for image in images}
+    for _ in range(args.iterations):
+        for image in images:
+            started = time.perf_counter()
+            server.detect_objects(image)
+            samples[image].append(time.perf_counter() - started)
+    all_samples = [sample for image_samples in samples.values() for sample in image_samples]
+    return {
+        'images': {os.path.basename(image): latency_summary(image_samples) for image, image_samples in samples.items()},
+        'latency': latency_summary(all_samples),
+        'images_per_second': len(all_samples) / sum(all_samples) if all_samples else 0.0
+    }
+
+def run_capture_session(server, args, duration):
+    """Sesja kamery benchmark na fałszywej kamerze. Zwraca (worker, liczniki potoku przed sesją)."""
+    worker = server.camera_registry.get(BENCHMARK_CAMERA_ID)
+    before = worker.pipeline.stats()
+    worker.cap = create_fake_capture(args)
+    response, code = worker.turn_on(duration)
+    if code != 200:
+        raise RuntimeError(f"Nie udało się włączyć kamery benchmark: {response}")
+    return worker, before
+
+def run_capture_fps(server, args):
+    """Przepustowość ciągłego przechwytywania: klatki przechwycone, przeanalizowane, zapisane i odrzucone na sekundę."""
+    worker, before = run_capture_session(server, args, args.duration)
+    started = time.monotonic()
+    worker.capture_thread.join(timeout=args.duration + 30)
+    worker.turn_off()
+    worker.pipeline.wait_until_idle(timeout=30)
+    elapsed = time.monotonic() - started
+    after = worker.pipeline.stats()
+    stats = worker.stats()
+    counts = {key: after[key] - before[key] for key in
+              ('frames_submitted', 'frames_dropped', 'frames_analyzed', 'frames_reused', 'frames_persisted')}
+    return {
+        'duration_seconds': elapsed,
+        'target_capture_fps': args.capture_fps,
+        'camera_fps': args.camera_fps,
+        'resolution': f"{args.width}x{args.height}",
+        'frames': counts,
+        'fps': {key.replace('frames_', ''): value / elapsed for key, value in counts.items()},
+        'grabber': stats['grabber'],
+        'motion': stats['motion'],
+        'inference': server.inference_scheduler.stats(),
+        'stages_ms': stage_summaries(),
+        'detections_written': server.detection_writer.stats()['rows_written']
+    }
+
+def seed_photos(worker, count, width, height):
+    """Zapisuje count syntetycznych zdjęć do folderu kamery (dla scenariusza bez aktywnej kamery)."""
+    capture = FakeVideoCapture(width=width, height=height, fps=0)
+    for _ in range(count):
+        _, frame = capture.read()
+        photo_path = worker.photo_index.next_path()
+        cv2.imwrite(photo_path, frame)
+        worker.photo_index.add(photo_path)
+
+def run_pollers(server, args):
+    """
+    Równoległe odpytywanie /cameras/<id>/latest-image-info przez HTTP (serwer werkzeug w wątku),
+    dla każdej liczby klientów z --pollers. Przy --poll-during-capture kamera w tym czasie przechwytuje.
+    """
+    from werkzeug.serving import make_server
+
+    worker = server.camera_registry.get(BENCHMARK_CAMERA_ID)
+    if worker.photo_index.latest()[0] is None:
+        seed_photos(worker, 5, args.width, args.height)
+    http_server = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, name="benchmark-http", daemon=True).start()
+    url = f"http://127.0.0.1:{http_server.server_port}/cameras/{BENCHMARK_CAMERA_ID}/latest-image-info"
+
+    results = {}
+    try:
+        for clients in args.pollers:
+            if args.poll_during_capture:
+                run_capture_session(server, args, args.duration + 5)
+            samples = []
+            errors = [0]
+            lock = threading.Lock()
+            deadline = time.monotonic() + args.duration
+
+            def poll():
+                local_samples = []
+                local_errors = 0
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        with urllib.request.urlopen(url, timeout=30) as response:
+                            response.read()
+                        local_samples.append(time.perf_counter() - started)
+                    except Exception:
+                        local_errors += 1
+                with lock:
+                    samples.extend(local_samples)
+                    errors[0] += local_errors
+
+            threads = [threading.Thread(target=poll, name=f"poller-{i}") for i in range(clients)]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+            if args.poll_during_capture:
+                worker.turn_off()
+            results[str(clients)] = {
+                'clients': clients,
+                'requests': len(samples),
+                'errors': errors[0],
+                'requests_per_second': len(samples) / elapsed,
+                'latency': latency_summary(samples)
+            }
+    finally:
+        http_server.shutdown()
+    return {'url_path': f"/cameras/{BENCHMARK_CAMERA_ID}/latest-image-info",
+            'during_capture': args.poll_during_capture,
+            'detection_cache': server.detection_cache.stats(),
+            'results': results}
+
+def run_db_insert(args):
+    """
+    Szybkość zapisu paczek detekcji (insert_detected_objects) do PostgreSQL z credentials.env.
+
+    Wiersze trafiają do tabeli tymczasowej WYKRYTE_OBIEKTY (z tymi samymi kolumnami i indeksami),
+    która w tej sesji przesłania tabelę produkcyjną - dane produkcyjne nie są zmieniane.
+    """
+    import db_connector
+
+    try:
+        conn = db_connector.get_db_connection()
+    except Exception as e:
+        return {'skipped': f"Brak danych połączenia z PostgreSQL: {e}"}
+    if conn is None:
+        return {'skipped': "Brak połączenia z PostgreSQL"}
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TEMP TABLE WYKRYTE_OBIEKTY
+            (
+                ID SERIAL PRIMARY KEY,
+                OBIEKT VARCHAR(255),
+                PROCENT NUMERIC(5, 2),
+                CZAS TIMESTAMP,
+                KAMERA VARCHAR(64),
+                KLATKA BIGINT,
+                X1 REAL,
+                Y1 REAL,
+                X2 REAL,
+                Y2 REAL
+            );
+            """)
+            cursor.execute(db_connector.DETECTION_INDEXES_QUERY)
+        conn.commit()
+        # Schemat tabeli tymczasowej jest gotowy - bez sprawdzania (i tworzenia) tabeli produkcyjnej
+        db_connector._table_ready = True
+
+        results = {}
+        for batch_size in args.db_batch_sizes:
+            batches = max(1, args.db_rows // batch_size)
+            now = datetime.now()
+            batch = [("Człowiek" if i % 2 else "Pies", 75.5, now, BENCHMARK_CAMERA_ID, i, 10.0, 20.0, 110.0, 220.0)
+                     for i in range(batch_size)]
+            samples = []
+            for _ in range(batches):
+                started = time.perf_counter()
+                if not db_connector.insert_detected_objects(batch, conn):
+                    raise RuntimeError("Zapis paczki detekcji nie powiódł się")
+                samples.append(time.perf_counter() - started)
+            total = sum(samples)
+            results[str(batch_size)] = {
+                'batch_size': batch_size,
+                'batches': batches,
+                'rows': batches * batch_size,
+                'rows_per_second': batches * batch_size / total if total else 0.0,
+                'batch_latency': latency_summary(samples)
+            }
+        return {'results': results}
+    finally:
+        conn.close()
+
+def parse_int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Testy wydajności potoku kamera -> detekcja -> zapis.")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"scenariusze rozdzielone przecinkami: {', '.join(SCENARIOS)}")
+    parser.add_argument('--output', help="plik wynikowy JSON (domyślnie standardowe wyjście)")
+    parser.add_argument('--detector', choices=('fake', 'model'), default='fake',
+                        help="fake: zastępnik modelu o stałym czasie; model: prawdziwy model YOLO")
+    parser.add_argument('--variant', default=os.getenv('MODEL_VARIANT', 'yolo12s'))
+    parser.add_argument('--backend', default=os.getenv('MODEL_BACKEND', 'auto'))
+    parser.add_argument('--imgsz', type=int, default=int(os.getenv('MODEL_IMGSZ', '640')))
+    parser.add_argument('--fake-batch-ms', type=float, default=5.0, help="czas partii zastępczego modelu")
+    parser.add_argument('--fake-image-ms', type=float, default=15.0, help="czas obrazu zastępczego modelu")
+    parser.add_argument('--fake-db-write-ms', type=float, default=0.0, help="opóźnienie zapisu w bazie zastępczej")
+    parser.add_argument('--camera-source', help="plik wideo zamiast obrazu syntetycznego")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--camera-fps', type=float, default=30.0, help="tempo dostarczania klatek przez kamerę")
+    parser.add_argument('--capture-fps', type=float, default=5.0, help="docelowa liczba zdjęć na sekundę")
+    parser.add_argument('--no-motion-filter', action='store_true', help="analiza każdej klatki")
+    parser.add_argument('--duration', type=float, default=10.0, help="czas scenariuszy ciągłych (s)")
+    parser.add_argument('--images', nargs='*', help="obrazy dla single_image (domyślnie images/test*.jpg)")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--pollers', type=parse_int_list, default=[1, 4, 16], help="liczby klientów, np. 1,4,16")
+    parser.add_argument('--poll-during-capture', action='store_true')
+    parser.add_argument('--db-rows', type=int, default=20000)
+    parser.add_argument('--db-batch-sizes', type=parse_int_list, default=[1, 100, 500, 2000])
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Nieznane scenariusze: {', '.join(sorted(unknown))}")
+
+    report = {
+        'benchmark_version': BENCHMARK_VERSION,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': describe_environment(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output',)},
+        'scenarios': {}
+    }
+    server = None
+    with tempfile.TemporaryDirectory(prefix="iot-benchmark-") as workdir:
+        try:
+            if any(name != 'db_insert' for name in scenarios):
+                server = prepare_server(args, workdir)
+                report['model'] = server.model_loader.status()['info']
+            for name in scenarios:
+                print(f"Scenariusz {name}...", file=sys.stderr)
+                started = time.monotonic()
+                try:
+                    if name == 'single_image':
+                        result = run_single_image(server, args)
+                    elif name == 'capture_fps':
+                        result = run_capture_fps(server, args)
+                    elif name == 'pollers':
+                        result = run_pollers(server, args)
+                    else:
+                        result = run_db_insert(args)
+                except Exception as e:
+                    result = {'error': f"{type(e).__name__}: {e}"}
+                result['wall_seconds'] = time.monotonic() - started
+                report['scenarios'][name] = result
+        finally:
+            if server is not None:
+                server.camera_registry.shutdown()
+                server.inference_scheduler.stop()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f"Zapisano wyniki do {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import cv2
+import glob
+import platform
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rozdzielczości sprawdzane przy badaniu możliwości kamery (kamera zwraca najbliższą obsługiwaną)
+PROBE_RESOLUTIONS = ((640, 480), (1280, 720), (1920, 1080))
+
+def video_device_ports():
+    """
+    Porty kamer do sprawdzenia: numery węzłów /dev/videoN (Linux) lub indeksy 0-9 (Windows i inne systemy).
+    """
+    if platform.system() != "Linux":
+        return list(range(10))
+    ports = []
+    for device_path in glob.glob('/dev/video*'):
+        try:
+            ports.append(int(device_path.replace('/dev/video', '')))
+        except ValueError:
+            logger.warning(f"Nie można przetworzyć {device_path} jako portu kamery.")
+    return sorted(ports)
+
+def open_video_capture(port):
+    """Otwiera urządzenie kamery odpowiednim backendem systemu (bez zmiany ustawień)."""
+    if platform.system() == "Windows":
+        return cv2.VideoCapture(port, cv2.CAP_DSHOW)
+    return cv2.VideoCapture(port)
+
+def probe_camera(port, resolutions=PROBE_RESOLUTIONS):
+    """
+    Sprawdza, czy na porcie działa kamera, i odczytuje jej możliwości: ustawienia domyślne oraz
+    rozdzielczość i FPS, które kamera przyjmuje dla każdej z resolutions (tak jak open_camera_with_settings).
+
+    Zwraca słownik możliwości albo None, gdy urządzenie nie jest działającą kamerą.
+    """
+    cap = None
+    try:
+        cap = open_video_capture(port)
+        if not cap.isOpened():
+            return None
+        default_mode = {
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': cap.get(cv2.CAP_PROP_FPS)
+        }
+        modes = []
+        for width, height in resolutions:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            mode = {
+                'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'fps': cap.get(cv2.CAP_PROP_FPS)
+            }
+            if mode['width'] and mode['height'] and mode not in modes:
+                modes.append(mode)
+        return {
+            'port': port,
+            'backend': cap.getBackendName(),
+            'default': default_mode,
+            'resolutions': modes
+        }
+    except Exception as e:
+        logger.error(f"Błąd podczas sprawdzania kamery na porcie {port}: {e}")
+        return None
+    finally:
+        if cap is not None:
+            cap.release()
+
+def scan_usb_for_cameras():
+    """Skanuje porty USB w poszukiwaniu podłączonych kamer. Zwraca listę portów działających kamer."""
+    system = platform.system()
+    found_cameras = []
+    
+    if system == "Windows":
+        logger.debug("Skanowanie kamer (Windows)...")
+        for i in range(10):
+            cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
+            if cap.isOpened():
+                logger.debug(f"Znaleziono kamerę na porcie {i}")
+                found_cameras.append(i)
+                cap.release()
+            else:
+                cap.release()
+    elif system == "Linux":
+        logger.debug("Skanowanie kamer (Linux)...")
+        devices = glob.glob('/dev/video*')
+        for device_path in devices:
+            try:
+                port_num = int(device_path.replace('/dev/video', ''))
+                cap = cv2.VideoCapture(port_num)
+                if cap.isOpened():
+                    logger.debug(f"Znaleziono kamerę na urządzeniu {device_path} (port {port_num})")
+                    found_cameras.append(port_num)
+                    cap.release()
+                else:
+                    cap.release()
+            except ValueError:
+                logger.warning(f"Nie można przetworzyć {device_path} jako portu kamery.")
+            except Exception as e:
+                logger.error(f"Błąd podczas sprawdzania kamery {device_path}: {e}")
+                if 'cap' in locals() and cap.isOpened():
+                    cap.release()
+    
+    if found_cameras:
+        found_cameras.sort()
+        logger.info(f"Lista znalezionych działających kamer: {found_cameras}")
+    else:
+        logger.warning("Nie znaleziono żadnej działającej kamery.")
+    return found_cameras
+
+def scan_usb_for_camera():
+    """Skanuje porty USB w poszukiwaniu podłączonej kamery. Zwraca port pierwszej znalezionej lub None."""
+    found_cameras = scan_usb_for_cameras()
+    return found_cameras[0] if found_cameras else None
+
+def open_camera_with_settings(port, width=1280, height=720, fps=30):
+    """Otwiera kamerę z określonymi ustawieniami."""
+    cap = None
+    try:
+        cap = open_video_capture(port)
+
+        if not cap.isOpened():
+            logger.warning(f"Nie można otworzyć kamery na porcie {port}.")
+            return None
+
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        cap.set(cv2.CAP_PROP_FPS, fps)
+        
+        actual_width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+        actual_height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        actual_fps = cap.get(cv2.CAP_PROP_FPS)
+        logger.info(f"Kamera otwarta na porcie {port}. Ustawienia: {width}x{height} @ {fps} FPS.")
+        logger.debug(f"Rzeczywiste ustawienia: {actual_width}x{actual_height} @ {actual_fps} FPS.")
+
+        if actual_width == 0 or actual_height == 0:
+            logger.warning(f"Kamera na porcie {port} może nie wspierać zmiany rozdzielczości/FPS lub zwróciła nieprawidłowe wartości.")
+
+        return cap
+    except Exception as e:
+        logger.exception(f"Błąd podczas otwierania lub konfigurowania kamery na porcie {port}: {e}")
+        if cap is not None:
+            cap.release()
+        return None
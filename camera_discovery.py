@@ -0,0 +1,319 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import platform
+import threading
+import logging
+from datetime import datetime
+from camera_devices import probe_camera, video_device_ports
+
+logger = logging.getLogger(__name__)
+
+# Zdarzenia inotify dla węzłów w /dev (linux/inotify.h)
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _DeviceNodeWatcher:
+    """Obserwuje katalog (np. /dev) przez inotify i zwraca nazwy tworzonych, usuwanych i zmienianych plików."""
+
+    def __init__(self, fd, path):
+        self.fd = fd
+        self.path = path
+
+    @classmethod
+    def create(cls, path='/dev'):
+        """Zwraca obserwatora albo None, gdy inotify jest niedostępne (inny system, brak uprawnień, limit)."""
+        if platform.system() != "Linux":
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+            mask = IN_CREATE | IN_DELETE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO
+            if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+                error = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(error, os.strerror(error))
+            return cls(fd, path)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Nie można obserwować {path} przez inotify ({e}).")
+            return None
+
+    def read(self, timeout):
+        """
+        Czeka najwyżej timeout sekund na zdarzenia. Zwraca listę nazw plików, których dotyczą;
+        None w liście oznacza przepełnienie kolejki zdarzeń (zmiany mogły zostać pominięte).
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        names = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].split(b'\0', 1)[0]
+            offset += length
+            names.append(None if mask & IN_Q_OVERFLOW else os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class CameraDiscovery:
+    """
+    Wykrywanie kamer z pamięcią wyników i odświeżaniem przyrostowym.
+
+    Urządzenia są sprawdzane równolegle (każde we własnym wątku), a na wynik czekamy najwyżej
+    probe_timeout sekund - zawieszone urządzenie nie blokuje wykrywania pozostałych i nie jest
+    sprawdzane ponownie, dopóki poprzednia próba się nie zakończy. Wyniki (z możliwościami kamery:
+    backend, ustawienia domyślne, obsługiwane rozdzielczości i FPS) są pamiętane, więc zapytania
+    korzystają z nich bez otwierania urządzeń.
+
+    Na Linuksie każdy węzeł /dev/videoN jest identyfikowany przez numer urządzenia i czas zmiany
+    węzła: odświeżenie sprawdza tylko nowe i zmienione węzły, a usunięte wykreśla. Po start() wątek
+    w tle obserwuje /dev przez inotify (bez inotify - odświeża co poll_interval sekund) i odświeża
+    wyniki settle_delay sekund po ostatniej zmianie węzłów video (udev ustawia uprawnienia po
+    utworzeniu węzła). Na innych systemach wyniki są odświeżane tylko przez refresh().
+
+    Słuchacze (add_listener) dostają listy portów, które stały się dostępne i przestały być dostępne.
+    Porty zwracane przez busy_ports (kamery w trakcie sesji) nie są sprawdzane ponownie.
+    """
+
+    def __init__(self, probe=probe_camera, list_ports=video_device_ports, busy_ports=None, probe_timeout=5.0,
+                 poll_interval=30.0, settle_delay=1.0):
+        self.probe = probe
+        self.list_ports = list_ports
+        self.busy_ports = busy_ports
+        self.probe_timeout = probe_timeout
+        self.poll_interval = poll_interval
+        self.settle_delay = settle_delay
+        self._devices = {}
+        self._identities = {}
+        self._probing = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._async_refresh = None
+        self.watch_mode = None
+        self.refreshes = 0
+        self.probes = 0
+        self.probe_timeouts = 0
+        self.last_refresh_seconds = None
+        self.last_refresh_at = None
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    @staticmethod
+    def _device_path(port):
+        return f"/dev/video{port}" if platform.system() == "Linux" else None
+
+    def _identity(self, port):
+        """Identyfikator węzła urządzenia - zmienia się, gdy pod tym numerem pojawi się inne urządzenie."""
+        device_path = self._device_path(port)
+        if device_path is None:
+            return None
+        try:
+            stat = os.stat(device_path)
+        except OSError:
+            return None
+        return stat.st_rdev, stat.st_ctime_ns
+
+    def _probe_one(self, port, results):
+        started = time.monotonic()
+        try:
+            capabilities = self.probe(port)
+            error = None
+        except Exception as e:
+            capabilities, error = None, str(e)
+        with self._lock:
+            results[port] = (capabilities, error, time.monotonic() - started)
+            self._probing.discard(port)
+
+    def _probe_ports(self, ports):
+        """Sprawdza porty równolegle. Zwraca {port: (możliwości lub None, błąd, czas)} - bez portów po przekroczeniu czasu."""
+        results = {}
+        threads = []
+        for port in ports:
+            with self._lock:
+                if port in self._probing:
+                    logger.warning(f"Poprzednie sprawdzanie kamery na porcie {port} jeszcze trwa - pominięto.")
+                    continue
+                self._probing.add(port)
+            thread = threading.Thread(target=self._probe_one, args=(port, results), name=f"camera-probe-{port}",
+                                      daemon=True)
+            thread.start()
+            threads.append((port, thread))
+            self.probes += 1
+        deadline = time.monotonic() + self.probe_timeout
+        for port, thread in threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            finished = dict(results)
+        for port, _ in threads:
+            if port not in finished:
+                self.probe_timeouts += 1
+                logger.warning(f"Sprawdzanie kamery na porcie {port} przekroczyło {self.probe_timeout}s.")
+        return finished
+
+    def refresh(self, full=False):
+        """
+        Odświeża wyniki: sprawdza nowe i zmienione urządzenia (przy full=True - wszystkie poza zajętymi)
+        i usuwa te, których już nie ma. Zwraca posortowaną listę portów działających kamer.
+        """
+        with self._refresh_lock:
+            started = time.monotonic()
+            busy = set(self.busy_ports()) if self.busy_ports is not None else set()
+            ports = set(self.list_ports())
+            with self._lock:
+                previous = {port for port, device in self._devices.items() if device['available']}
+                for port in set(self._devices) - ports - busy:
+                    del self._devices[port]
+                    self._identities.pop(port, None)
+                identities = {port: self._identity(port) for port in ports}
+                to_probe = sorted(port for port in ports - busy
+                                  if full or identities[port] is None or self._identities.get(port) != identities[port])
+
+            results = self._probe_ports(to_probe)
+            now = datetime.now().isoformat(timespec='seconds')
+            with self._lock:
+                for port in to_probe:
+                    if port in results:
+                        capabilities, error, probe_seconds = results[port]
+                        # Identyfikator jest zapamiętywany tylko dla zakończonych prób - po przekroczeniu czasu port jest sprawdzany ponownie
+                        self._identities[port] = identities[port]
+                    else:
+                        capabilities, error, probe_seconds = None, 'timeout', None
+                        self._identities.pop(port, None)
+                    self._devices[port] = {
+                        'port': port,
+                        'device': self._device_path(port),
+                        'available': capabilities is not None,
+                        'capabilities': capabilities,
+                        'error': error,
+                        'probe_seconds': probe_seconds,
+                        'probed_at': now
+                    }
+                current = {port for port, device in self._devices.items() if device['available']}
+                listeners = list(self._listeners)
+            self.refreshes += 1
+            self.last_refresh_seconds = time.monotonic() - started
+            self.last_refresh_at = now
+
+        added, removed = sorted(current - previous), sorted(previous - current)
+        if added or removed:
+            logger.info(f"Zmiana kamer: dostępne {sorted(current)}, nowe {added}, odłączone {removed} "
+                        f"(sprawdzono {len(to_probe)} urządzeń w {self.last_refresh_seconds:.2f}s)")
+            for listener in listeners:
+                try:
+                    listener(added, removed)
+                except Exception:
+                    logger.exception("Błąd słuchacza zmian kamer")
+        return sorted(current)
+
+    def refresh_async(self):
+        """Odświeża wyniki w tle (bez czekania), jeśli odświeżanie w tle jeszcze nie trwa."""
+        with self._lock:
+            if self._async_refresh is not None and self._async_refresh.is_alive():
+                return
+            self._async_refresh = threading.Thread(target=self._safe_refresh, name="camera-discovery-refresh",
+                                                   daemon=True)
+            self._async_refresh.start()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.exception(f"Błąd podczas wykrywania kamer: {e}")
+
+    def cameras(self):
+        """Porty działających kamer według ostatnich wyników (bez sprawdzania urządzeń)."""
+        with self._lock:
+            return sorted(port for port, device in self._devices.items() if device['available'])
+
+    def devices(self):
+        """Ostatnie wyniki sprawdzenia wszystkich urządzeń, z możliwościami kamer."""
+        with self._lock:
+            return {port: dict(device) for port, device in sorted(self._devices.items())}
+
+    def start(self):
+        """Uruchamia obserwowanie podłączania i odłączania kamer w tle (tylko Linux)."""
+        if platform.system() != "Linux":
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="camera-discovery", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        watcher = _DeviceNodeWatcher.create('/dev')
+        if watcher is None:
+            self.watch_mode = 'poll'
+            logger.info(f"Wykrywanie kamer: odświeżanie co {self.poll_interval}s.")
+            while not self._stop_event.wait(self.poll_interval):
+                self._safe_refresh()
+            return
+
+        self.watch_mode = 'inotify'
+        logger.info("Wykrywanie kamer: obserwowanie /dev (inotify).")
+        try:
+            changed_at = None
+            while not self._stop_event.is_set():
+                names = watcher.read(timeout=0.5)
+                if any(name is None or name.startswith('video') for name in names):
+                    changed_at = time.monotonic()
+                if changed_at is not None and time.monotonic() - changed_at >= self.settle_delay:
+                    changed_at = None
+                    self._safe_refresh()
+        except Exception as e:
+            logger.exception(f"Błąd obserwowania /dev - wykrywanie kamer przełączone na odświeżanie okresowe: {e}")
+            self.watch_mode = 'poll'
+            while not self._stop_event.wait(self.poll_interval):
+                self._safe_refresh()
+        finally:
+            watcher.close()
+
+    def stats(self):
+        with self._lock:
+            available = sum(1 for device in self._devices.values() if device['available'])
+            probing = len(self._probing)
+        return {
+            'watch_mode': self.watch_mode,
+            'cameras': available,
+            'devices': self.devices(),
+            'probing': probing,
+            'refreshes': self.refreshes,
+            'probes': self.probes,
+            'probe_timeouts': self.probe_timeouts,
+            'last_refresh_seconds': self.last_refresh_seconds,
+            'last_refresh_at': self.last_refresh_at
+        }
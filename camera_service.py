@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+import logging
+from multiprocessing.managers import BaseManager
+
+logger = logging.getLogger(__name__)
+
+# Jak długo jedno zapytanie o zdarzenia czeka na właściciela kamer (long polling)
+EVENT_POLL_TIMEOUT = 10.0
+
+
+class CameraServiceUnavailable(Exception):
+    """Proces właściciela kamer i modelu jest niedostępny."""
+
+
+class _OwnerManager(BaseManager):
+    pass
+
+
+class _ClientManager(BaseManager):
+    pass
+
+
+_ClientManager.register('camera_service')
+
+def load_camera_service_address():
+    """
+    Adres i klucz kanału IPC między procesami HTTP a procesem właściciela kamer.
+
+    - CAMERA_SERVICE_HOST, CAMERA_SERVICE_PORT: adres (domyślnie 127.0.0.1:50555)
+    - CAMERA_SERVICE_AUTHKEY: klucz uwierzytelniający połączenia (wymagany, ten sam w obu procesach)
+
+    Menedżer multiprocessing przesyła obiekty jako pickle, więc znajomość klucza pozwala wykonać kod
+    w procesie właściciela - bez ustawionego klucza procesy nie startują (RuntimeError).
+    """
+    host = os.getenv('CAMERA_SERVICE_HOST', '127.0.0.1')
+    port = int(os.getenv('CAMERA_SERVICE_PORT', '50555'))
+    authkey = os.getenv('CAMERA_SERVICE_AUTHKEY')
+    if not authkey:
+        raise RuntimeError("Brak CAMERA_SERVICE_AUTHKEY - ustaw losowy klucz kanału IPC w procesie właściciela "
+                           "i w procesach HTTP (np. python -c \"import secrets; print(secrets.token_hex(32))\").")
+    return (host, port), authkey.encode('utf-8')
+
+def serve_camera_service(service, address, authkey):
+    """Udostępnia obiekt usługi procesom HTTP przez menedżer multiprocessing (blokuje do zakończenia procesu)."""
+    _OwnerManager.register('camera_service', callable=lambda: service)
+    manager = _OwnerManager(address=address, authkey=authkey)
+    server = manager.get_server()
+    logger.info(f"Usługa kamer nasłuchuje na {address[0]}:{address[1]}")
+    server.serve_forever()
+
+
+class CameraServiceClient:
+    """
+    Klient usługi kamer w procesie HTTP.
+
+    Połączenie jest nawiązywane przy pierwszym wywołaniu i odtwarzane po restarcie właściciela.
+    Gdy właściciel jest niedostępny, call() zgłasza CameraServiceUnavailable.
+    """
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self._service = None
+        self._lock = threading.Lock()
+
+    def _get_service(self):
+        with self._lock:
+            if self._service is None:
+                manager = _ClientManager(address=self.address, authkey=self.authkey)
+                manager.connect()
+                self._service = manager.camera_service()
+            return self._service
+
+    def call(self, method, *args, **kwargs):
+        try:
+            service = self._get_service()
+            return getattr(service, method)(*args, **kwargs)
+        except (ConnectionError, EOFError, OSError) as e:
+            with self._lock:
+                self._service = None
+            raise CameraServiceUnavailable(f"Usługa kamer niedostępna: {e}") from e
+
+
+class EventRelay:
+    """
+    Przekazuje zdarzenia z procesu właściciela do lokalnej szyny zdarzeń procesu HTTP.
+
+    Jeden wątek na proces odpytuje właściciela (events_since), więc liczba połączeń SSE
+    nie zwiększa liczby zapytań IPC.
+    """
+
+    def __init__(self, client, event_bus, retry_interval=2.0):
+        self.client = client
+        self.event_bus = event_bus
+        self.retry_interval = retry_interval
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="event-relay", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        last_seq = None
+        while True:
+            try:
+                if last_seq is None:
+                    # Zdarzenia sprzed podłączenia nie są odtwarzane - aktualny stan wysyła /events przy połączeniu
+                    last_seq, _ = self.client.call('events_since', 0, 0)
+                    continue
+                seq, events = self.client.call('events_since', last_seq, EVENT_POLL_TIMEOUT)
+            except CameraServiceUnavailable:
+                last_seq = None
+                time.sleep(self.retry_interval)
+                continue
+            if seq < last_seq:
+                # Właściciel został uruchomiony ponownie - numeracja zaczyna się od nowa
+                last_seq = None
+                continue
+            for event_seq, event_type, data in events:
+                self.event_bus.publish(event_type, data)
+            last_seq = seq
@@ -0,0 +1,577 @@
+import os
+import json
+import time
+import threading
+import logging
+from datetime import datetime
+from detection_cache import DetectionCache
+from capture_pipeline import CapturePipeline
+from photo_index import PhotoIndex, photo_number
+from session_detections import SessionDetections
+from capture_interval import AdaptiveCaptureInterval
+from frame_buffer import LatestFrameBuffer
+from frame_grabber import FrameGrabber
+from camera_devices import scan_usb_for_cameras, open_camera_with_settings
+from metrics import DETECTIONS, FRAMES
+
+logger = logging.getLogger(__name__)
+
+# Klatka starsza niż tyle sekund oznacza, że kamera przestała dostarczać obraz
+CAPTURE_MAX_FRAME_AGE = 2.0
+
+
+class CameraWorker:
+    """
+    Jedna kamera z niezależną sesją przechwytywania.
+
+    Każda kamera ma własny wątek przechwytywania, sesję wykrytych obiektów, interwał, folder ze zdjęciami,
+    indeks zdjęć, bufor najnowszej klatki i potok inferencji. Interwał zdjęć zmienia się w trakcie sesji
+    między min_interval a max_interval zależnie od aktywności w scenie (AdaptiveCaptureInterval). Współdzielone są tylko model (przez detect_fn),
+    cache detekcji, kolejka zapisu do bazy danych i szyna zdarzeń.
+
+    Metody obsługujące komendy zwracają (słownik odpowiedzi, kod HTTP), gotowe do przekazania do jsonify.
+    """
+
+    def __init__(self, camera_id, port, folder, detect_fn, detection_cache, detection_writer, event_bus,
+                 interval=3, width=1280, height=720, fps=30, shard_by_date=False,
+                 motion_detector=None, save_static_frames=False, max_decode_fps=10.0,
+                 min_interval=None, max_interval=None, roi=None):
+        self.camera_id = camera_id
+        self.port = port
+        self.folder = folder
+        self.detect_fn = detect_fn
+        self.detection_cache = detection_cache
+        self.detection_writer = detection_writer
+        self.event_bus = event_bus
+        self.interval = interval
+        # Zakres interwału adaptacyjnego (bez zakresu interwał jest stały, z jedną granicą - drugą jest interval)
+        self.min_interval = min_interval if min_interval is not None else min(interval, max_interval or interval)
+        self.max_interval = max_interval if max_interval is not None else max(interval, self.min_interval)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        # Filtr ruchu: klatki bez ruchu nie trafiają do modelu (i bez save_static_frames nie są zapisywane)
+        self.motion_detector = motion_detector
+        self.save_static_frames = save_static_frames
+        # Obszar zainteresowania (RegionOfInterest) - model analizuje tylko wycinki klatki z tym obszarem
+        self.roi = roi
+
+        self.cap = None
+        # Wątek pobierający klatki z kamery w tempie urządzenia - jedyny użytkownik self.cap w trakcie sesji
+        self.grabber = None
+        self.max_decode_fps = max_decode_fps
+        self.capture_active = False
+        self.capture_end_time = None
+        self.capture_thread = None
+        self.capture_interval = None
+        # Przerywa oczekiwanie pętli przechwytywania na kolejne zdjęcie (komenda OFF)
+        self.capture_stop_event = threading.Event()
+        # Chroni tylko flagi stanu (krótkie sekcje krytyczne) - odczytywana przy każdym zapytaniu o status
+        self.state_lock = threading.Lock()
+        # Szereguje komendy ON/OFF; może być trzymana długo (otwieranie kamery, czekanie na wątek)
+        self.control_lock = threading.Lock()
+
+        # Wszystkie detekcje bieżącej sesji (z numerem klatki i ramką), zapisywane do bazy na bieżąco
+        self.session_detections = SessionDetections()
+
+        self.photo_index = PhotoIndex(folder, shard_by_date=shard_by_date)
+        self.frame_buffer = LatestFrameBuffer()
+        self.pipeline = CapturePipeline(self._analyze_captured_frame, on_persisted=self._on_frame_persisted,
+                                        on_written=self._on_frame_written, name=camera_id)
+        self.web_analysis_lock = threading.Lock()
+        self.last_published_detection_info = None
+
+    # Zdjęcia
+    def get_latest_photo_details(self):
+        """Zwraca ścieżkę względem folderu kamer, czas modyfikacji i pełną ścieżkę najnowszego zdjęcia lub (None, None, None)."""
+        relative_path, mtime, full_path = self.photo_index.latest()
+        if relative_path is None:
+            return None, None, None
+        return self.photo_url_path(relative_path), mtime, full_path
+
+    def photo_url_path(self, relative_path):
+        """Zamienia ścieżkę zdjęcia względem folderu kamery na ścieżkę dla trasy /kamera/<path>."""
+        return f"{os.path.basename(self.folder)}/{relative_path}"
+
+    # Analiza i sesja
+    def update_session_detections(self, current_detections, captured_at=None, frame_id=None):
+        """
+        Dopisuje detekcje przeanalizowanej klatki do sesji i od razu przekazuje je do kolejki zapisu.
+
+        captured_at to czas przechwycenia klatki (datetime), a frame_id numer zdjęcia, pod którym klatka
+        jest zapisywana - wiersze w bazie wskazują wtedy zdjęcie niezależnie od opóźnienia analizy.
+        """
+        self.session_detections.add_frame(current_detections,
+                                          timestamp=captured_at.timestamp() if captured_at is not None else None,
+                                          frame_id=frame_id)
+        for obiekt, _, _ in current_detections:
+            DETECTIONS.inc(camera=self.camera_id, object=obiekt)
+        self.flush_session_detections()
+
+    def flush_session_detections(self):
+        """Przekazuje do kolejki zapisu detekcje sesji, które jeszcze do niej nie trafiły. Zwraca ich liczbę."""
+        rows = self.session_detections.take_unflushed()
+        if rows:
+            self.detection_writer.add_many([(obiekt, procent, czas, self.camera_id, klatka, x1, y1, x2, y2)
+                                            for obiekt, procent, czas, klatka, x1, y1, x2, y2 in rows])
+        return len(rows)
+
+    def analyze(self, source, record_session=True, captured_at=None, frame_id=None):
+        """Uruchamia detekcję na pliku lub klatce i (przy record_session) dopisuje detekcje do sesji tej kamery."""
+        analysis = self.detect_fn(source, roi=self.roi) if self.roi is not None else self.detect_fn(source)
+        if record_session:
+            self.update_session_detections(analysis['detections'], captured_at, frame_id)
+        return analysis
+
+    def analyze_image_for_web(self, image_path):
+        """
+        Analizuje obraz za pomocą YOLO i zwraca opis wykrytych obiektów.
+
+        Wynik jest zapamiętywany w cache detekcji, więc ponowne zapytanie o to samo (niezmienione) zdjęcie
+        zwraca zapisane podsumowanie bez uruchamiania modelu.
+        """
+        if not image_path or not os.path.exists(image_path):
+            return "Brak obrazu do analizy."
+
+        cache_key = DetectionCache.make_key(image_path)
+        cached_summary = self.detection_cache.get(cache_key)
+        if cached_summary is not None:
+            return cached_summary
+
+        try:
+            with self.web_analysis_lock:
+                # Inny wątek mógł przeanalizować to zdjęcie, gdy czekaliśmy na blokadę
+                cached_summary = self.detection_cache.get(cache_key, record_stats=False)
+                if cached_summary is not None:
+                    return cached_summary
+
+                # Zapisane wcześniej zdjęcie nie jest nową klatką sesji - jego detekcje nie trafiają do bazy ponownie
+                summary = self.analyze(image_path, record_session=False)['summary']
+                self.detection_cache.put(cache_key, summary)
+                return summary
+
+        except Exception as e:
+            logger.exception(f"Błąd podczas analizy obrazu {image_path}: {e}")
+            return "Błąd analizy obrazu."
+
+    def _analyze_captured_frame(self, record):
+        started = time.monotonic()
+        frame_id = photo_number(record['photo_path'])
+        analysis = self.analyze(record['frame'], captured_at=record['captured_at'],
+                                frame_id=frame_id if frame_id is not None else record['frame_id'])
+        capture_interval = self.capture_interval
+        if capture_interval is not None:
+            capture_interval.record_analysis(time.monotonic() - started, len(analysis['detections']))
+        return analysis
+
+    def _on_frame_persisted(self, record, file_key):
+        # Wynik analizy zapisanej klatki trafia do cache, zanim plik będzie widoczny
+        if record['analysis'] is not None:
+            self.detection_cache.put(file_key, record['analysis']['summary'])
+
+    def _on_frame_written(self, record, file_key):
+        # Dodanie zdjęcia do indeksu i powiadomienie przeglądarek o nowym zdjęciu i zmianie detekcji
+        _, mtime_ns, size = file_key
+        has_detections = record['analysis'] is not None and bool(record['analysis']['detections'])
+        self.photo_index.add(record['photo_path'], mtime=mtime_ns / 1e9, size=size, has_detections=has_detections)
+
+        relative_path = os.path.relpath(record['photo_path'], self.folder).replace(os.sep, '/')
+        image_filename = self.photo_url_path(relative_path)
+        detection_info = record['analysis']['summary'] if record['analysis'] is not None else "Błąd analizy obrazu."
+        self.event_bus.publish('photo', {
+            'camera_id': self.camera_id,
+            'image_url': f"/kamera/{image_filename}",
+            'image_filename': image_filename,
+            'detection_info': detection_info
+        })
+        if detection_info != self.last_published_detection_info:
+            self.last_published_detection_info = detection_info
+            self.event_bus.publish('detections', {'camera_id': self.camera_id, 'detection_info': detection_info})
+
+    def save_session_objects_to_db(self):
+        """
+        Przekazuje do kolejki zapisu pozostałe detekcje sesji (bez czekania na zapis).
+
+        Detekcje są zapisywane na bieżąco po każdej klatce, więc na końcu sesji zostają najwyżej ostatnie.
+        """
+        if len(self.session_detections) == 0:
+            logger.info(f"[{self.camera_id}] Nie wykryto żadnych obiektów w tej sesji")
+            return False
+        flushed = self.flush_session_detections()
+        logger.info(f"[{self.camera_id}] Przekazano do zapisu wszystkie detekcje sesji ({len(self.session_detections)}, "
+                    f"na koniec sesji: {flushed})")
+        return True
+
+    def reset_session_objects(self):
+        """Resetuje detekcje sesji (po przekazaniu do zapisu tych, które jeszcze nie trafiły do kolejki)."""
+        self.flush_session_detections()
+        self.session_detections.reset()
+        logger.info(f"[{self.camera_id}] Zresetowano listę wykrytych obiektów na początku nowej sesji")
+
+    def print_detection_summary(self):
+        """Wyświetla podsumowanie wykrytych obiektów w sesji (najwyższa pewność dla każdego obiektu)."""
+        summary = self.session_detections.summary()
+        if summary:
+            logger.info(f"[{self.camera_id}] Podsumowanie wykrytych obiektów w sesji:")
+            for obj in summary:
+                logger.info(f"- {obj['obiekt']}: {obj['procent']}% (czas: {obj['czas']})")
+        else:
+            logger.info(f"[{self.camera_id}] Nie wykryto żadnych obiektów w tej sesji")
+
+    # Stan kamery
+    def get_camera_status(self):
+        """Zwraca aktualny status kamery i pozostały czas."""
+        with self.state_lock:
+            camera_active_status = self.capture_active
+            remaining_time_status = 0
+            if self.capture_end_time and camera_active_status:
+                remaining_time_status = max(0, int(self.capture_end_time - time.time()))
+        return camera_active_status, remaining_time_status
+
+    def get_camera_state_event(self):
+        """Zwraca dane zdarzenia 'camera' z aktualnym stanem kamery."""
+        camera_active_status, remaining_time_status = self.get_camera_status()
+        return {'camera_id': self.camera_id, 'camera_active': camera_active_status, 'remaining_time': remaining_time_status}
+
+    def publish_camera_state(self):
+        """Powiadamia przeglądarki o zmianie stanu kamery (włączenie, wyłączenie, koniec czasu)."""
+        self.event_bus.publish('camera', self.get_camera_state_event())
+
+    def describe(self):
+        """Zwraca opis kamery dla API."""
+        camera_active_status, remaining_time_status = self.get_camera_status()
+        return {
+            'camera_id': self.camera_id,
+            'port': self.port,
+            'interval': self.interval,
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+            'resolution': f"{self.width}x{self.height}",
+            'fps': self.fps,
+            'camera_active': camera_active_status,
+            'remaining_time': remaining_time_status
+        }
+
+    def stats(self):
+        """Zwraca statystyki potoku i bufora klatek tej kamery."""
+        return {
+            'capture_pipeline': self.pipeline.stats(),
+            'frames_published': self.frame_buffer.frames_published,
+            'frames_encoded': self.frame_buffer.frames_encoded,
+            'photos_indexed': len(self.photo_index),
+            'session_detections': self.session_detections.stats(),
+            'grabber': self.grabber.stats() if self.grabber is not None else None,
+            'capture_interval': self.capture_interval.stats() if self.capture_interval is not None else None,
+            'roi': self.roi.stats() if self.roi is not None else None,
+            'motion': self.motion_detector.stats() if self.motion_detector is not None else None
+        }
+
+    # Przechwytywanie
+    def photo_capture_loop(self, grabber, duration_seconds, capture_interval):
+        end_loop_time = time.monotonic() + duration_seconds
+
+        logger.info(f"[{self.camera_id}] Rozpoczynanie pętli przechwytywania na {duration_seconds}s, interwał "
+                    f"{capture_interval.min_interval}-{capture_interval.max_interval}s")
+
+        active_in_this_run = True
+
+        while time.monotonic() < end_loop_time:
+            with self.state_lock:
+                if not self.capture_active:
+                    active_in_this_run = False
+                    logger.info(f"[{self.camera_id}] Pętla przechwytywania zatrzymana przez flagę capture_active.")
+                    break
+
+            if grabber is None:
+                logger.warning(f"[{self.camera_id}] Kamera nie jest otwarta w pętli przechwytywania. Zatrzymywanie pętli.")
+                active_in_this_run = False
+                break
+
+            capture_started = time.monotonic()
+            # Najnowsza klatka ze slotu grabbera - bez odczytu z kamery i bez starych klatek z bufora sterownika
+            frame = grabber.read(max_age=CAPTURE_MAX_FRAME_AGE)
+            if frame is None:
+                logger.warning(f"[{self.camera_id}] Nie udało się zrobić zdjęcia o {time.strftime('%Y-%m-%d %H:%M:%S')}")
+            else:
+                self.handle_captured_frame(frame)
+
+            # Oczekiwanie na kolejne zdjęcie (lub koniec sesji) - komenda OFF przerywa je natychmiast
+            interval = capture_interval.next_interval(backlog=self.pipeline.backlog())
+            next_capture_time = min(capture_started + interval, end_loop_time)
+            self.capture_stop_event.wait(max(0.0, next_capture_time - time.monotonic()))
+
+        # Poza sesją kamera nie jest odczytywana (kamerę zwalnia komenda OFF albo kolejne włączenie)
+        if grabber is not None:
+            grabber.stop()
+        logger.info(f"[{self.camera_id}] Zakończono pętlę przechwytywania zdjęć. Czas trwania: {duration_seconds}s.")
+        if not active_in_this_run:
+            # Sesję zakończyła komenda OFF - ona odpowiada za zapis detekcji
+            return
+
+        # Detekcje z klatek, które są jeszcze w potoku, muszą trafić do sesji przed zapisem do bazy
+        if not self.pipeline.wait_until_idle():
+            logger.warning(f"[{self.camera_id}] Potok przechwytywania nie opróżnił się w oczekiwanym czasie.")
+        ended_here = False
+        with self.state_lock:
+            if self.capture_active:
+                logger.info(f"[{self.camera_id}] Pętla zakończona automatycznie (upłynął czas). Ustawiam capture_active na False.")
+                self.capture_active = False
+                self.capture_end_time = time.time()
+                ended_here = True
+                # Tutaj nie zwalniamy kamery, to zrobi komenda OFF albo kolejne włączenie
+        if ended_here:
+            self.publish_camera_state()
+            # Zapisanie wszystkich wykrytych obiektów do bazy danych przy automatycznym zakończeniu (poza blokadą)
+            self.save_session_objects_to_db()
+
+    def handle_captured_frame(self, frame):
+        """Przekazuje klatkę do potoku: z analizą, gdy jest ruch, bez analizy lub wcale, gdy scena się nie zmieniła."""
+        FRAMES.inc(camera=self.camera_id, state='captured')
+        motion = self.motion_detector is None or self.motion_detector.check(frame)
+        # Ruch w scenie przyspiesza zdjęcia (klatki analizowane tylko z powodu max_skip_seconds się nie liczą)
+        if (self.motion_detector is not None and self.capture_interval is not None
+                and self.motion_detector.last_changed_ratio >= self.motion_detector.min_changed_ratio):
+            self.capture_interval.record_activity()
+        if not motion:
+            FRAMES.inc(camera=self.camera_id, state='skipped')
+        if not motion and not self.save_static_frames:
+            logger.debug(f"[{self.camera_id}] Brak ruchu o {time.strftime('%Y-%m-%d %H:%M:%S')} - pominięto analizę i zapis")
+            return
+        if self.pipeline.submit(frame, self.photo_index.next_path(), analyze=motion) is not None:
+            logger.debug(f"[{self.camera_id}] Zrobiono zdjęcie o {time.strftime('%Y-%m-%d %H:%M:%S')}, przekazano do "
+                         f"{'analizy i zapisu' if motion else 'zapisu (brak ruchu, bez analizy)'}")
+        else:
+            logger.warning(f"[{self.camera_id}] Nie udało się przekazać zdjęcia z {time.strftime('%Y-%m-%d %H:%M:%S')} do potoku")
+
+    def create_capture_interval(self, interval=None, min_interval=None, max_interval=None):
+        """
+        Interwał zdjęć sesji. Sam interval (bez zakresu) oznacza stały interwał, a bez parametrów
+        używany jest zakres kamery; interval jest wtedy interwałem początkowym.
+        """
+        if interval is not None and min_interval is None and max_interval is None:
+            return AdaptiveCaptureInterval(interval, interval)
+        # Podana jedna granica przesuwa drugą (z ustawień kamery), jeśli zakres byłby pusty
+        if min_interval is None:
+            min_interval = min(self.min_interval, max_interval) if max_interval is not None else self.min_interval
+        if max_interval is None:
+            max_interval = max(self.max_interval, min_interval)
+        return AdaptiveCaptureInterval(min_interval, max_interval,
+                                       initial_interval=interval if interval is not None else self.interval)
+
+    def turn_on(self, duration, interval=None, min_interval=None, max_interval=None):
+        """
+        Włącza przechwytywanie na duration sekund z interwałem adaptacyjnym w zakresie min_interval-max_interval
+        (domyślnie zakres kamery). Zwraca (odpowiedź, kod HTTP).
+        """
+        try:
+            capture_interval = self.create_capture_interval(interval, min_interval, max_interval)
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+
+        with self.control_lock:
+            with self.state_lock:
+                already_active = self.capture_active
+            if already_active:
+                logger.warning(f"[{self.camera_id}] Próba włączenia kamery, gdy jest już aktywna. Najpierw wyłącz.")
+                return {'status': 'info', 'message': 'Kamera jest już włączona.'}, 200
+
+            try:
+                # Resetowanie tablicy wykrytych obiektów na początku nowej sesji
+                self.reset_session_objects()
+                if self.motion_detector is not None:
+                    self.motion_detector.reset()
+
+                if self.cap is None:
+                    self.cap = open_camera_with_settings(self.port, self.width, self.height, self.fps)
+                    if self.cap is None:
+                        logger.warning(f"[{self.camera_id}] Nie udało się otworzyć kamery na porcie {self.port} przy próbie włączenia.")
+                        return {'status': 'error', 'message': f'Nie udało się otworzyć kamery na porcie {self.port}.'}, 500
+
+                self.pipeline.start()
+                self.grabber = FrameGrabber(self.cap, name=self.camera_id, on_frame=self.frame_buffer.publish,
+                                            max_decode_fps=self.max_decode_fps)
+                self.grabber.start()
+                self.capture_interval = capture_interval
+                self.capture_stop_event.clear()
+                with self.state_lock:
+                    self.capture_active = True
+                    self.capture_end_time = time.time() + duration
+
+                self.capture_thread = threading.Thread(target=self.photo_capture_loop,
+                                                       args=(self.grabber, duration, capture_interval),
+                                                       name=f"capture-{self.camera_id}", daemon=True)
+                self.capture_thread.start()
+                self.publish_camera_state()
+
+                logger.info(f"[{self.camera_id}] Kamera włączona na {duration}s. Przechwytywanie w tle rozpoczęte.")
+                return {'status': 'success', 'message': f'Kamera włączona na {duration} sekund.'}, 200
+            except Exception as e:
+                logger.exception(f"[{self.camera_id}] Błąd przy włączaniu kamery: {e}")
+                with self.state_lock:
+                    self.capture_active = False
+                if self.grabber is not None:
+                    self.grabber.stop()
+                if self.cap:
+                    self.cap.release()
+                    self.cap = None
+                return {'status': 'error', 'message': f'Wewnętrzny błąd serwera przy włączaniu kamery: {str(e)}'}, 500
+
+    def turn_off(self):
+        """Wyłącza przechwytywanie i przekazuje detekcje sesji do zapisu. Zwraca (odpowiedź, kod HTTP)."""
+        with self.control_lock:
+            # Kto zmienia capture_active z True na False, ten odpowiada za zapis detekcji sesji.
+            # Jeśli sesja zakończyła się automatycznie, zapisała je już pętla przechwytywania.
+            with self.state_lock:
+                was_active = self.capture_active
+                self.capture_active = False
+                if was_active:
+                    self.capture_end_time = time.time()
+            if not was_active:
+                logger.warning(f"[{self.camera_id}] Próba wyłączenia kamery, gdy nie jest aktywna.")
+                return {'status': 'info', 'message': 'Kamera jest już wyłączona.'}, 200
+            self.publish_camera_state()
+            self.capture_stop_event.set()
+
+            if self.capture_thread and self.capture_thread.is_alive():
+                logger.debug(f"[{self.camera_id}] Oczekiwanie na zakończenie wątku przechwytywania...")
+                self.capture_thread.join(timeout=5.0)
+                if self.capture_thread.is_alive():
+                    logger.warning(f"[{self.camera_id}] Wątek przechwytywania nie zakończył się w oczekiwanym czasie.")
+                else:
+                    logger.debug(f"[{self.camera_id}] Wątek przechwytywania zakończony.")
+            self.capture_thread = None
+            if self.grabber is not None:
+                self.grabber.stop()
+
+            if self.cap is not None:
+                logger.debug(f"[{self.camera_id}] Zwalnianie kamery po komendzie OFF...")
+                self.cap.release()
+                self.cap = None
+
+            # Detekcje z klatek w potoku trafiają do sesji, a sesja do kolejki zapisu - bez czekania na bazę
+            if not self.pipeline.wait_until_idle():
+                logger.warning(f"[{self.camera_id}] Potok przechwytywania nie opróżnił się w oczekiwanym czasie.")
+            self.save_session_objects_to_db()
+
+            # Wyświetlenie podsumowania wykrytych obiektów w zakończonej sesji
+            self.print_detection_summary()
+
+            logger.info(f"[{self.camera_id}] Kamera wyłączona.")
+            return {'status': 'success', 'message': 'Kamera wyłączona.'}, 200
+
+    def shutdown(self):
+        """Zatrzymuje sesję (jeśli aktywna), zwalnia kamerę i zatrzymuje potok."""
+        self.turn_off()
+        with self.control_lock:
+            if self.cap is not None:
+                self.cap.release()
+                self.cap = None
+        self.pipeline.stop()
+
+
+def load_camera_config(config_path):
+    """
+    Wczytuje konfigurację kamer z pliku JSON (jeśli istnieje).
+
+    Format: {"cameras": [{"id": "salon", "port": 0, "interval": 3, "width": 1280, "height": 720, "fps": 30}]}
+    Zwraca listę słowników (pustą, jeśli pliku nie ma).
+    """
+    if not os.path.exists(config_path):
+        return []
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        cameras = config.get('cameras', [])
+        logger.info(f"Wczytano konfigurację {len(cameras)} kamer z {config_path}")
+        return cameras
+    except (OSError, ValueError) as e:
+        logger.error(f"Błąd podczas wczytywania konfiguracji kamer {config_path}: {e}")
+        return []
+
+
+class CameraRegistry:
+    """
+    Rejestr kamer: po jednym CameraWorker na urządzenie.
+
+    Kamery są brane z pliku konfiguracyjnego (jeśli istnieje), a pozostałe działające urządzenia
+    są dodawane przy skanowaniu z identyfikatorem camera<port>. Zdjęcia każdej kamery trafiają
+    do osobnego podfolderu folderu bazowego.
+
+    Z discovery (CameraDiscovery) kamery są rejestrowane także po podłączeniu urządzenia, a zapytania
+    (default) korzystają z zapamiętanych wyników wykrywania zamiast skanować urządzenia.
+    """
+
+    def __init__(self, base_folder, worker_factory, config_path=None, discovery=None):
+        self.base_folder = base_folder
+        self.worker_factory = worker_factory
+        self.config_path = config_path
+        self.discovery = discovery
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        for camera_config in load_camera_config(config_path) if config_path else []:
+            self._register(camera_config)
+        if discovery is not None:
+            discovery.add_listener(self._on_devices_changed)
+
+    def _register(self, camera_config):
+        camera_id = str(camera_config.get('id', f"camera{camera_config['port']}"))
+        with self._lock:
+            if camera_id in self._workers:
+                return self._workers[camera_id]
+            folder = os.path.join(self.base_folder, camera_id)
+            worker = self.worker_factory(camera_id, camera_config['port'], folder, camera_config)
+            self._workers[camera_id] = worker
+        logger.info(f"Zarejestrowano kamerę {camera_id} (port {camera_config['port']})")
+        return worker
+
+    def _register_ports(self, ports):
+        known_ports = {worker.port for worker in self.all()}
+        for port in ports:
+            if port not in known_ports:
+                self._register({'port': port})
+
+    def _on_devices_changed(self, added, removed):
+        self._register_ports(added)
+        for worker in self.all():
+            if worker.port in removed:
+                logger.warning(f"[{worker.camera_id}] Kamera na porcie {worker.port} została odłączona.")
+
+    def busy_ports(self):
+        """Porty kamer otwartych przez sesję przechwytywania (nie mogą być sprawdzane przez wykrywanie)."""
+        return {worker.port for worker in self.all() if worker.cap is not None}
+
+    def scan(self):
+        """Skanuje urządzenia i rejestruje nowe kamery. Zwraca listę wszystkich zarejestrowanych kamer."""
+        with self._scan_lock:
+            if self.discovery is not None:
+                self._register_ports(self.discovery.refresh())
+            else:
+                self._register_ports(scan_usb_for_cameras())
+        return self.all()
+
+    def get(self, camera_id):
+        with self._lock:
+            return self._workers.get(camera_id)
+
+    def all(self):
+        with self._lock:
+            return list(self._workers.values())
+
+    def default(self, scan_if_empty=False):
+        """Zwraca pierwszą zarejestrowaną kamerę (dla tras bez identyfikatora kamery)."""
+        workers = self.all()
+        if not workers and scan_if_empty:
+            if self.discovery is None:
+                workers = self.scan()
+            else:
+                # Bez skanowania na ścieżce zapytania - tylko kamery z ostatniego wykrywania, a nowe wykrywanie w tle
+                self._register_ports(self.discovery.cameras())
+                workers = self.all()
+                if not workers:
+                    self.discovery.refresh_async()
+        return workers[0] if workers else None
+
+    def shutdown(self):
+        for worker in self.all():
+            worker.shutdown()
@@ -0,0 +1,77 @@
+import time
+import threading
+
+
+class AdaptiveCaptureInterval:
+    """
+    Interwał przechwytywania zdjęć dopasowywany do aktywności w scenie i obciążenia inferencji.
+
+    - aktywność (ruch w klatce albo wykryty człowiek lub pies) ustawia min_interval na activity_hold sekund
+      od ostatniej aktywności
+    - w spokojnej scenie interwał rośnie backoff razy po każdym zdjęciu, aż do max_interval
+    - gdy w kolejce inferencji czeka co najmniej backlog_limit klatek, interwał nie jest krótszy niż
+      średni czas analizy klatki pomnożony przez (1 + liczba czekających klatek) - kamera nie produkuje
+      klatek szybciej, niż model je analizuje
+
+    Przy min_interval == max_interval interwał jest stały.
+    """
+
+    def __init__(self, min_interval, max_interval, initial_interval=None, activity_hold=10.0, backoff=1.5,
+                 backlog_limit=1, analysis_smoothing=0.2):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError(f"Nieprawidłowy zakres interwału: {min_interval}-{max_interval}s")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.activity_hold = activity_hold
+        self.backoff = backoff
+        self.backlog_limit = backlog_limit
+        self.analysis_smoothing = analysis_smoothing
+        initial_interval = max_interval if initial_interval is None else initial_interval
+        self.interval = min(max_interval, max(min_interval, initial_interval))
+        self.reason = 'start'
+        self.analysis_seconds = None
+        self.backlog = 0
+        self._last_activity = None
+        self._lock = threading.Lock()
+
+    def record_activity(self):
+        """Ruch w scenie albo detekcja - kolejne zdjęcia z min_interval przez activity_hold sekund."""
+        with self._lock:
+            self._last_activity = time.monotonic()
+
+    def record_analysis(self, seconds, detections=0):
+        """Czas analizy jednej klatki (średnia wykładnicza) i liczba wykrytych w niej obiektów."""
+        with self._lock:
+            if self.analysis_seconds is None:
+                self.analysis_seconds = seconds
+            else:
+                self.analysis_seconds += self.analysis_smoothing * (seconds - self.analysis_seconds)
+            if detections:
+                self._last_activity = time.monotonic()
+
+    def next_interval(self, backlog=0):
+        """Interwał do następnego zdjęcia; backlog to liczba klatek czekających na analizę."""
+        with self._lock:
+            self.backlog = backlog
+            active = self._last_activity is not None and time.monotonic() - self._last_activity < self.activity_hold
+            if active:
+                interval, reason = self.min_interval, 'activity'
+            else:
+                interval, reason = min(self.max_interval, self.interval * self.backoff), 'idle'
+            if backlog >= self.backlog_limit and self.analysis_seconds is not None:
+                throttled = min(self.max_interval, self.analysis_seconds * (1 + backlog))
+                if throttled > interval:
+                    interval, reason = throttled, 'backlog'
+            self.interval, self.reason = interval, reason
+            return interval
+
+    def stats(self):
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'reason': self.reason,
+                'min_interval': self.min_interval,
+                'max_interval': self.max_interval,
+                'analysis_seconds': self.analysis_seconds,
+                'backlog': self.backlog
+            }
@@ -0,0 +1,194 @@
+import os
+import cv2
+import time
+import queue
+import threading
+import logging
+from datetime import datetime
+from metrics import FRAMES, STAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+class CapturePipeline:
+    """
+    Potok przechwytywanie -> inferencja -> zapis działający na klatkach w pamięci.
+
+    Klatka (ndarray z cap.read()) trafia bezpośrednio do modelu w wątku inferencji, wynik detekcji
+    jest dołączany do rekordu klatki, a kodowanie JPEG i zapis na dysk odbywają się asynchronicznie
+    w osobnym wątku. Dzięki temu nie ma cyklu zapis JPEG -> ponowny odczyt z dysku przed analizą,
+    a detekcje istnieją dla każdej przechwyconej klatki.
+
+    Parametry:
+    - analyze_frame: funkcja przyjmująca rekord klatki (klatka w 'frame', ścieżka zdjęcia w 'photo_path',
+      czas przechwycenia w 'captured_at') i zwracająca słownik z wynikiem analizy (co najmniej klucz 'summary')
+    - on_persisted: opcjonalna funkcja wywoływana z rekordem klatki i kluczem pliku
+      (ścieżka, mtime_ns, rozmiar) tuż przed udostępnieniem pliku pod docelową nazwą
+    - on_written: opcjonalna funkcja wywoływana z tymi samymi argumentami, gdy plik jest już widoczny
+    - queue_size: maksymalna liczba klatek oczekujących na każdym etapie
+    - jpeg_quality: jakość kodowania JPEG (0-100)
+    - name: nazwa potoku (identyfikator kamery) w metrykach
+    """
+
+    def __init__(self, analyze_frame, on_persisted=None, on_written=None, queue_size=8, jpeg_quality=90, name="camera"):
+        self.name = name
+        self.analyze_frame = analyze_frame
+        self.on_persisted = on_persisted
+        self.on_written = on_written
+        self.jpeg_quality = jpeg_quality
+        self._inference_queue = queue.Queue(maxsize=queue_size)
+        self._persist_queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._next_frame_id = 1
+        self.frames_submitted = 0
+        self.frames_dropped = 0
+        self.frames_analyzed = 0
+        self.frames_reused = 0
+        self.frames_persisted = 0
+        self._last_analysis = None
+
+    def start(self):
+        """Uruchamia wątki inferencji i zapisu (wywołanie wielokrotne jest bezpieczne) na początku sesji."""
+        with self._start_lock:
+            # Nowa sesja nie może dostać wyniku ostatniej klatki poprzedniej sesji (scena mogła się zmienić).
+            # Wątki zwykle żyją między sesjami, więc wynik jest zapominany także wtedy, gdy już działają
+            self._last_analysis = None
+            if self._threads and all(t.is_alive() for t in self._threads):
+                return
+            self._threads = [
+                threading.Thread(target=self._inference_worker, name="capture-inference", daemon=True),
+                threading.Thread(target=self._persist_worker, name="capture-persist", daemon=True)
+            ]
+            for thread in self._threads:
+                thread.start()
+            logger.info("Uruchomiono potok przechwytywanie -> inferencja -> zapis.")
+
+    def stop(self, timeout=5.0):
+        """Zatrzymuje wątki potoku po przetworzeniu klatek, które już są w kolejkach."""
+        with self._start_lock:
+            if not self._threads:
+                return
+            self._inference_queue.put(None)
+            for thread in self._threads:
+                thread.join(timeout=timeout)
+            self._threads = []
+            logger.info("Zatrzymano potok przechwytywania.")
+
+    def submit(self, frame, photo_path, analyze=True):
+        """
+        Przekazuje klatkę do analizy i zapisu pod ścieżką photo_path.
+
+        Przy analyze=False (np. klatka bez ruchu) model nie jest uruchamiany - klatka dostaje wynik
+        ostatniej przeanalizowanej klatki, bo scena się nie zmieniła.
+        Zwraca rekord klatki lub None, jeśli kolejka inferencji jest pełna i klatka została odrzucona.
+        """
+        record = {
+            'frame_id': self._next_frame_id,
+            'frame': frame,
+            'photo_path': photo_path,
+            'captured_at': datetime.now(),
+            'analyze': analyze,
+            'analysis': None
+        }
+        self._next_frame_id += 1
+        try:
+            self._inference_queue.put_nowait(record)
+        except queue.Full:
+            self.frames_dropped += 1
+            FRAMES.inc(camera=self.name, state='dropped')
+            logger.warning(f"Kolejka inferencji pełna. Odrzucono klatkę przeznaczoną dla {photo_path}")
+            return None
+        self.frames_submitted += 1
+        return record
+
+    def wait_until_idle(self, timeout=10.0):
+        """Czeka, aż wszystkie przekazane klatki zostaną przeanalizowane i zapisane. Zwraca True, jeśli się udało."""
+        deadline = time.time() + timeout
+        for q in (self._inference_queue, self._persist_queue):
+            while q.unfinished_tasks:
+                if time.time() >= deadline:
+                    return False
+                time.sleep(0.05)
+        return True
+
+    def backlog(self):
+        """Liczba klatek czekających na analizę."""
+        return self._inference_queue.qsize()
+
+    def stats(self):
+        """Zwraca liczniki potoku i aktualne długości kolejek."""
+        return {
+            'frames_submitted': self.frames_submitted,
+            'frames_dropped': self.frames_dropped,
+            'frames_analyzed': self.frames_analyzed,
+            'frames_reused': self.frames_reused,
+            'frames_persisted': self.frames_persisted,
+            'inference_queue': self._inference_queue.qsize(),
+            'persist_queue': self._persist_queue.qsize()
+        }
+
+    def _inference_worker(self):
+        while True:
+            record = self._inference_queue.get()
+            try:
+                if record is None:
+                    self._persist_queue.put(None)
+                    return
+                try:
+                    if record['analyze'] or self._last_analysis is None:
+                        record['analysis'] = self.analyze_frame(record)
+                        self._last_analysis = record['analysis']
+                        self.frames_analyzed += 1
+                        FRAMES.inc(camera=self.name, state='analyzed')
+                    else:
+                        record['analysis'] = self._last_analysis
+                        self.frames_reused += 1
+                        FRAMES.inc(camera=self.name, state='reused')
+                except Exception as e:
+                    logger.exception(f"Błąd podczas analizy klatki {record['frame_id']}: {e}")
+                self._persist_queue.put(record)
+            finally:
+                self._inference_queue.task_done()
+
+    def _persist_worker(self):
+        while True:
+            record = self._persist_queue.get()
+            try:
+                if record is None:
+                    return
+                self._persist_record(record)
+            finally:
+                self._persist_queue.task_done()
+
+    def _persist_record(self, record):
+        photo_path = record['photo_path']
+        tmp_path = photo_path + ".tmp"
+        try:
+            with STAGE_LATENCY.time(stage='encode'):
+                ok, encoded = cv2.imencode('.jpg', record['frame'], [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+            if not ok:
+                logger.warning(f"Nie udało się zakodować klatki {record['frame_id']} do JPEG.")
+                return
+            with STAGE_LATENCY.time(stage='write'), open(tmp_path, 'wb') as f:
+                f.write(encoded.tobytes())
+
+            # Klucz liczony na pliku tymczasowym - os.replace zachowuje mtime i rozmiar,
+            # więc wynik analizy jest dostępny zanim plik stanie się widoczny pod docelową nazwą
+            stat = os.stat(tmp_path)
+            file_key = (os.path.abspath(photo_path), stat.st_mtime_ns, stat.st_size)
+            if self.on_persisted is not None:
+                self.on_persisted(record, file_key)
+
+            os.replace(tmp_path, photo_path)
+            self.frames_persisted += 1
+            logger.debug(f"Zdjęcie zapisane jako {photo_path}")
+            if self.on_written is not None:
+                self.on_written(record, file_key)
+        except Exception as e:
+            logger.exception(f"Błąd podczas zapisu klatki {record['frame_id']} do {photo_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            # Zwolnienie pamięci klatki - rekord może jeszcze żyć w innych strukturach
+            record['frame'] = None
@@ -1,7 +1,24 @@
+import io
 import os
+import csv
+import time
+import queue
 import psycopg2
+import threading
+import psycopg2.pool
+import psycopg2.errors
+import logging
 from dotenv import load_dotenv
 from datetime import datetime
+from contextlib import contextmanager
+from psycopg2.extras import execute_values
+from metrics import DB_ROWS, STAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Schemat sprawdzany jest tylko raz na proces, a nie przed każdym wstawieniem
+_table_ready = False
+_table_ready_lock = threading.Lock()
 
 def load_db_credentials(env_file_path):
     """Ładuje dane uwierzytelniające do bazy danych z pliku .env"""
@@ -15,13 +32,16 @@ def load_db_credentials(env_file_path):
         'password': os.getenv('DB_PASSWORD')
     }
 
+def load_default_db_credentials():
+    """Ładuje dane uwierzytelniające z domyślnego pliku credentials.env obok tego modułu"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    env_file_path = os.path.join(current_dir, "credentials.env")
+    return load_db_credentials(env_file_path)
+
 def get_db_connection(credentials=None):
     """Tworzy połączenie z bazą danych PostgreSQL"""
     if credentials is None:
-        # Domyślna ścieżka do pliku credentials.env
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        env_file_path = os.path.join(current_dir, "credentials.env")
-        credentials = load_db_credentials(env_file_path)
+        credentials = load_default_db_credentials()
     
     try:
         conn = psycopg2.connect(
@@ -33,34 +53,348 @@ def get_db_connection(credentials=None):
         )
         return conn
     except Exception as e:
-        print(f"Błąd podczas łączenia z bazą danych: {e}")
+        logger.error(f"Błąd podczas łączenia z bazą danych: {e}")
         return None
 
-def create_table_if_not_exists(conn):
-    """Tworzy tabelę WYKRYTE_OBIEKTY, jeśli nie istnieje"""
+class DatabasePool:
+    """
+    Bezpieczna wątkowo pula połączeń PostgreSQL (psycopg2 ThreadedConnectionPool).
+
+    Każdy wątek (żądanie Flask, wątek kamery, writer detekcji) pobiera własne połączenie na czas
+    transakcji, zamiast współdzielić jedno. Połączenie jest sprawdzane przy pobraniu (SELECT 1),
+    a zerwane połączenia są odrzucane i zastępowane nowymi. Gdy baza jest niedostępna, kolejne
+    próby połączenia są ponawiane z wykładniczo rosnącym opóźnieniem.
+
+    Użycie:
+        with pool.connection() as conn:
+            ...
+            conn.commit()
+    
+    Parametry:
+    - minconn, maxconn: minimalna i maksymalna liczba połączeń w puli
+    - credentials: dane do połączenia (domyślnie z credentials.env)
+    - health_check: czy sprawdzać połączenie przy pobraniu z puli
+    - max_retries: liczba prób uzyskania połączenia w jednym wywołaniu connection()
+    - backoff_base, backoff_max: początkowe i maksymalne opóźnienie (s) między próbami
+    - checkout_timeout: maksymalny czas oczekiwania (s) na wolne połączenie, gdy wszystkie są zajęte
+    """
+
+    def __init__(self, minconn=1, maxconn=10, credentials=None, health_check=True,
+                 max_retries=3, backoff_base=0.5, backoff_max=10.0, checkout_timeout=30.0):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.credentials = credentials
+        self.health_check = health_check
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.checkout_timeout = checkout_timeout
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool zgłasza błąd przy wyczerpaniu puli - semafor sprawia, że wątki czekają
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.reconnects = 0
+        self.failed_checkouts = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    credentials = self.credentials or load_default_db_credentials()
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn,
+                        host=credentials['host'],
+                        port=credentials['port'],
+                        dbname=credentials['dbname'],
+                        user=credentials['user'],
+                        password=credentials['password']
+                    )
+        return self._pool
+
+    @staticmethod
+    def _is_healthy(conn):
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        delay = self.backoff_base
+        last_error = None
+        for attempt in range(self.max_retries):
+            try:
+                pool = self._get_pool()
+                conn = pool.getconn()
+                if not self.health_check or self._is_healthy(conn):
+                    return pool, conn
+                # Zerwane połączenie (np. po restarcie PostgreSQL) - zamykamy je i bierzemy nowe
+                pool.putconn(conn, close=True)
+                self.reconnects += 1
+                conn = pool.getconn()
+                if self._is_healthy(conn):
+                    return pool, conn
+                pool.putconn(conn, close=True)
+                last_error = psycopg2.OperationalError("Połączenie z puli nie przeszło sprawdzenia")
+            except psycopg2.Error as e:
+                last_error = e
+            if attempt < self.max_retries - 1:
+                logger.warning(f"Nie można uzyskać połączenia z bazą danych (próba {attempt + 1}/{self.max_retries}): {last_error}. Ponowienie za {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.backoff_max)
+        self.failed_checkouts += 1
+        raise psycopg2.OperationalError(f"Baza danych niedostępna: {last_error}")
+
+    @contextmanager
+    def connection(self):
+        """Pobiera połączenie z puli na czas bloku with i zwraca je do puli po jego zakończeniu."""
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise psycopg2.pool.PoolError("Przekroczono czas oczekiwania na wolne połączenie z bazą danych")
+        pool = conn = None
+        try:
+            pool, conn = self._checkout()
+            yield conn
+        except Exception:
+            if conn is not None and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    conn.close()
+            raise
+        finally:
+            if conn is not None:
+                self._release(pool, conn)
+            self._slots.release()
+
+    @staticmethod
+    def _release(pool, conn):
+        # Połączenie wraca do puli, z której zostało pobrane - po close() (albo w trakcie) ta pula jest
+        # już zamknięta, więc połączenie jest tylko zamykane
+        if pool.closed:
+            conn.close()
+            return
+        try:
+            # Niezatwierdzona transakcja jest wycofywana przez pulę przy zwrocie połączenia
+            pool.putconn(conn, close=conn.closed != 0)
+        except psycopg2.pool.PoolError:
+            conn.close()
+
+    def is_available(self):
+        """Sprawdza, czy można uzyskać działające połączenie z bazą danych."""
+        try:
+            with self.connection():
+                return True
+        except Exception as e:
+            logger.error(f"Błąd podczas łączenia z bazą danych: {e}")
+            return False
+
+    def close(self):
+        """Zamyka wszystkie połączenia w puli."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """Zwraca współdzieloną w procesie pulę połączeń (tworzoną przy pierwszym użyciu)"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = DatabasePool()
+    return _default_pool
+
+# Indeksy pod zapytania o zakres czasu (opcjonalnie dla obiektu lub kamery) ze stronicowaniem po (CZAS, ID)
+DETECTION_INDEXES_QUERY = """
+CREATE INDEX IF NOT EXISTS WYKRYTE_OBIEKTY_CZAS_IDX ON WYKRYTE_OBIEKTY (CZAS, ID);
+CREATE INDEX IF NOT EXISTS WYKRYTE_OBIEKTY_OBIEKT_CZAS_IDX ON WYKRYTE_OBIEKTY (OBIEKT, CZAS, ID);
+CREATE INDEX IF NOT EXISTS WYKRYTE_OBIEKTY_KAMERA_CZAS_IDX ON WYKRYTE_OBIEKTY (KAMERA, CZAS, ID);
+"""
+
+# Partycje miesięczne, które już istnieją, i takie, których nie udało się utworzyć (sprawdzane raz na proces)
+_partitions_ready = set()
+_partitions_failed = set()
+_partitions_lock = threading.Lock()
+_partitioned = False
+
+def partition_by_month_enabled():
+    """Czy nowa tabela ma być partycjonowana miesięcznie po CZAS (DB_PARTITION_BY_MONTH=1 w credentials.env)"""
+    return os.getenv('DB_PARTITION_BY_MONTH', '').lower() in ('1', 'true', 'yes')
+
+def _table_kind(cursor):
+    """Zwraca 'r' (zwykła tabela), 'p' (tabela partycjonowana) lub None, gdy WYKRYTE_OBIEKTY nie istnieje"""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('wykryte_obiekty')")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def _month_start(czas):
+    return datetime(czas.year, czas.month, 1)
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def ensure_month_partitions(conn, times):
+    """
+    Tworzy brakujące partycje miesięczne dla podanych czasów detekcji (tylko dla tabeli partycjonowanej).
+
+    Partycje są tworzone w osobnej transakcji przed wstawieniem wierszy. Gdy partycja domyślna ma już
+    wiersze z danego miesiąca, są one przenoszone do nowej partycji (_create_partition_moving_rows).
+    Miesiąc, dla którego to się nie uda, jest zapamiętywany - jego wiersze trafiają do partycji
+    domyślnej, a błąd jest logowany raz, a nie przy każdej porcji zapisu.
+    """
+    if not _partitioned:
+        return
+    months = {_month_start(czas) for czas in times} - _partitions_ready - _partitions_failed
+    if not months:
+        return
+    with _partitions_lock:
+        for month in sorted(months - _partitions_ready - _partitions_failed):
+            name = f"WYKRYTE_OBIEKTY_{month:%Y_%m}"
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {name} PARTITION OF WYKRYTE_OBIEKTY
+                    FOR VALUES FROM (%s) TO (%s);
+                    """, (month, _next_month(month)))
+                conn.commit()
+                _partitions_ready.add(month)
+            except psycopg2.errors.CheckViolation:
+                # Partycja domyślna zawiera już wiersze z tego miesiąca (np. po nieudanym utworzeniu partycji)
+                conn.rollback()
+                _create_partition_moving_rows(conn, name, month)
+            except Exception as e:
+                logger.error(f"Błąd podczas tworzenia partycji {name}: {e}. Wiersze z tego miesiąca trafią do partycji domyślnej.")
+                conn.rollback()
+                _partitions_failed.add(month)
+
+def _create_partition_moving_rows(conn, name, month):
+    """Tworzy partycję miesiąca i przenosi do niej wiersze z partycji domyślnej w jednej transakcji."""
+    try:
+        with conn.cursor() as cursor:
+            # Odłączenie blokuje tabelę do końca transakcji, więc w tym czasie nie trafią do niej nowe wiersze
+            cursor.execute("ALTER TABLE WYKRYTE_OBIEKTY DETACH PARTITION WYKRYTE_OBIEKTY_DEFAULT;")
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF WYKRYTE_OBIEKTY
+            FOR VALUES FROM (%s) TO (%s);
+            """, (month, _next_month(month)))
+            cursor.execute("""
+            WITH PRZENIESIONE AS (
+                DELETE FROM WYKRYTE_OBIEKTY_DEFAULT WHERE CZAS >= %s AND CZAS < %s
+                RETURNING ID, OBIEKT, PROCENT, CZAS, KAMERA, KLATKA, X1, Y1, X2, Y2
+            )
+            INSERT INTO WYKRYTE_OBIEKTY (ID, OBIEKT, PROCENT, CZAS, KAMERA, KLATKA, X1, Y1, X2, Y2)
+            SELECT ID, OBIEKT, PROCENT, CZAS, KAMERA, KLATKA, X1, Y1, X2, Y2 FROM PRZENIESIONE;
+            """, (month, _next_month(month)))
+            moved = cursor.rowcount
+            cursor.execute("ALTER TABLE WYKRYTE_OBIEKTY ATTACH PARTITION WYKRYTE_OBIEKTY_DEFAULT DEFAULT;")
+        conn.commit()
+        _partitions_ready.add(month)
+        logger.info(f"Utworzono partycję {name} i przeniesiono do niej {moved} wierszy z partycji domyślnej.")
+    except Exception as e:
+        logger.error(f"Błąd podczas tworzenia partycji {name} z przeniesieniem wierszy z partycji domyślnej: {e}. "
+                     f"Wiersze z tego miesiąca trafią do partycji domyślnej.")
+        conn.rollback()
+        _partitions_failed.add(month)
+
+def create_table_if_not_exists(conn, partition_by_month=None):
+    """
+    Tworzy tabelę WYKRYTE_OBIEKTY i jej indeksy, jeśli nie istnieją
+
+    Przy partition_by_month (domyślnie DB_PARTITION_BY_MONTH) nowa tabela jest partycjonowana
+    miesięcznie po CZAS, z partycją domyślną na wiersze spoza utworzonych partycji. Istniejąca
+    zwykła tabela nie jest przebudowywana - partycjonowanie wymaga ręcznej migracji danych.
+    Pierwsze utworzenie indeksów na dużej istniejącej tabeli blokuje na ten czas zapisy.
+    """
+    global _partitioned
+    if partition_by_month is None:
+        partition_by_month = partition_by_month_enabled()
+
     create_table_query = """
     CREATE TABLE IF NOT EXISTS WYKRYTE_OBIEKTY
     (
         ID SERIAL PRIMARY KEY,
         OBIEKT VARCHAR(255),
         PROCENT NUMERIC(5, 2),
-        CZAS TIMESTAMP
+        CZAS TIMESTAMP,
+        KAMERA VARCHAR(64)
     );
     """
+    create_partitioned_table_query = """
+    CREATE TABLE IF NOT EXISTS WYKRYTE_OBIEKTY
+    (
+        ID SERIAL,
+        OBIEKT VARCHAR(255),
+        PROCENT NUMERIC(5, 2),
+        CZAS TIMESTAMP NOT NULL,
+        KAMERA VARCHAR(64),
+        PRIMARY KEY (ID, CZAS)
+    ) PARTITION BY RANGE (CZAS);
+    CREATE TABLE IF NOT EXISTS WYKRYTE_OBIEKTY_DEFAULT PARTITION OF WYKRYTE_OBIEKTY DEFAULT;
+    """
     
     try:
         cursor = conn.cursor()
-        cursor.execute(create_table_query)
+        kind = _table_kind(cursor)
+        if kind is None and partition_by_month:
+            cursor.execute(create_partitioned_table_query)
+            kind = 'p'
+        elif kind == 'r' and partition_by_month:
+            logger.warning("Tabela WYKRYTE_OBIEKTY już istnieje i nie jest partycjonowana. Partycjonowanie wymaga migracji danych.")
+        if kind != 'p':
+            cursor.execute(create_table_query)
+        # Kolumny dodane w kolejnych wersjach: kamera, numer klatki i ramka obiektu (x1, y1, x2, y2 w pikselach)
+        cursor.execute("""
+        ALTER TABLE WYKRYTE_OBIEKTY
+            ADD COLUMN IF NOT EXISTS KAMERA VARCHAR(64),
+            ADD COLUMN IF NOT EXISTS KLATKA BIGINT,
+            ADD COLUMN IF NOT EXISTS X1 REAL,
+            ADD COLUMN IF NOT EXISTS Y1 REAL,
+            ADD COLUMN IF NOT EXISTS X2 REAL,
+            ADD COLUMN IF NOT EXISTS Y2 REAL;
+        """)
+        cursor.execute(DETECTION_INDEXES_QUERY)
         conn.commit()
         cursor.close()
-        print("Tabela WYKRYTE_OBIEKTY została utworzona lub już istnieje")
+        _partitioned = kind == 'p'
+        if _partitioned:
+            now = datetime.now()
+            ensure_month_partitions(conn, [now, _next_month(_month_start(now))])
+        logger.info("Tabela WYKRYTE_OBIEKTY została utworzona lub już istnieje")
         return True
     except Exception as e:
-        print(f"Błąd podczas tworzenia tabeli: {e}")
+        logger.error(f"Błąd podczas tworzenia tabeli: {e}")
         conn.rollback()
         return False
 
-def insert_detected_object(obiekt, procent, czas=None, conn=None):
+def ensure_table_exists(conn):
+    """Wywołuje create_table_if_not_exists tylko przy pierwszym użyciu w danym procesie"""
+    global _table_ready
+    if _table_ready:
+        return True
+    with _table_ready_lock:
+        if not _table_ready:
+            _table_ready = create_table_if_not_exists(conn)
+    return _table_ready
+
+def normalize_detection_row(row):
+    """
+    Zamienia krotkę (obiekt, procent[, czas[, kamera[, klatka, x1, y1, x2, y2]]]) na pełny wiersz
+    (obiekt, procent, czas, kamera, klatka, x1, y1, x2, y2) z domyślnymi wartościami
+    """
+    obiekt, procent = row[0], row[1]
+    czas = row[2] if len(row) > 2 and row[2] is not None else datetime.now()
+    kamera = row[3] if len(row) > 3 else None
+    klatka_i_ramka = tuple(row[4:9]) + (None,) * (9 - max(len(row), 4))
+    return (obiekt, procent, czas, kamera) + klatka_i_ramka
+
+def insert_detected_object(obiekt, procent, czas=None, conn=None, kamera=None):
     """
     Wstawia dane wykrytego obiektu do tabeli WYKRYTE_OBIEKTY
     
@@ -68,18 +402,19 @@ def insert_detected_object(obiekt, procent, czas=None, conn=None):
     - obiekt: nazwa wykrytego obiektu (str)
     - procent: procent pewności detekcji (float)
     - czas: czas detekcji (datetime), domyślnie aktualny czas
-    - conn: aktywne połączenie z bazą danych, jeśli None, tworzy nowe
+    - conn: aktywne połączenie z bazą danych, jeśli None, pobiera połączenie z puli
+    - kamera: identyfikator kamery, która wykryła obiekt (str), opcjonalnie
     
     Zwraca:
     - True, jeśli operacja się powiodła, False w przeciwnym przypadku
     """
-    should_close_conn = False
-    
     if conn is None:
-        conn = get_db_connection()
-        if conn is None:
+        try:
+            with get_connection_pool().connection() as pooled_conn:
+                return insert_detected_object(obiekt, procent, czas, pooled_conn, kamera)
+        except Exception as e:
+            logger.error(f"Błąd podczas wstawiania danych: {e}")
             return False
-        should_close_conn = True
     
     if czas is None:
         czas = datetime.now()
@@ -87,36 +422,286 @@ def insert_detected_object(obiekt, procent, czas=None, conn=None):
     try:
         cursor = conn.cursor()
         
-        # Upewniamy się, że tabela istnieje
-        create_table_if_not_exists(conn)
+        # Upewniamy się, że tabela istnieje (tylko raz na proces)
+        ensure_table_exists(conn)
+        ensure_month_partitions(conn, [czas])
         
         insert_query = """
-        INSERT INTO WYKRYTE_OBIEKTY (OBIEKT, PROCENT, CZAS)
-        VALUES (%s, %s, %s);
+        INSERT INTO WYKRYTE_OBIEKTY (OBIEKT, PROCENT, CZAS, KAMERA)
+        VALUES (%s, %s, %s, %s);
         """
         
-        cursor.execute(insert_query, (obiekt, procent, czas))
+        cursor.execute(insert_query, (obiekt, procent, czas, kamera))
         conn.commit()
         cursor.close()
-        print(f"Wykryty obiekt '{obiekt}' ({procent}%) został dodany do bazy danych")
+        logger.debug(f"Wykryty obiekt '{obiekt}' ({procent}%) został dodany do bazy danych")
         return True
     except Exception as e:
-        print(f"Błąd podczas wstawiania danych: {e}")
+        logger.error(f"Błąd podczas wstawiania danych: {e}")
         conn.rollback()
         return False
-    finally:
-        if should_close_conn and conn is not None:
-            conn.close()
+
+def insert_detected_objects(rows, conn=None):
+    """
+    Wstawia wiele wykrytych obiektów do tabeli WYKRYTE_OBIEKTY w jednej transakcji (execute_values)
+    
+    Parametry:
+    - rows: lista krotek (obiekt, procent, czas[, kamera[, klatka, x1, y1, x2, y2]]); czas równy None
+      zostanie zastąpiony aktualnym czasem
+    - conn: aktywne połączenie z bazą danych, jeśli None, pobiera połączenie z puli
+    
+    Zwraca:
+    - True, jeśli operacja się powiodła, False w przeciwnym przypadku
+    """
+    rows = [normalize_detection_row(row) for row in rows]
+    if not rows:
+        return True
+
+    if conn is None:
+        try:
+            with get_connection_pool().connection() as pooled_conn:
+                return insert_detected_objects(rows, pooled_conn)
+        except Exception as e:
+            logger.error(f"Błąd podczas wstawiania danych: {e}")
+            return False
+    
+    try:
+        ensure_table_exists(conn)
+        ensure_month_partitions(conn, [row[2] for row in rows])
+        
+        insert_query = """
+        INSERT INTO WYKRYTE_OBIEKTY (OBIEKT, PROCENT, CZAS, KAMERA, KLATKA, X1, Y1, X2, Y2)
+        VALUES %s;
+        """
+        
+        with conn.cursor() as cursor:
+            execute_values(cursor, insert_query, rows, page_size=max(len(rows), 100))
+        conn.commit()
+        logger.debug(f"Dodano {len(rows)} wykrytych obiektów do bazy danych")
+        return True
+    except Exception as e:
+        logger.error(f"Błąd podczas wstawiania danych: {e}")
+        conn.rollback()
+        return False
+
+def copy_detected_objects(rows, conn):
+    """
+    Wstawia wiele wykrytych obiektów do tabeli WYKRYTE_OBIEKTY poleceniem COPY w jednej transakcji
+
+    Szybsze od insert_detected_objects przy dużych ilościach wierszy (np. ponowna analiza archiwum zdjęć).
+    Parametry jak w insert_detected_objects, ale połączenie jest wymagane.
+
+    Zwraca:
+    - True, jeśli operacja się powiodła, False w przeciwnym przypadku
+    """
+    rows = [normalize_detection_row(row) for row in rows]
+    if not rows:
+        return True
+
+    try:
+        ensure_table_exists(conn)
+        ensure_month_partitions(conn, [row[2] for row in rows])
+
+        # Wiersze w formacie CSV - puste pole bez cudzysłowów to NULL
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['' if value is None else value.isoformat(sep=' ') if isinstance(value, datetime) else value
+                             for value in row])
+        buffer.seek(0)
+        with conn.cursor() as cursor:
+            cursor.copy_expert("COPY WYKRYTE_OBIEKTY (OBIEKT, PROCENT, CZAS, KAMERA, KLATKA, X1, Y1, X2, Y2) "
+                               "FROM STDIN WITH (FORMAT csv)", buffer)
+        conn.commit()
+        logger.debug(f"Skopiowano {len(rows)} wykrytych obiektów do bazy danych")
+        return True
+    except Exception as e:
+        logger.error(f"Błąd podczas kopiowania danych: {e}")
+        conn.rollback()
+        return False
+
+class DetectionWriter:
+    """
+    Asynchroniczny, buforowany zapis detekcji do tabeli WYKRYTE_OBIEKTY.
+
+    Wywołujący (żądania HTTP, wątek kamery) jedynie dodają detekcje do ograniczonej kolejki i wracają
+    natychmiast. Wątek w tle zbiera je w paczki i zapisuje jedną transakcją (execute_values), gdy paczka
+    osiągnie batch_size albo upłynie flush_interval sekund. Gdy baza jest niedostępna, paczka jest
+    ponawiana z rosnącym opóźnieniem, a nowe detekcje czekają w kolejce; po jej zapełnieniu kolejne
+    detekcje są odrzucane (backpressure) i liczone w statystykach.
+    
+    Parametry:
+    - batch_size: maksymalna liczba detekcji zapisywanych w jednej transakcji
+    - flush_interval: maksymalny czas (s), przez jaki detekcja czeka na zapis
+    - max_queue: pojemność kolejki detekcji oczekujących na zapis
+    - enqueue_timeout: jak długo (s) dodawanie może czekać na miejsce w pełnej kolejce (0 - wcale)
+    - retry_backoff_max: maksymalne opóźnienie (s) między ponowieniami nieudanego zapisu
+    - pool: pula połączeń (domyślnie współdzielona pula z get_connection_pool())
+    """
+
+    def __init__(self, batch_size=500, flush_interval=2.0, max_queue=50000, enqueue_timeout=0.0,
+                 retry_backoff_max=30.0, pool=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self.retry_backoff_max = retry_backoff_max
+        self.pool = pool
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self.rows_enqueued = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.rows_lost_on_shutdown = 0
+        self.flush_failures = 0
+        self.max_queue_depth = 0
+        self.enqueue_wait_seconds = 0.0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        """Uruchamia wątek zapisujący."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="detection-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, obiekt, procent, czas=None, kamera=None):
+        """Dodaje jedną detekcję do kolejki zapisu. Zwraca True, jeśli została przyjęta."""
+        return self.add_many([(obiekt, procent, czas, kamera)]) == 1
+
+    def add_many(self, rows):
+        """Dodaje detekcje (krotki jak w insert_detected_objects) do kolejki zapisu. Zwraca liczbę przyjętych."""
+        accepted = 0
+        dropped = 0
+        started = time.time()
+        for row in rows:
+            row = normalize_detection_row(row)
+            try:
+                if self.enqueue_timeout > 0:
+                    self._queue.put(row, timeout=self.enqueue_timeout)
+                else:
+                    self._queue.put_nowait(row)
+                accepted += 1
+            except queue.Full:
+                dropped += 1
+        waited = time.time() - started
+        with self._stats_lock:
+            self.rows_enqueued += accepted
+            self.rows_dropped += dropped
+            self.enqueue_wait_seconds += waited
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        DB_ROWS.inc(accepted, result='enqueued')
+        if dropped:
+            DB_ROWS.inc(dropped, result='dropped')
+            logger.warning(f"Kolejka zapisu detekcji pełna ({self.max_queue}). Odrzucono {dropped} detekcji.")
+        return accepted
+
+    def flush(self, timeout=10.0):
+        """Czeka, aż wszystkie detekcje z kolejki zostaną zapisane. Zwraca True, jeśli kolejka została opróżniona."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if time.time() >= deadline or self._thread is None or not self._thread.is_alive():
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _collect(self, max_rows):
+        rows = []
+        deadline = time.time() + self.flush_interval
+        while len(rows) < max_rows:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        pending = []
+        backoff = self.flush_interval
+        while True:
+            if len(pending) < self.batch_size:
+                pending.extend(self._collect(self.batch_size - len(pending)))
+            if pending:
+                if self._write_batch(pending):
+                    for _ in pending:
+                        self._queue.task_done()
+                    pending = []
+                    backoff = self.flush_interval
+                else:
+                    # Paczka zostaje w pamięci i zostanie ponowiona; nowe detekcje czekają w kolejce
+                    if self._stop_event.wait(backoff):
+                        break
+                    backoff = min(backoff * 2, self.retry_backoff_max)
+            elif self._stop_event.is_set():
+                break
+        lost = len(pending) + self._queue.qsize()
+        if lost:
+            self.rows_lost_on_shutdown += lost
+            logger.warning(f"Zatrzymano zapis detekcji. {lost} detekcji nie zostało zapisanych do bazy danych.")
+
+    def _write_batch(self, batch):
+        pool = self.pool or get_connection_pool()
+        started = time.time()
+        try:
+            with pool.connection() as conn:
+                written = insert_detected_objects(batch, conn)
+        except Exception as e:
+            logger.warning(f"Nie udało się zapisać paczki detekcji: {e}")
+            written = False
+        STAGE_LATENCY.observe(time.time() - started, stage='db_insert')
+        DB_ROWS.inc(len(batch), result='written' if written else 'failed')
+        with self._stats_lock:
+            self.last_flush_seconds = time.time() - started
+            if written:
+                self.rows_written += len(batch)
+            else:
+                self.flush_failures += 1
+        return written
+
+    def stats(self):
+        """Zwraca metryki kolejki zapisu (głębokość, odrzucone, zapisane, czas oczekiwania)."""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self.max_queue,
+                'max_queue_depth': self.max_queue_depth,
+                'rows_enqueued': self.rows_enqueued,
+                'rows_written': self.rows_written,
+                'rows_dropped': self.rows_dropped,
+                'rows_lost_on_shutdown': self.rows_lost_on_shutdown,
+                'flush_failures': self.flush_failures,
+                'enqueue_wait_seconds': self.enqueue_wait_seconds,
+                'last_flush_seconds': self.last_flush_seconds
+            }
+
+    def close(self, timeout=10.0):
+        """Opróżnia kolejkę (czekając najwyżej timeout sekund) i zatrzymuje wątek zapisujący."""
+        if self._thread is None:
+            return
+        if not self.flush(timeout):
+            logger.warning("Nie udało się zapisać wszystkich detekcji przed zamknięciem.")
+        self._stop_event.set()
+        self._thread.join(timeout=self.flush_interval + 5.0)
+        self._thread = None
 
 if __name__ == "__main__":
+    from logging_config import configure_logging
+    configure_logging()
     # Test połączenia i wstawiania danych
-    conn = get_db_connection()
-    if conn:
-        create_table_if_not_exists(conn)
+    pool = get_connection_pool()
+    if pool.is_available():
+        with pool.connection() as conn:
+            create_table_if_not_exists(conn)
         # Wstawiamy dane tylko raz na sesję
-        insert_detected_object("Człowiek", 95.5, conn=conn)
-        insert_detected_object("Pies", 87.2, conn=conn)
-        conn.close()
+        insert_detected_object("Człowiek", 95.5)
+        insert_detected_object("Pies", 87.2)
+        pool.close()
         print("Test zakończony pomyślnie")
     else:
         print("Nie można nawiązać połączenia z bazą danych")
\ No newline at end of file
@@ -0,0 +1,73 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class DetectionCache:
+    """
+    Ograniczony cache wyników detekcji (LRU) kluczowany ścieżką zdjęcia oraz jego mtime i rozmiarem.
+
+    Dzięki temu wielokrotne zapytania o to samo, niezmienione zdjęcie nie uruchamiają ponownie modelu YOLO.
+    Podmiana pliku pod tą samą nazwą zmienia mtime/rozmiar, więc stary wpis nie zostanie użyty.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(image_path):
+        """Zwraca klucz (ścieżka, mtime_ns, rozmiar) dla pliku lub None, jeśli pliku nie ma."""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size)
+
+    def get(self, key, record_stats=True):
+        """Zwraca zapisany wynik dla klucza lub None. Domyślnie aktualizuje liczniki trafień i chybień."""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if record_stats:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if record_stats:
+                self.hits += 1
+            return entry
+
+    def put(self, key, value):
+        """Zapisuje wynik dla klucza, usuwając najdawniej używane wpisy po przekroczeniu limitu."""
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Usuwa wszystkie wpisy (liczniki pozostają bez zmian)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Zwraca słownik ze statystykami cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits / total) if total else 0.0
+            }
@@ -0,0 +1,252 @@
+import json
+import uuid
+import threading
+import logging
+from datetime import datetime
+from flask import Response, jsonify, request
+from db_connector import ensure_table_exists
+
+logger = logging.getLogger(__name__)
+
+# Ograniczenia API /detections
+DETECTIONS_DEFAULT_LIMIT = 1000
+DETECTIONS_MAX_LIMIT = 50000
+# Liczba wierszy pobieranych z kursora po stronie serwera w jednej porcji
+FETCH_SIZE = 2000
+# Maksymalna liczba jednocześnie strumieniowanych odpowiedzi i czas oczekiwania (s) na wolne miejsce -
+# każdy strumień trzyma połączenie z puli, więc reszta połączeń zostaje dla kamer i zapisu detekcji
+MAX_CONCURRENT_STREAMS = 4
+STREAM_SLOT_TIMEOUT = 5.0
+BUCKETS = ('minute', 'hour', 'day')
+
+_stream_slots = threading.BoundedSemaphore(MAX_CONCURRENT_STREAMS)
+
+
+class TooManyStreamsError(Exception):
+    """Wszystkie miejsca na strumieniowane odpowiedzi są zajęte."""
+
+
+class DetectionQuery:
+    """
+    Filtry zapytania o historię detekcji (zakres czasu, obiekt, kamera).
+
+    Zakres jest domknięty z lewej i otwarty z prawej: from <= CZAS < to.
+    """
+
+    def __init__(self, time_from=None, time_to=None, objects=None, camera=None):
+        self.time_from = time_from
+        self.time_to = time_to
+        self.objects = objects or []
+        self.camera = camera
+
+    def where(self, after=None, descending=False):
+        """Zwraca (warunek WHERE, parametry); after to kursor (czas, id) ostatniego wiersza poprzedniej strony."""
+        conditions = []
+        params = []
+        if self.time_from is not None:
+            conditions.append("CZAS >= %s")
+            params.append(self.time_from)
+        if self.time_to is not None:
+            conditions.append("CZAS < %s")
+            params.append(self.time_to)
+        if self.objects:
+            conditions.append("OBIEKT = ANY(%s)")
+            params.append(self.objects)
+        if self.camera is not None:
+            conditions.append("KAMERA = %s")
+            params.append(self.camera)
+        if after is not None:
+            conditions.append("(CZAS, ID) < (%s, %s)" if descending else "(CZAS, ID) > (%s, %s)")
+            params.extend(after)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def parse_time(value):
+    """Czas w formacie ISO 8601; czas ze strefą jest zamieniany na czas lokalny (CZAS jest bez strefy)."""
+    if value is None or value == '':
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def encode_cursor(czas, detection_id):
+    return f"{czas.isoformat()}_{detection_id}"
+
+def decode_cursor(value):
+    if not value:
+        return None
+    czas, _, detection_id = value.rpartition('_')
+    return datetime.fromisoformat(czas), int(detection_id)
+
+def parse_detection_query(args):
+    """Filtry z parametrów zapytania: from, to, object (można powtórzyć lub rozdzielić przecinkami), camera."""
+    objects = []
+    for value in args.getlist('object'):
+        objects.extend(name.strip() for name in value.split(',') if name.strip())
+    return DetectionQuery(time_from=parse_time(args.get('from')),
+                          time_to=parse_time(args.get('to')),
+                          objects=objects,
+                          camera=args.get('camera') or None)
+
+def _fetch_batches(cursor):
+    """Wiersze kursora po stronie serwera pobierane porcjami po FETCH_SIZE."""
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+def iter_detections(conn, query, limit, after=None, descending=False):
+    """
+    Zwraca wiersze (id, obiekt, procent, czas, kamera, klatka, x1, y1, x2, y2) kolejno z kursora po stronie serwera.
+
+    Wiersze są pobierane porcjami po FETCH_SIZE (fetchmany), więc duże wyniki nie są ładowane do pamięci.
+    Kolejność (CZAS, ID) odpowiada indeksom, dzięki czemu kolejna strona (after) nie wymaga OFFSET.
+    """
+    where, params = query.where(after, descending)
+    direction = "DESC" if descending else "ASC"
+    with conn.cursor(name=f"detections_{uuid.uuid4().hex}") as cursor:
+        cursor.execute(f"""
+        SELECT ID, OBIEKT, PROCENT, CZAS, KAMERA, KLATKA, X1, Y1, X2, Y2
+        FROM WYKRYTE_OBIEKTY{where}
+        ORDER BY CZAS {direction}, ID {direction}
+        LIMIT %s;
+        """, params + [limit])
+        yield from _fetch_batches(cursor)
+
+def iter_detection_counts(conn, query, bucket):
+    """Zwraca (początek przedziału, obiekt, liczba detekcji) zliczone w bazie w przedziałach bucket."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"Nieznany przedział: {bucket}")
+    where, params = query.where()
+    with conn.cursor(name=f"detection_counts_{uuid.uuid4().hex}") as cursor:
+        cursor.execute(f"""
+        SELECT date_trunc(%s, CZAS) AS PRZEDZIAL, OBIEKT, COUNT(*)
+        FROM WYKRYTE_OBIEKTY{where}
+        GROUP BY PRZEDZIAL, OBIEKT
+        ORDER BY PRZEDZIAL, OBIEKT;
+        """, [bucket] + params)
+        yield from _fetch_batches(cursor)
+
+def _stream_rows(pool, iter_rows, format_row, header, footer):
+    """
+    Generator fragmentów odpowiedzi JSON: header, wiersze rozdzielone przecinkami
+    i footer(ostatni wiersz, liczba wierszy).
+
+    Połączenie z puli jest trzymane przez cały czas strumieniowania i zwracane po jego zakończeniu
+    (także gdy klient się rozłączy). Jednocześnie trwa najwyżej MAX_CONCURRENT_STREAMS strumieni -
+    gdy wszystkie miejsca są zajęte dłużej niż STREAM_SLOT_TIMEOUT, zgłaszany jest TooManyStreamsError.
+    """
+    if not _stream_slots.acquire(timeout=STREAM_SLOT_TIMEOUT):
+        raise TooManyStreamsError("Zbyt wiele jednoczesnych zapytań o detekcje")
+    try:
+        with pool.connection() as conn:
+            ensure_table_exists(conn)
+            rows = iter_rows(conn)
+            # Zapytanie jest wykonywane przy pobraniu pierwszego wiersza, jeszcze przed wysłaniem nagłówka
+            row = next(rows, None)
+            yield header
+            last_row = None
+            count = 0
+            while row is not None:
+                yield ("," if count else "") + json.dumps(format_row(row), ensure_ascii=False)
+                last_row = row
+                count += 1
+                row = next(rows, None)
+            conn.rollback()
+            yield footer(last_row, count)
+    finally:
+        _stream_slots.release()
+
+def _streamed_response(stream):
+    """
+    Odpowiedź strumieniowana. Pierwszy fragment jest pobierany przed wysłaniem nagłówków,
+    więc błąd połączenia z bazą danych lub zapytania kończy się odpowiedzią 503, a nie uciętym strumieniem.
+    """
+    try:
+        first = next(stream)
+    except TooManyStreamsError as e:
+        logger.warning(f"Odrzucono zapytanie o detekcje: {e}")
+        response = jsonify({'status': 'error', 'message': 'Zbyt wiele jednoczesnych zapytań. Spróbuj ponownie za chwilę.'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    except Exception as e:
+        logger.error(f"Błąd podczas odczytu detekcji: {e}")
+        return jsonify({'status': 'error', 'message': 'Baza danych jest niedostępna.'}), 503
+
+    def generate():
+        try:
+            yield first
+            yield from stream
+        except Exception as e:
+            # Nagłówki zostały już wysłane - klient dostanie niepoprawny (ucięty) JSON
+            logger.error(f"Błąd podczas strumieniowania detekcji: {e}")
+        finally:
+            # Rozłączenie klienta - połączenie z bazą i miejsce strumienia są zwalniane od razu
+            stream.close()
+
+    response = Response(generate(), mimetype='application/json')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def format_detection(row):
+    detection_id, obiekt, procent, czas, kamera, klatka, x1, y1, x2, y2 = row
+    return {
+        'id': detection_id,
+        'object': obiekt,
+        'confidence': float(procent) if procent is not None else None,
+        'time': czas.isoformat() if czas is not None else None,
+        'camera': kamera,
+        'frame': klatka,
+        # Wiersze zapisane przed dodaniem ramek (podsumowania sesji) nie mają ramki
+        'box': [x1, y1, x2, y2] if x1 is not None else None
+    }
+
+def detections_response(pool):
+    """
+    GET /detections?from=&to=&object=&camera=&limit=&order=asc|desc&cursor=
+
+    Zwraca {"status", "detections": [...], "next_cursor"}; next_cursor przekazany jako cursor
+    zwraca następną stronę (null - brak kolejnych wierszy).
+    """
+    try:
+        query = parse_detection_query(request.args)
+        limit = max(1, min(request.args.get('limit', DETECTIONS_DEFAULT_LIMIT, type=int), DETECTIONS_MAX_LIMIT))
+        descending = request.args.get('order', 'asc') == 'desc'
+        after = decode_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Nieprawidłowe parametry zapytania: {e}'}), 400
+
+    def footer(last_row, count):
+        # Pełna strona oznacza, że mogą istnieć kolejne wiersze
+        next_cursor = encode_cursor(last_row[3], last_row[0]) if count >= limit else None
+        return '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+
+    stream = _stream_rows(pool,
+                          lambda conn: iter_detections(conn, query, limit, after, descending),
+                          format_detection,
+                          '{"status": "success", "detections": [',
+                          footer)
+    return _streamed_response(stream)
+
+def detection_counts_response(pool):
+    """
+    GET /detections/counts?bucket=minute|hour|day&from=&to=&object=&camera=
+
+    Liczby detekcji zliczone w bazie danych w przedziałach czasu, osobno dla każdego obiektu.
+    """
+    bucket = request.args.get('bucket', 'hour')
+    if bucket not in BUCKETS:
+        return jsonify({'status': 'error', 'message': f'Nieprawidłowy przedział: {bucket}. Dozwolone: {", ".join(BUCKETS)}.'}), 400
+    try:
+        query = parse_detection_query(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Nieprawidłowe parametry zapytania: {e}'}), 400
+
+    stream = _stream_rows(pool,
+                          lambda conn: iter_detection_counts(conn, query, bucket),
+                          lambda row: {'bucket': row[0].isoformat(), 'object': row[1], 'count': row[2]},
+                          '{"status": "success", "bucket": ' + json.dumps(bucket) + ', "counts": [',
+                          lambda last_row, count: ']}')
+    return _streamed_response(stream)
@@ -0,0 +1,123 @@
+import json
+import collections
+import queue
+import threading
+
+
+class EventBus:
+    """
+    Prosta szyna zdarzeń publish/subscribe dla strumienia Server-Sent Events.
+
+    Każdy subskrybent ma własną ograniczoną kolejkę; gdy klient nie nadąża, najstarsze zdarzenia
+    są odrzucane, więc wolny klient nie blokuje publikującego wątku (np. pętli przechwytywania).
+    """
+
+    def __init__(self, max_queue=32):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.events_published = 0
+        self.events_dropped = 0
+
+    def subscribe(self):
+        """Rejestruje nowego subskrybenta i zwraca jego kolejkę."""
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Wyrejestrowuje subskrybenta."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event_type, data):
+        """Wysyła zdarzenie do wszystkich subskrybentów."""
+        event = (event_type, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.events_published += 1
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                        self.events_dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class EventLog:
+    """
+    Numerowany dziennik ostatnich zdarzeń z szyny do odczytu przez inne procesy (long polling).
+
+    Proces właściciela kamer udostępnia events_since() przez IPC, a procesy HTTP publikują
+    odczytane zdarzenia w swoich lokalnych szynach, z których korzystają strumienie SSE.
+    """
+
+    def __init__(self, event_bus, max_events=256):
+        self.event_bus = event_bus
+        self._events = collections.deque(maxlen=max_events)
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        subscriber = self.event_bus.subscribe()
+        self._thread = threading.Thread(target=self._run, args=(subscriber,), name="event-log", daemon=True)
+        self._thread.start()
+
+    def _run(self, subscriber):
+        while True:
+            event_type, data = subscriber.get()
+            with self._condition:
+                self._seq += 1
+                self._events.append((self._seq, event_type, data))
+                self._condition.notify_all()
+
+    def events_since(self, last_seq, timeout=10.0):
+        """
+        Zwraca (ostatni numer, lista (numer, typ, dane)) zdarzeń nowszych niż last_seq.
+
+        Czeka najwyżej timeout sekund na nowe zdarzenie. Zdarzenia starsze niż dziennik są pomijane.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > last_seq, timeout=timeout)
+            return self._seq, [event for event in self._events if event[0] > last_seq]
+
+
+def format_sse(event_type, data):
+    """Formatuje zdarzenie w formacie text/event-stream."""
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def generate_event_stream(event_bus, initial_events=(), keepalive_interval=15.0):
+    """
+    Generator odpowiedzi text/event-stream dla jednego klienta.
+
+    Najpierw wysyła initial_events (aktualny stan w chwili połączenia), potem zdarzenia z szyny.
+    Przy braku zdarzeń co keepalive_interval sekund wysyła komentarz podtrzymujący połączenie.
+    """
+    subscriber = event_bus.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        for event_type, data in initial_events:
+            yield format_sse(event_type, data)
+        while True:
+            try:
+                event_type, data = subscriber.get(timeout=keepalive_interval)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event_type, data)
+    finally:
+        event_bus.unsubscribe(subscriber)
@@ -0,0 +1,99 @@
+import cv2
+import time
+import threading
+import numpy as np
+
+
+class FakeVideoCapture:
+    """
+    Zastępnik cv2.VideoCapture bez fizycznej kamery - do testów wydajności i pracy bez urządzenia.
+
+    Źródłem klatek jest plik wideo (odtwarzany w pętli) albo obraz syntetyczny: szum tła i prostokąt
+    przesuwający się po klatce (przy moving=False scena jest statyczna, np. do sprawdzenia filtra ruchu).
+    grab() jest taktowane na fps klatek na sekundę, jak sterownik kamery, a retrieve() zwraca
+    ostatnią pobraną klatkę. Obsługiwany jest podzbiór API używany przez FrameGrabber i camera_devices.
+    """
+
+    def __init__(self, source=None, width=1280, height=720, fps=30.0, moving=True, seed=0):
+        self.fps = fps
+        self.moving = moving
+        self._video = None
+        if source is not None:
+            self._video = cv2.VideoCapture(source)
+            if not self._video.isOpened():
+                raise ValueError(f"Nie można otworzyć pliku wideo {source}")
+            width = int(self._video.get(cv2.CAP_PROP_FRAME_WIDTH)) or width
+            height = int(self._video.get(cv2.CAP_PROP_FRAME_HEIGHT)) or height
+        self.width = width
+        self.height = height
+        rng = np.random.default_rng(seed)
+        self._background = rng.integers(0, 60, size=(height, width, 3), dtype=np.uint8)
+        self._frame = None
+        self._index = 0
+        self._next_grab = None
+        self._opened = True
+        self._lock = threading.Lock()
+        self.frames_grabbed = 0
+
+    def isOpened(self):
+        return self._opened
+
+    def _synthetic_frame(self):
+        frame = self._background.copy()
+        size = max(16, self.height // 4)
+        offset = (self._index * 8) % max(1, self.width - size) if self.moving else self.width // 3
+        cv2.rectangle(frame, (offset, self.height // 3), (offset + size, self.height // 3 + size), (0, 200, 255), -1)
+        return frame
+
+    def _video_frame(self):
+        ok, frame = self._video.read()
+        if not ok:
+            # Koniec pliku - odtwarzanie od początku
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._video.read()
+        return frame if ok else None
+
+    def grab(self):
+        with self._lock:
+            if not self._opened:
+                return False
+            if self.fps > 0:
+                now = time.monotonic()
+                if self._next_grab is None:
+                    self._next_grab = now
+                elif now < self._next_grab:
+                    time.sleep(self._next_grab - now)
+                self._next_grab = max(self._next_grab + 1.0 / self.fps, time.monotonic() - 1.0 / self.fps)
+            self._frame = self._video_frame() if self._video is not None else self._synthetic_frame()
+            self._index += 1
+            self.frames_grabbed += 1
+            return self._frame is not None
+
+    def retrieve(self):
+        with self._lock:
+            if self._frame is None:
+                return False, None
+            return True, self._frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        return 0.0
+
+    def release(self):
+        with self._lock:
+            self._opened = False
+            if self._video is not None:
+                self._video.release()
@@ -0,0 +1,121 @@
+import cv2
+import time
+import threading
+
+
+def encode_jpeg(frame, width=None, jpeg_quality=80):
+    """Koduje klatkę do JPEG, opcjonalnie zmniejszając ją do szerokości width. Zwraca bajty lub None."""
+    image = frame
+    if width and width < frame.shape[1]:
+        height = max(1, int(frame.shape[0] * width / frame.shape[1]))
+        image = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality])
+    return encoded.tobytes() if ok else None
+
+
+class LatestFrameBuffer:
+    """
+    Współdzielony bufor z najnowszą klatką z kamery.
+
+    Przechowuje tylko ostatnią klatkę (nie kolejkę), więc wolni odbiorcy pomijają klatki zamiast
+    gromadzić je w pamięci. Zakodowany JPEG jest liczony raz dla danej klatki i szerokości,
+    niezależnie od liczby podłączonych klientów.
+    """
+
+    def __init__(self, jpeg_quality=80):
+        self.jpeg_quality = jpeg_quality
+        self._condition = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._published_at = None
+        self._encoded = {}
+        self._encode_lock = threading.Lock()
+        self._listeners = []
+        self.frames_published = 0
+        self.frames_encoded = 0
+
+    def publish(self, frame):
+        """Zastępuje najnowszą klatkę i budzi oczekujących odbiorców."""
+        with self._condition:
+            self._frame = frame
+            self._seq += 1
+            self._published_at = time.time()
+            self._encoded = {}
+            self.frames_published += 1
+            self._condition.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(frame)
+
+    def add_listener(self, listener):
+        """Rejestruje funkcję wywoływaną z każdą opublikowaną klatką (np. kopia do pamięci współdzielonej)."""
+        with self._condition:
+            self._listeners.append(listener)
+
+    def wait_for_frame(self, last_seq, timeout=None):
+        """Czeka na klatkę nowszą niż last_seq. Zwraca jej numer lub None po upływie timeout."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._seq > last_seq, timeout=timeout):
+                return None
+            return self._seq
+
+    def latest(self):
+        """Zwraca (numer, klatka, czas publikacji) najnowszej klatki lub (0, None, None)."""
+        with self._condition:
+            return self._seq, self._frame, self._published_at
+
+    def get_jpeg(self, width=None):
+        """
+        Zwraca (numer klatki, bajty JPEG) najnowszej klatki, opcjonalnie przeskalowanej do szerokości width.
+
+        Wynik kodowania jest zapamiętywany do czasu publikacji kolejnej klatki.
+        """
+        with self._condition:
+            seq, frame = self._seq, self._frame
+            cached = self._encoded.get(width)
+        if frame is None:
+            return seq, None
+        if cached is not None:
+            return seq, cached
+
+        with self._encode_lock:
+            with self._condition:
+                # Inny klient mógł zakodować tę klatkę, gdy czekaliśmy na blokadę
+                if self._seq == seq and width in self._encoded:
+                    return seq, self._encoded[width]
+            data = encode_jpeg(frame, width, self.jpeg_quality)
+            if data is None:
+                return seq, None
+            self.frames_encoded += 1
+            with self._condition:
+                if self._seq == seq:
+                    self._encoded[width] = data
+        return seq, data
+
+
+def generate_mjpeg_stream(frame_buffer, max_fps=5.0, width=None, idle_timeout=60.0, boundary='frame'):
+    """
+    Generator odpowiedzi multipart/x-mixed-replace dla jednego klienta.
+
+    Wysyła najnowszą klatkę z bufora nie częściej niż max_fps razy na sekundę. Gdy przez
+    idle_timeout sekund nie pojawi się nowa klatka (np. kamera wyłączona), strumień się kończy.
+    """
+    min_interval = 1.0 / max_fps if max_fps > 0 else 0
+    last_seq = 0
+    last_sent = 0.0
+    while True:
+        seq = frame_buffer.wait_for_frame(last_seq, timeout=idle_timeout)
+        if seq is None:
+            return
+        # Ograniczenie liczby klatek na sekundę dla klienta - klatki opublikowane w tym czasie są pomijane
+        delay = min_interval - (time.time() - last_sent)
+        if delay > 0:
+            time.sleep(delay)
+        seq, jpeg = frame_buffer.get_jpeg(width)
+        last_seq = seq
+        if jpeg is None:
+            continue
+        last_sent = time.time()
+        yield (f"--{boundary}\r\n"
+               f"Content-Type: image/jpeg\r\n"
+               f"Content-Length: {len(jpeg)}\r\n\r\n").encode('ascii') + jpeg + b"\r\n"
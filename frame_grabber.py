@@ -0,0 +1,138 @@
+import time
+import threading
+import logging
+from metrics import STAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+class FrameGrabber:
+    """
+    Wątek, który ciągle pobiera klatki z otwartej kamery (cap.grab()) w tempie urządzenia.
+
+    Bufor sterownika (V4L2/DirectShow) jest dzięki temu stale opróżniany, a najnowsza klatka jest
+    dekodowana (cap.retrieve()) do chronionego blokadą slotu, najwyżej max_decode_fps razy na sekundę.
+    Pętla przechwytywania, strumień na żywo i zdjęcia na żądanie czytają klatkę ze slotu, bez
+    operacji na kamerze. Pobrane, ale niezdekodowane klatki są liczone jako pominięte.
+
+    Parametry:
+    - cap: otwarta instancja cv2.VideoCapture (grabber jest jedynym wątkiem, który jej używa)
+    - on_frame: opcjonalna funkcja wywoływana z każdą zdekodowaną klatką (np. publikacja do strumienia)
+    - max_decode_fps: maksymalna liczba dekodowanych klatek na sekundę
+    """
+
+    def __init__(self, cap, name="camera", on_frame=None, max_decode_fps=10.0):
+        self.cap = cap
+        self.name = name
+        self.on_frame = on_frame
+        self.decode_interval = 1.0 / max_decode_fps if max_decode_fps > 0 else 0.0
+        self._condition = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._frame_time = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.grab_failures = 0
+        self.total_grab_time = 0.0
+        self.max_grab_time = 0.0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"grabber-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Zatrzymuje wątek. Po powrocie (jeśli wątek się zakończył) kamerę można bezpiecznie zwolnić."""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+            if thread.is_alive():
+                logger.warning(f"[{self.name}] Wątek pobierania klatek nie zakończył się w oczekiwanym czasie.")
+
+    def _run(self):
+        last_decode = 0.0
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                ok = self.cap.grab()
+            except Exception as e:
+                logger.error(f"[{self.name}] Błąd podczas pobierania klatki: {e}")
+                ok = False
+            grab_time = time.monotonic() - started
+            if not ok:
+                self.grab_failures += 1
+                # Kamera odłączona lub chwilowo niedostępna - nie obciążamy procesora pętlą błędów
+                self._stop_event.wait(0.1)
+                continue
+            self.frames_grabbed += 1
+            self.total_grab_time += grab_time
+            STAGE_LATENCY.observe(grab_time, stage='grab')
+            self.max_grab_time = max(self.max_grab_time, grab_time)
+
+            now = time.monotonic()
+            if now - last_decode < self.decode_interval:
+                self.frames_dropped += 1
+                continue
+            decode_started = time.monotonic()
+            try:
+                ok, frame = self.cap.retrieve()
+            except Exception as e:
+                logger.error(f"[{self.name}] Błąd podczas dekodowania klatki: {e}")
+                ok, frame = False, None
+            if not ok or frame is None:
+                self.grab_failures += 1
+                continue
+            last_decode = now
+            self.frames_decoded += 1
+            STAGE_LATENCY.observe(time.monotonic() - decode_started, stage='decode')
+            with self._condition:
+                self._frame = frame
+                self._seq += 1
+                self._frame_time = time.time()
+                self._condition.notify_all()
+            if self.on_frame is not None:
+                try:
+                    self.on_frame(frame)
+                except Exception as e:
+                    logger.exception(f"[{self.name}] Błąd podczas publikacji klatki: {e}")
+
+    def latest(self):
+        """Zwraca (numer, klatka, czas pobrania) najnowszej klatki lub (0, None, None)."""
+        with self._condition:
+            return self._seq, self._frame, self._frame_time
+
+    def read(self, max_age=2.0, timeout=2.0):
+        """
+        Zwraca najnowszą klatkę nie starszą niż max_age sekund, czekając na nią najwyżej timeout sekund.
+
+        Zwraca None, jeśli świeża klatka nie jest dostępna (np. kamera przestała dostarczać obraz).
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            while self._frame is None or time.time() - self._frame_time > max_age:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            return self._frame
+
+    def stats(self):
+        grabbed = self.frames_grabbed
+        with self._condition:
+            frame_age = time.time() - self._frame_time if self._frame_time is not None else None
+        return {
+            'running': self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set(),
+            'frames_grabbed': grabbed,
+            'frames_decoded': self.frames_decoded,
+            'frames_dropped': self.frames_dropped,
+            'grab_failures': self.grab_failures,
+            'avg_grab_ms': self.total_grab_time / grabbed * 1000 if grabbed else 0.0,
+            'max_grab_ms': self.max_grab_time * 1000,
+            'latest_frame_age_seconds': frame_age
+        }
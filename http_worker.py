@@ -0,0 +1,340 @@
+import os
+import argparse
+import threading
+import logging
+from flask import Flask, Response, render_template, send_from_directory, url_for, request, jsonify, stream_with_context
+from frame_buffer import generate_mjpeg_stream
+from event_bus import EventBus, generate_event_stream
+from stream_limit import StreamLimiter, load_http_settings, too_many_streams
+from image_server import ThumbnailCache, send_photo
+from db_connector import get_connection_pool
+from detection_store import detections_response, detection_counts_response
+from shared_frame import SharedFrameReader, shared_frame_name
+from camera_service import CameraServiceClient, CameraServiceUnavailable, EventRelay, load_camera_service_address
+from logging_config import configure_logging
+from metrics import instrument_flask_app, render_metrics
+
+logger = logging.getLogger(__name__)
+
+# Proces HTTP trybu produkcyjnego. Kamery i model należą do jednego procesu właściciela
+# (python serwer.py --owner); procesów HTTP może być dowolnie wiele, np.:
+#   HTTP_THREADS=64 gunicorn -w 4 --threads 64 -b 0.0.0.0:8898 http_worker:app
+# Nie ładują modelu ani nie otwierają kamer - komendy i stan idą przez IPC, a klatki
+# strumienia na żywo są czytane z pamięci współdzielonej.
+
+# Proces jest zwykle uruchamiany przez serwer WSGI, więc logowanie jest konfigurowane przy imporcie
+configure_logging()
+
+app = Flask(__name__, template_folder='template', static_folder='template')
+instrument_flask_app(app)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CAMERA_FOLDER = os.path.join(current_dir, "kamera")
+
+STREAM_DEFAULT_FPS = 5
+STREAM_MAX_FPS = 15
+STREAM_MAX_WIDTH = 1280
+STREAM_IDLE_TIMEOUT = 30
+SSE_KEEPALIVE_INTERVAL = 15
+
+# Strumienie SSE i MJPEG trzymają wątek przez cały czas połączenia - HTTP_THREADS powinno być równe liczbie
+# wątków serwera WSGI (gunicorn --threads), a limit strumieni (MAX_HTTP_STREAMS) to domyślnie jego połowa
+http_threads, max_http_streams = load_http_settings()
+stream_limiter = StreamLimiter(max_http_streams)
+
+SERVICE_UNAVAILABLE_MESSAGE = 'Usługa kamer jest niedostępna. Sprawdź, czy działa proces właściciela (serwer.py --owner).'
+
+service_address, service_authkey = load_camera_service_address()
+camera_service = CameraServiceClient(service_address, service_authkey)
+
+# Historia detekcji (/detections) jest czytana bezpośrednio z bazy danych, z własnej puli połączeń procesu
+db_pool = get_connection_pool()
+
+# Lokalna szyna zdarzeń zasilana z procesu właściciela przez jeden wątek na proces
+event_bus = EventBus()
+event_relay = EventRelay(camera_service, event_bus)
+
+# Miniatury są skalowane w procesie HTTP - proces właściciela nie bierze udziału w serwowaniu zdjęć
+thumbnail_cache = ThumbnailCache()
+
+frame_readers = {}
+frame_readers_lock = threading.Lock()
+
+def get_frame_reader(camera_id):
+    """Czytnik pamięci współdzielonej z najnowszą klatką kamery (jeden na kamerę w procesie)."""
+    with frame_readers_lock:
+        reader = frame_readers.get(camera_id)
+        if reader is None:
+            reader = SharedFrameReader(shared_frame_name(camera_id))
+            frame_readers[camera_id] = reader
+        return reader
+
+def service_unavailable():
+    return jsonify({'status': 'error', 'message': SERVICE_UNAVAILABLE_MESSAGE}), 503
+
+def unknown_camera(camera_id):
+    return jsonify({'status': 'error', 'message': f'Nieznana kamera: {camera_id}.'}), 404
+
+def check_camera(camera_id):
+    """
+    Odpowiedź błędu dla kamery nieznanej właścicielowi (404) lub niedostępnej usługi (503), inaczej None.
+
+    Czytniki pamięci współdzielonej są tworzone tylko dla zarejestrowanych kamer, więc dowolne
+    identyfikatory w adresie nie zostawiają w procesie martwych czytników.
+    """
+    try:
+        cameras = camera_service.call('list_cameras')
+    except CameraServiceUnavailable:
+        return service_unavailable()
+    if not any(camera['camera_id'] == camera_id for camera in cameras):
+        return unknown_camera(camera_id)
+    return None
+
+def with_image_url(info):
+    image_filename = info['image_filename']
+    info['image_url'] = url_for('get_camera_image', filename=image_filename, _external=True) if image_filename else None
+    return info
+
+def latest_image_info_response(camera_id=None):
+    try:
+        info = camera_service.call('latest_image_info', camera_id)
+    except CameraServiceUnavailable:
+        return service_unavailable()
+    if info is None:
+        return unknown_camera(camera_id)
+    return jsonify(with_image_url(info))
+
+def camera_command_response(camera_id=None):
+    try:
+        result = camera_service.call('camera_command', camera_id, request.get_json())
+    except CameraServiceUnavailable:
+        return service_unavailable()
+    if result is None:
+        if camera_id is not None:
+            return unknown_camera(camera_id)
+        return jsonify({'status': 'error', 'message': 'Nie można włączyć kamery, port nieznany i nie udało się go znaleźć.'}), 500
+    response, code = result
+    return jsonify(response), code
+
+def live_stream_response(camera_id):
+    """Strumień MJPEG kamery z pamięci współdzielonej (parametry fps i w jak w serwer.py)."""
+    try:
+        fps = max(0.1, min(float(request.args.get('fps', STREAM_DEFAULT_FPS)), STREAM_MAX_FPS))
+        width = request.args.get('w', type=int)
+        if width is not None:
+            width = max(16, min(width, STREAM_MAX_WIDTH))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowe parametry strumienia.'}), 400
+
+    if not stream_limiter.acquire():
+        return too_many_streams()
+    stream = stream_limiter.wrap(generate_mjpeg_stream(get_frame_reader(camera_id), max_fps=fps, width=width, idle_timeout=STREAM_IDLE_TIMEOUT))
+    response = Response(stream_with_context(stream), mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    return response
+
+def snapshot_response(camera_id):
+    """Najnowsza klatka kamery z pamięci współdzielonej jako JPEG (parametr w: szerokość)."""
+    width = request.args.get('w', type=int)
+    if width is not None:
+        width = max(16, min(width, STREAM_MAX_WIDTH))
+    _, jpeg = get_frame_reader(camera_id).get_jpeg(width)
+    if jpeg is None:
+        return jsonify({'status': 'error', 'message': 'Brak klatki z kamery. Włącz kamerę.'}), 404
+    response = Response(jpeg, mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    return response
+
+# Trasy Flask (te same co w serwer.py)
+@app.route('/')
+def home():
+    try:
+        info = camera_service.call('latest_image_info', None)
+    except CameraServiceUnavailable:
+        info = None
+    except Exception as e:
+        logger.exception(f"Błąd w home: {e}")
+        info = None
+
+    if info is None:
+        return render_template('index.html',
+                               image_exists=False,
+                               image_filename=None,
+                               detection_info="Błąd ładowania informacji.",
+                               camera_active=False,
+                               remaining_time=0,
+                               camera_id=None)
+    return render_template('index.html',
+                           image_exists=info['image_filename'] is not None,
+                           image_filename=info['image_filename'],
+                           detection_info=info['detection_info'] if info['status'] == 'success' else None,
+                           camera_active=info['camera_active'],
+                           remaining_time=info['remaining_time'],
+                           camera_id=info['camera_id'])
+
+@app.route('/kamera/<path:filename>')
+def get_camera_image(filename):
+    """Zdjęcie z kamery lub jego miniatura (?w=szerokość) z nagłówkami ETag/Last-Modified i obsługą 304."""
+    try:
+        response = send_photo(CAMERA_FOLDER, filename, thumbnail_cache)
+    except Exception as e:
+        logger.error(f"Błąd przy serwowaniu obrazu {filename}: {e}")
+        response = None
+    if response is None:
+        return "Błąd serwowania obrazu", 404
+    return response
+
+@app.route('/stream')
+def live_stream():
+    try:
+        camera_id = camera_service.call('default_camera_id')
+    except CameraServiceUnavailable:
+        return service_unavailable()
+    if camera_id is None:
+        return jsonify({'status': 'error', 'message': 'Brak zarejestrowanej kamery.'}), 404
+    return live_stream_response(camera_id)
+
+@app.route('/events')
+def events():
+    """Strumień zdarzeń Server-Sent Events przekazywanych z procesu właściciela."""
+    if not stream_limiter.acquire():
+        return too_many_streams()
+    event_relay.start()
+    try:
+        initial_events = [('camera', state) for state in camera_service.call('camera_state_events')]
+    except CameraServiceUnavailable:
+        initial_events = []
+    stream = stream_limiter.wrap(generate_event_stream(event_bus,
+                                                       initial_events=initial_events,
+                                                       keepalive_interval=SSE_KEEPALIVE_INTERVAL))
+    response = Response(stream_with_context(stream), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/style.css')
+def css():
+    return send_from_directory('template', 'style.css')
+
+@app.route('/scan-camera', methods=['GET'])
+def scan_camera():
+    try:
+        cameras = camera_service.call('scan_cameras')
+    except CameraServiceUnavailable:
+        return service_unavailable()
+    if cameras:
+        return jsonify({'status': 'success',
+                        'message': f'Znaleziono kamery: {", ".join(camera["camera_id"] for camera in cameras)}.',
+                        'camera_port': cameras[0]['port'],
+                        'cameras': cameras})
+    return jsonify({'status': 'error', 'message': 'Nie znaleziono żadnej działającej kamery.'}), 404
+
+@app.route('/cameras', methods=['GET'])
+def list_cameras():
+    try:
+        return jsonify({'status': 'success', 'cameras': camera_service.call('list_cameras')})
+    except CameraServiceUnavailable:
+        return service_unavailable()
+
+@app.route('/get-latest-image-info', methods=['GET'])
+def get_latest_image_info():
+    return latest_image_info_response()
+
+@app.route('/cameras/<camera_id>/latest-image-info', methods=['GET'])
+def get_camera_latest_image_info(camera_id):
+    return latest_image_info_response(camera_id)
+
+@app.route('/cameras/<camera_id>/stream')
+def camera_live_stream(camera_id):
+    error = check_camera(camera_id)
+    if error is not None:
+        return error
+    return live_stream_response(camera_id)
+
+@app.route('/snapshot')
+def snapshot():
+    try:
+        camera_id = camera_service.call('default_camera_id')
+    except CameraServiceUnavailable:
+        return service_unavailable()
+    if camera_id is None:
+        return jsonify({'status': 'error', 'message': 'Brak zarejestrowanej kamery.'}), 404
+    return snapshot_response(camera_id)
+
+@app.route('/cameras/<camera_id>/snapshot')
+def camera_snapshot(camera_id):
+    error = check_camera(camera_id)
+    if error is not None:
+        return error
+    return snapshot_response(camera_id)
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Gotowość procesu właściciela (model i kamery); 503, gdy jest niedostępny lub jeszcze startuje."""
+    try:
+        response, code = camera_service.call('ready_status')
+    except CameraServiceUnavailable:
+        return service_unavailable()
+    return jsonify(response), code
+
+@app.route('/detections', methods=['GET'])
+def detections():
+    """Historia detekcji z filtrami from/to/object/camera i stronicowaniem (parametr cursor)."""
+    return detections_response(db_pool)
+
+@app.route('/detections/counts', methods=['GET'])
+def detection_counts():
+    """Liczby detekcji w przedziałach minute/hour/day zliczone w bazie danych."""
+    return detection_counts_response(db_pool)
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    try:
+        result = camera_service.call('stats')
+    except CameraServiceUnavailable:
+        return service_unavailable()
+    result['http_worker'] = {
+        'pid': os.getpid(),
+        'sse_clients': event_bus.subscriber_count(),
+        'streams': stream_limiter.stats(),
+        'thumbnail_cache': thumbnail_cache.stats(),
+        'frames_encoded': {camera_id: reader.frames_encoded for camera_id, reader in frame_readers.items()}
+    }
+    return jsonify(result)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Metryki procesu właściciela (kamery, model, baza danych) i czasy żądań HTTP tego procesu."""
+    try:
+        owner_metrics = camera_service.call('metrics')
+    except CameraServiceUnavailable:
+        owner_metrics = ''
+    return Response(owner_metrics + render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/TurnCameraON', methods=['POST'])
+def turn_camera_on():
+    return camera_command_response()
+
+@app.route('/cameras/<camera_id>/TurnCameraON', methods=['POST'])
+def turn_camera_on_by_id(camera_id):
+    return camera_command_response(camera_id)
+
+if __name__ == '__main__':
+    # Pojedynczy proces HTTP bez gunicorn (np. do testów); w produkcji uruchamiany przez serwer WSGI
+    parser = argparse.ArgumentParser(description="Proces HTTP trybu produkcyjnego (wymaga serwer.py --owner).")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8898)
+    parser.add_argument('--threads', type=int, default=None,
+                        help="liczba wątków waitress (domyślnie HTTP_THREADS); połowa może obsługiwać strumienie")
+    args = parser.parse_args()
+    http_threads, stream_limiter.max_streams = load_http_settings(args.threads)
+    try:
+        from waitress import serve
+    except ImportError:
+        app.run(debug=False, use_reloader=False, threaded=True, host=args.host, port=args.port)
+    else:
+        serve(app, host=args.host, port=args.port, threads=http_threads)
@@ -0,0 +1,144 @@
+import os
+import cv2
+import threading
+from collections import OrderedDict
+from flask import Response, request, send_file
+from werkzeug.security import safe_join
+from photo_index import PHOTO_NAME_PATTERN, SHARD_NAME_PATTERN
+
+# Dozwolone szerokości miniatur - żądana szerokość jest zaokrąglana w górę do najbliższej,
+# więc dowolne ?w= nie tworzy nowych wariantów w cache
+THUMBNAIL_WIDTHS = (160, 320, 640, 960)
+# Zdjęcia nie zmieniają się po zapisaniu (nowe zdjęcie = nowy numer), więc mogą być cache'owane długo
+PHOTO_MAX_AGE = 365 * 24 * 3600
+
+
+class ThumbnailCache:
+    """
+    Cache (LRU) zakodowanych miniatur zdjęć ograniczony łącznym rozmiarem w bajtach.
+
+    Klucz zawiera mtime i rozmiar pliku, więc podmieniony plik nie zwróci starej miniatury.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, jpeg_quality=80):
+        self.max_bytes = max_bytes
+        self.jpeg_quality = jpeg_quality
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, image_path, stat, width):
+        """Zwraca bajty JPEG miniatury o szerokości width (tworzy ją przy pierwszym zapytaniu) lub None."""
+        key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, width)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        if width < image.shape[1]:
+            height = max(1, int(image.shape[0] * width / image.shape[1]))
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if not ok:
+            return None
+        data = encoded.tobytes()
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = data
+                self._bytes += len(data)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return data
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / total if total else 0.0
+            }
+
+
+def thumbnail_width(requested_width):
+    """Zaokrągla żądaną szerokość w górę do dozwolonej szerokości miniatury (None = oryginał)."""
+    if requested_width is None or requested_width <= 0:
+        return None
+    for width in THUMBNAIL_WIDTHS:
+        if requested_width <= width:
+            return width
+    return None
+
+def _cache_headers(response, etag, mtime):
+    response.set_etag(etag)
+    response.last_modified = mtime
+    response.cache_control.public = True
+    response.cache_control.max_age = PHOTO_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+def is_photo_path(filename):
+    """
+    Czy ścieżka wskazuje zdjęcie: [kamera/][RRRR-MM-DD/]photo<numer>.jpg.
+
+    Inne pliki w folderach kamer (.detections, zapisywane właśnie photo<numer>.jpg.tmp) nie są
+    zdjęciami i nie mogą dostać nagłówków cache dla plików niezmiennych.
+    """
+    parts = filename.split('/')
+    if not PHOTO_NAME_PATTERN.match(parts.pop()):
+        return False
+    if parts and SHARD_NAME_PATTERN.match(parts[-1]):
+        parts.pop()
+    return len(parts) <= 1 and not any(part.startswith('.') for part in parts)
+
+def send_photo(base_folder, filename, thumbnail_cache):
+    """
+    Odpowiedź z plikiem zdjęcia lub jego miniaturą (parametr zapytania w) z nagłówkami cache.
+
+    ETag i Last-Modified pochodzą z mtime i rozmiaru pliku; przy pasującym If-None-Match
+    lub If-Modified-Since zwracane jest 304 bez czytania pliku i bez skalowania.
+    Zwraca None, gdy zdjęcie nie istnieje, nie da się go odczytać lub ścieżka nie wskazuje zdjęcia.
+    """
+    if not is_photo_path(filename):
+        return None
+    image_path = safe_join(base_folder, filename)
+    if image_path is None or not os.path.isfile(image_path):
+        return None
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return None
+
+    width = thumbnail_width(request.args.get('w', type=int))
+    etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}-{width or 0}"
+    mtime = int(stat.st_mtime)
+
+    if request.if_none_match.contains(etag) or (
+            not request.if_none_match and request.if_modified_since is not None
+            and request.if_modified_since.timestamp() >= mtime):
+        return _cache_headers(Response(status=304), etag, mtime)
+
+    if width is None:
+        response = send_file(image_path, mimetype='image/jpeg', conditional=False, etag=False)
+    else:
+        data = thumbnail_cache.get_or_create(image_path, stat, width)
+        if data is None:
+            return None
+        response = Response(data, mimetype='image/jpeg')
+    return _cache_headers(response, etag, mtime)
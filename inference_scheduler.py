@@ -0,0 +1,190 @@
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+from metrics import STAGE_LATENCY, INFERENCE_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceSchedulerStopped(Exception):
+    """Harmonogram został zatrzymany (zamykanie serwera) i nie przyjmuje nowych obrazów."""
+
+
+class InferenceScheduler:
+    """
+    Harmonogram inferencji z jednym wątkiem roboczym dla współdzielonego modelu.
+
+    Wątki wywołujące (trasy Flask, potoki kamer) przekazują obraz przez submit() i dostają Future.
+    Wątek roboczy zbiera oczekujące obrazy w mikro-partie (do max_batch_size obrazów lub do upływu
+    max_wait_ms od pierwszego obrazu w partii) i wywołuje predict_batch raz dla całej partii.
+    Model nigdy nie jest wywoływany równocześnie z wielu wątków.
+    Po stop() submit() zgłasza InferenceSchedulerStopped - spóźnione wywołania (np. trwające zapytania HTTP
+    podczas zamykania serwera) nie uruchamiają ponownie wątku, którego nikt już nie zatrzyma.
+
+    Parametry:
+    - predict_batch: funkcja przyjmująca listę źródeł (ścieżek lub klatek) i zwracająca listę wyników
+      w tej samej kolejności; obrazy z podanym imgsz są przekazywane osobnymi wywołaniami
+      predict_batch(źródła, imgsz=...) - jedno na każdy rozmiar wejścia w partii
+    - max_batch_size: maksymalna liczba obrazów w jednym wywołaniu predict_batch
+    - max_wait_ms: jak długo czekać na kolejne obrazy po pierwszym obrazie w partii
+    - max_queue: maksymalna liczba oczekujących obrazów (submit blokuje, gdy kolejka jest pełna)
+    """
+
+    def __init__(self, predict_batch, max_batch_size=8, max_wait_ms=20, max_queue=64):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+        self._stats_lock = threading.Lock()
+        self.max_queue_depth = 0
+        self.items_submitted = 0
+        self.items_completed = 0
+        self.items_failed = 0
+        self.batches_run = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+        self.total_inference_time = 0.0
+        self.last_batch_size = 0
+        self.last_inference_seconds = 0.0
+
+    def start(self):
+        """Uruchamia wątek inferencji (wywołanie wielokrotne jest bezpieczne, także po stop())."""
+        with self._start_lock:
+            self._stopped = False
+            self._start_thread()
+
+    def _start_thread(self):
+        # Wywoływane pod _start_lock
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Uruchomiono harmonogram inferencji (partia do {self.max_batch_size}, "
+                    f"oczekiwanie do {self.max_wait * 1000:.0f} ms).")
+
+    def stop(self, timeout=10.0):
+        """Zatrzymuje wątek inferencji po przetworzeniu obrazów, które już są w kolejce."""
+        with self._start_lock:
+            self._stopped = True
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+            logger.info("Zatrzymano harmonogram inferencji.")
+
+    def submit(self, source, imgsz=None):
+        """
+        Dodaje obraz (ścieżkę lub klatkę) do kolejki i zwraca Future z wynikiem modelu dla tego obrazu.
+
+        imgsz to rozmiar wejścia modelu dla tego obrazu (None - domyślny rozmiar predict_batch).
+        Pierwsze wywołanie uruchamia wątek inferencji; po stop() zgłaszany jest InferenceSchedulerStopped.
+        """
+        future = Future()
+        # Sprawdzenie i dodanie do kolejki pod blokadą - obraz nie trafi do kolejki za znacznikiem stop()
+        with self._start_lock:
+            if self._stopped:
+                raise InferenceSchedulerStopped("Harmonogram inferencji jest zatrzymany.")
+            self._start_thread()
+            self._queue.put((source, future, time.monotonic(), imgsz))
+        with self._stats_lock:
+            self.items_submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def predict(self, source, timeout=None, imgsz=None):
+        """Wygodne wywołanie synchroniczne: submit() i oczekiwanie na wynik."""
+        return self.submit(source, imgsz).result(timeout=timeout)
+
+    def _collect(self):
+        """Czeka na pierwszy obraz, potem dobiera kolejne do partii. Zwraca (partia, czy zatrzymać)."""
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch):
+        # Future anulowane przez wywołującego nie są przekazywane do modelu
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.monotonic()
+        queue_waits = [started - enqueued_at for _, _, enqueued_at, _ in batch]
+        try:
+            results = [None] * len(batch)
+            for imgsz in dict.fromkeys(item[3] for item in batch):
+                indices = [index for index, item in enumerate(batch) if item[3] == imgsz]
+                sources = [batch[index][0] for index in indices]
+                group_results = self.predict_batch(sources) if imgsz is None else self.predict_batch(sources, imgsz=imgsz)
+                if len(group_results) != len(sources):
+                    raise RuntimeError(f"Model zwrócił {len(group_results)} wyników dla {len(sources)} obrazów.")
+                for index, result in zip(indices, group_results):
+                    results[index] = result
+        except Exception as e:
+            logger.exception(f"Błąd inferencji dla partii {len(batch)} obrazów: {e}")
+            for _, future, _, _ in batch:
+                future.set_exception(e)
+            with self._stats_lock:
+                self.items_failed += len(batch)
+            return
+        inference_seconds = time.monotonic() - started
+        STAGE_LATENCY.observe(inference_seconds, stage='inference')
+        INFERENCE_BATCH_SIZE.observe(len(batch))
+
+        for (_, future, _, _), result in zip(batch, results):
+            future.set_result(result)
+
+        with self._stats_lock:
+            self.batches_run += 1
+            self.items_completed += len(batch)
+            self.total_queue_wait += sum(queue_waits)
+            self.max_queue_wait = max(self.max_queue_wait, max(queue_waits))
+            self.total_inference_time += inference_seconds
+            self.last_batch_size = len(batch)
+            self.last_inference_seconds = inference_seconds
+
+    def stats(self):
+        """Zwraca statystyki kolejki, rozmiaru partii i opóźnień inferencji."""
+        with self._stats_lock:
+            completed = self.items_completed
+            batches = self.batches_run
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'items_submitted': self.items_submitted,
+                'items_completed': completed,
+                'items_failed': self.items_failed,
+                'batches_run': batches,
+                'avg_batch_size': completed / batches if batches else 0.0,
+                'last_batch_size': self.last_batch_size,
+                'avg_queue_wait_ms': self.total_queue_wait / completed * 1000 if completed else 0.0,
+                'max_queue_wait_ms': self.max_queue_wait * 1000,
+                'avg_batch_inference_ms': self.total_inference_time / batches * 1000 if batches else 0.0,
+                'last_batch_inference_ms': self.last_inference_seconds * 1000
+            }
@@ -0,0 +1,42 @@
+import os
+import json
+import logging
+from datetime import datetime
+
+# Atrybuty każdego rekordu logu - pozostałe (przekazane przez extra=) trafiają do logu JSON jako pola
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+TEXT_FORMAT = '%(asctime)s %(levelname)-7s %(name)s [%(threadName)s] %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Jeden obiekt JSON na linię: czas, poziom, logger, wątek, komunikat, wyjątek i pola z extra."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=None, log_format=None):
+    """
+    Konfiguruje logowanie procesu na standardowe wyjście.
+
+    Poziom i format są brane z LOG_LEVEL (domyślnie INFO) i LOG_FORMAT (text lub json), jeśli nie
+    zostały podane. Wywołanie wielokrotne zastępuje poprzednią konfigurację.
+    """
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    log_format = (log_format or os.getenv('LOG_FORMAT', 'text')).lower()
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+    logging.basicConfig(level=level, handlers=[handler], force=True)
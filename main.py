@@ -1,53 +1,313 @@
-from ultralytics import YOLO
 import os
+import re
+import csv
+import sys
+import glob
+import json
+import time
+import argparse
+import logging
+import importlib.util
+import multiprocessing
+from datetime import datetime
+import cv2
+from logging_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Ponowna analiza zdjęć (np. archiwum kamera/ po zmianie modelu) w wielu procesach.
+#   python main.py kamera/ --workers 4 --output wyniki.jsonl
+#   python main.py "kamera/wejscie/2026-01-*/*.jpg" --output wyniki.csv --db --resume
+# Każdy proces ładuje model raz i analizuje obrazy partiami. Postęp jest zapisywany w pliku kontrolnym,
+# więc przerwaną analizę można wznowić (--resume) bez ponownej analizy gotowych obrazów.
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
-test_image_path = os.path.join(current_dir, "images", "test.jpg")
-test2_image_path = os.path.join(current_dir, "images", "test2.jpg")
-
-model = YOLO("yolo12s.pt")
-
-def analyze_image(image_path):
-    results = model.predict(image_path, save=False, classes=[0, 16])
-    
-    people_count = 0
-    dogs_count = 0
-    
-    for result in results:
-        boxes = result.boxes
-        for box in enumerate(boxes):
-            cls_id = int(box[1].cls[0])
-            confidence = float(box[1].conf[0])
-            
-            if cls_id == 0:  # Osoba
-                people_count += 1
-                print(f"Wykryto człowieka nr {people_count} {confidence*100:.2f}%")
-            elif cls_id == 16:  # Pies
-                dogs_count += 1
-                print(f"Wykryto psa nr {dogs_count} {confidence*100:.2f}%")
-    
-    return people_count, dogs_count
-
-# Analizuj pierwszy obraz (test.jpg)
-print("Analiza obrazu test.jpg:")
-people_count1, dogs_count1 = analyze_image(test_image_path)
-
-if people_count1 == 0 and dogs_count1 == 0:
-    print("Nie wykryto żadnych ludzi ani psów na obrazie test.jpg")
-else:
-    if people_count1 == 0:
-        print("Nie wykryto żadnych ludzi na obrazie test.jpg")
-    if dogs_count1 == 0:
-        print("Nie wykryto żadnych psów na obrazie test.jpg")
-
-# Analizuj drugi obraz (test2.jpg)
-print("\nAnaliza obrazu test2.jpg:")
-people_count2, dogs_count2 = analyze_image(test2_image_path)
-
-if people_count2 == 0 and dogs_count2 == 0:
-    print("Nie wykryto żadnych ludzi ani psów na obrazie test2.jpg")
-else:
-    if people_count2 == 0:
-        print("Nie wykryto żadnych ludzi na obrazie test2.jpg")
-    if dogs_count2 == 0:
-        print("Nie wykryto żadnych psów na obrazie test2.jpg")
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+OUTPUT_FORMATS = ('jsonl', 'csv', 'parquet')
+# Klasy modelu analizowane przez serwer (jak w serwer.process_detection_results)
+DETECTED_CLASSES = {0: "Człowiek", 16: "Pies"}
+CSV_COLUMNS = ('path', 'camera', 'time', 'object', 'confidence', 'x1', 'y1', 'x2', 'y2', 'error')
+DATE_FOLDER_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# Stan procesu roboczego - model ładowany raz w initializer puli
+_worker_model = None
+_worker_imgsz = None
+
+def find_images(inputs):
+    """Ścieżki obrazów z katalogów (rekurencyjnie) i wzorców glob, posortowane i bez powtórzeń."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.update(os.path.join(root, name) for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.update(path for path in glob.glob(item, recursive=True)
+                         if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(os.path.abspath(path) for path in paths)
+
+def camera_for_path(image_path, camera=None):
+    """Identyfikator kamery zdjęcia: podany jawnie albo nazwa folderu kamery (kamera/<id>[/RRRR-MM-DD]/zdjecie.jpg)."""
+    if camera:
+        return camera
+    folder = os.path.dirname(image_path)
+    if DATE_FOLDER_PATTERN.match(os.path.basename(folder)):
+        folder = os.path.dirname(folder)
+    return os.path.basename(folder) or None
+
+def init_worker(model_config, log_level):
+    """Initializer procesu roboczego: ładuje model raz na proces (bez rozgrzewki - pierwsza partia ją zastępuje)."""
+    global _worker_model, _worker_imgsz
+    configure_logging(log_level)
+    from model_config import load_model
+    _worker_model, info = load_model(model_config)
+    _worker_imgsz = info['imgsz']
+
+def result_detections(result):
+    """Detekcje jednego wyniku modelu jako lista (obiekt, procent, (x1, y1, x2, y2))."""
+    boxes = result.boxes
+    if len(boxes) == 0:
+        return []
+    classes = boxes.cls.cpu().numpy().astype(int) if hasattr(boxes.cls, 'cpu') else boxes.cls.astype(int)
+    confidences = boxes.conf.cpu().numpy() if hasattr(boxes.conf, 'cpu') else boxes.conf
+    coordinates = boxes.xyxy.cpu().numpy() if hasattr(boxes.xyxy, 'cpu') else boxes.xyxy
+    return [(DETECTED_CLASSES[cls_id], round(float(confidence) * 100, 2), tuple(round(float(v), 1) for v in xyxy))
+            for cls_id, confidence, xyxy in zip(classes, confidences, coordinates) if cls_id in DETECTED_CLASSES]
+
+def analyze_batch(image_paths):
+    """
+    Analizuje partię obrazów w procesie roboczym. Zwraca listę wyników obrazów:
+    {'path', 'time', 'width', 'height', 'detections', 'error'}; czas to czas modyfikacji pliku (czas zdjęcia).
+    """
+    results = []
+    frames = []
+    for image_path in image_paths:
+        entry = {'path': image_path, 'time': None, 'width': None, 'height': None, 'detections': [], 'error': None}
+        try:
+            entry['time'] = datetime.fromtimestamp(os.path.getmtime(image_path)).isoformat(timespec='seconds')
+            frame = cv2.imread(image_path)
+        except OSError as e:
+            frame, entry['error'] = None, str(e)
+        if frame is None:
+            entry['error'] = entry['error'] or "Nie można odczytać obrazu"
+        else:
+            entry['height'], entry['width'] = frame.shape[:2]
+            frames.append((len(results), frame))
+        results.append(entry)
+
+    if frames:
+        try:
+            predictions = _worker_model.predict([frame for _, frame in frames], imgsz=_worker_imgsz, save=False,
+                                                classes=list(DETECTED_CLASSES), verbose=False)
+            for (index, _), prediction in zip(frames, predictions):
+                results[index]['detections'] = result_detections(prediction)
+        except Exception as e:
+            logger.exception(f"Błąd analizy partii {len(frames)} obrazów: {e}")
+            for index, _ in frames:
+                results[index]['error'] = str(e)
+    return results
+
+
+class ResultWriter:
+    """
+    Zapis wyników analizy: plik wyjściowy (JSONL - wiersz na obraz, CSV/Parquet - wiersz na detekcję,
+    obraz bez detekcji jako wiersz bez obiektu) i/lub tabela WYKRYTE_OBIEKTY (COPY).
+    """
+
+    def __init__(self, output_path=None, output_format=None, append=False, db_conn=None, camera=None):
+        self.output_path = output_path
+        self.output_format = output_format
+        self.db_conn = db_conn
+        self.camera = camera
+        self._file = None
+        self._csv = None
+        self._parquet = None
+        if output_path is None:
+            return
+        if output_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._pa = pa
+            if append and os.path.exists(output_path):
+                # Parquet nie pozwala dopisywać - wznowiona analiza zapisuje kolejną część obok
+                stem, extension = os.path.splitext(output_path)
+                self.output_path = f"{stem}.{datetime.now().strftime('%Y%m%d%H%M%S')}{extension}"
+            self._schema = pa.schema([('path', pa.string()), ('camera', pa.string()), ('time', pa.timestamp('s')),
+                                      ('object', pa.string()), ('confidence', pa.float32()),
+                                      ('x1', pa.float32()), ('y1', pa.float32()), ('x2', pa.float32()),
+                                      ('y2', pa.float32()), ('error', pa.string())])
+            self._parquet = pq.ParquetWriter(self.output_path, self._schema, compression='zstd')
+            return
+        exists = append and os.path.exists(output_path) and os.path.getsize(output_path) > 0
+        self._file = open(output_path, 'a' if append else 'w', encoding='utf-8', newline='')
+        if output_format == 'csv':
+            self._csv = csv.writer(self._file)
+            if not exists:
+                self._csv.writerow(CSV_COLUMNS)
+
+    def _flat_rows(self, results):
+        for entry in results:
+            camera = camera_for_path(entry['path'], self.camera)
+            if not entry['detections']:
+                yield (entry['path'], camera, entry['time'], None, None, None, None, None, None, entry['error'])
+            for obiekt, procent, (x1, y1, x2, y2) in entry['detections']:
+                yield (entry['path'], camera, entry['time'], obiekt, procent, x1, y1, x2, y2, entry['error'])
+
+    def write(self, results):
+        """Zapisuje wyniki partii. Zwraca False, gdy zapis do bazy danych się nie powiódł."""
+        if self._parquet is not None:
+            columns = list(zip(*self._flat_rows(results))) or [()] * len(CSV_COLUMNS)
+            data = dict(zip(CSV_COLUMNS, columns))
+            data['time'] = [datetime.fromisoformat(value) if value else None for value in data['time']]
+            self._parquet.write_table(self._pa.table(data, schema=self._schema))
+        elif self._csv is not None:
+            self._csv.writerows(self._flat_rows(results))
+        elif self._file is not None:
+            for entry in results:
+                entry = dict(entry, camera=camera_for_path(entry['path'], self.camera),
+                             detections=[{'object': obiekt, 'confidence': procent, 'box': list(box)}
+                                         for obiekt, procent, box in entry['detections']])
+                self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        if self._file is not None:
+            self._file.flush()
+
+        if self.db_conn is not None:
+            from db_connector import copy_detected_objects
+            rows = [(obiekt, procent, datetime.fromisoformat(entry['time']), camera_for_path(entry['path'], self.camera),
+                     None, *box)
+                    for entry in results if entry['time'] for obiekt, procent, box in entry['detections']]
+            return copy_detected_objects(rows, self.db_conn)
+        return True
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def load_checkpoint(checkpoint_path):
+    """Ścieżki obrazów już przeanalizowanych (i zapisanych) według pliku kontrolnego."""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+def batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def output_format_for(path, requested=None):
+    if requested:
+        return requested
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return extension if extension in OUTPUT_FORMATS else 'jsonl'
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analiza katalogów zdjęć modelem YOLO w wielu procesach.")
+    parser.add_argument('inputs', nargs='+', help="katalogi (przeszukiwane rekurencyjnie) lub wzorce glob")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="liczba procesów roboczych (każdy ładuje własny model)")
+    parser.add_argument('--batch-size', type=int, default=8, help="liczba obrazów w jednej partii modelu")
+    parser.add_argument('--output', help="plik wynikowy (.jsonl, .csv lub .parquet)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, help="format pliku wynikowego (domyślnie z rozszerzenia)")
+    parser.add_argument('--db', action='store_true', help="zapis detekcji do WYKRYTE_OBIEKTY (COPY)")
+    parser.add_argument('--camera', help="identyfikator kamery dla wszystkich obrazów (domyślnie nazwa folderu kamery)")
+    parser.add_argument('--checkpoint', help="plik kontrolny postępu (domyślnie <output>.checkpoint)")
+    parser.add_argument('--resume', action='store_true', help="pomija obrazy zapisane w pliku kontrolnym")
+    parser.add_argument('--flush-every', type=int, default=500,
+                        help="co ile obrazów zapisywać wyniki i plik kontrolny")
+    parser.add_argument('--progress-interval', type=float, default=10.0, help="co ile sekund raportować postęp")
+    parser.add_argument('--variant', help="wariant modelu (domyślnie MODEL_VARIANT z model.env)")
+    parser.add_argument('--backend', help="backend modelu (domyślnie MODEL_BACKEND z model.env)")
+    parser.add_argument('--imgsz', type=int, help="rozmiar wejścia modelu (domyślnie MODEL_IMGSZ z model.env)")
+    args = parser.parse_args(argv)
+    if not args.output and not args.db:
+        parser.error("podaj --output i/lub --db")
+    if not args.checkpoint:
+        args.checkpoint = f"{args.output}.checkpoint" if args.output else os.path.join(current_dir, "main.checkpoint")
+    return args
+
+def main(argv=None):
+    configure_logging()
+    args = parse_args(argv)
+    from model_config import load_model_config
+
+    model_config = load_model_config(os.path.join(current_dir, "model.env"))
+    for key in ('variant', 'backend', 'imgsz'):
+        if getattr(args, key) is not None:
+            model_config[key] = getattr(args, key)
+
+    image_paths = find_images(args.inputs)
+    done = load_checkpoint(args.checkpoint) if args.resume else set()
+    pending = [path for path in image_paths if path not in done]
+    logger.info(f"Znaleziono {len(image_paths)} obrazów, do analizy: {len(pending)} "
+                f"(model {model_config['variant']}, {args.workers} procesów, partie po {args.batch_size})")
+    if not pending:
+        return 0
+
+    db_conn = None
+    if args.db:
+        from db_connector import get_db_connection
+        db_conn = get_db_connection()
+        if db_conn is None:
+            logger.error("Brak połączenia z bazą danych - analiza przerwana.")
+            return 1
+    output_format = output_format_for(args.output, args.format) if args.output else None
+    if output_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        logger.error("Zapis do Parquet wymaga pakietu pyarrow (pip install pyarrow).")
+        return 1
+    writer = ResultWriter(args.output, output_format, append=args.resume, db_conn=db_conn, camera=args.camera)
+    if not args.resume and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    images_done = detections_found = errors = 0
+    started = last_report = time.monotonic()
+    buffered = []
+    exit_code = 0
+    log_level = logging.getLevelName(logging.getLogger().level)
+
+    def flush():
+        # Plik kontrolny jest uzupełniany dopiero po zapisaniu wyników - po przerwaniu obrazy z niezapisanych
+        # partii są analizowane ponownie (a z partii zapisanych tylko przed przerwaniem - mogą się powtórzyć)
+        if not writer.write(buffered):
+            raise RuntimeError("Zapis detekcji do bazy danych nie powiódł się")
+        with open(args.checkpoint, 'a', encoding='utf-8') as f:
+            f.writelines(entry['path'] + '\n' for entry in buffered)
+        buffered.clear()
+
+    context = multiprocessing.get_context('spawn')
+    try:
+        with context.Pool(args.workers, initializer=init_worker, initargs=(model_config, log_level)) as pool:
+            for results in pool.imap_unordered(analyze_batch, batches(pending, args.batch_size)):
+                buffered.extend(results)
+                images_done += len(results)
+                detections_found += sum(len(entry['detections']) for entry in results)
+                errors += sum(1 for entry in results if entry['error'])
+                if len(buffered) >= args.flush_every:
+                    flush()
+                now = time.monotonic()
+                if now - last_report >= args.progress_interval:
+                    last_report = now
+                    rate = images_done / (now - started)
+                    remaining = (len(pending) - images_done) / rate if rate else float('inf')
+                    logger.info(f"Postęp: {images_done}/{len(pending)} obrazów, {rate:.1f} obrazów/s, "
+                                f"pozostało ok. {remaining / 60:.1f} min")
+            flush()
+    except KeyboardInterrupt:
+        logger.warning("Przerwano - wznowienie: to samo polecenie z --resume.")
+        exit_code = 130
+    except Exception as e:
+        logger.error(f"Analiza przerwana: {e}")
+        exit_code = 1
+    finally:
+        writer.close()
+        if db_conn is not None:
+            db_conn.close()
+
+    elapsed = time.monotonic() - started
+    logger.info(f"Przeanalizowano {images_done} obrazów w {elapsed:.1f}s ({images_done / elapsed:.1f} obrazów/s), "
+                f"detekcji: {detections_found}, błędów: {errors}")
+    return exit_code
+
+if __name__ == '__main__':
+    sys.exit(main())
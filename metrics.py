@@ -0,0 +1,242 @@
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Progi histogramów czasu (s) - od pojedynczych milisekund (odczyt klatki) do sekund (inferencja, baza danych)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Wspólna część metryk: nazwa, opis, etykiety i wartości dla każdej kombinacji etykiet."""
+
+    type_name = None
+
+    def __init__(self, name, description, labelnames=(), registry=None):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metryka {self.name} wymaga etykiet {self.labelnames}, podano {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        with self._lock:
+            samples = self._samples()
+        if not samples:
+            return []
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(samples)
+        return lines
+
+
+class Counter(_Metric):
+    """Licznik rosnący (np. liczba klatek)."""
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Wartość chwilowa (np. głębokość kolejki, stan kamery)."""
+
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """Rozkład wartości (czasów) w skumulowanych przedziałach, z sumą i liczbą obserwacji."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, description, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Liczniki dla każdego progu (ostatni = +Inf), suma, liczba obserwacji
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mierzy czas wykonania bloku with."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self, quantiles=(0.5, 0.95, 0.99), **labels):
+        """
+        Liczba obserwacji, średnia i kwantyle szacowane z przedziałów (interpolacja liniowa w przedziale,
+        jak histogram_quantile w Prometheus). Zwraca None, gdy nie ma obserwacji.
+        """
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None or state[2] == 0:
+                return None
+            counts, total, count = list(state[0]), state[1], state[2]
+        result = {'count': count, 'mean': total / count}
+        for q in quantiles:
+            rank = q * count
+            cumulative = 0
+            lower = 0.0
+            value = self.buckets[-1]
+            for bound, bucket_count in zip(self.buckets, counts):
+                if bucket_count and cumulative + bucket_count >= rank:
+                    value = lower + (bound - lower) * (rank - cumulative) / bucket_count
+                    break
+                cumulative += bucket_count
+                lower = bound
+            result[f"p{round(q * 100):g}"] = value
+        return result
+
+    def _samples(self):
+        samples = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                samples.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            samples.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            samples.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Zbiór metryk procesu eksportowany w formacie tekstowym Prometheus.
+
+    Kolektory (add_collector) są wywoływane przed każdym eksportem - ustawiają wartości chwilowe
+    (np. głębokości kolejek) na podstawie statystyk komponentów, więc komponenty nie muszą
+    aktualizować ich przy każdej operacji.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metryka {metric.name} jest już zarejestrowana")
+            self._metrics.append(metric)
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception:
+                logger.exception("Błąd kolektora metryk")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Czas etapów potoku: grab, decode (kamera), encode, write (zapis zdjęcia), inference (partia modelu),
+# db_insert (paczka detekcji), photo_index_scan (skanowanie katalogu zdjęć)
+STAGE_LATENCY = Histogram('iot_stage_duration_seconds', 'Czas etapu potoku przetwarzania.', ['stage'])
+HTTP_LATENCY = Histogram('iot_http_request_duration_seconds', 'Czas obsługi żądania HTTP.',
+                         ['endpoint', 'method', 'status'])
+# Stany klatek: captured, analyzed, reused (wynik poprzedniej klatki), skipped (bez ruchu), dropped (pełna kolejka)
+FRAMES = Counter('iot_frames', 'Liczba klatek według stanu.', ['camera', 'state'])
+DETECTIONS = Counter('iot_detections', 'Liczba wykrytych obiektów.', ['camera', 'object'])
+INFERENCE_BATCH_SIZE = Histogram('iot_inference_batch_size', 'Liczba obrazów w partii inferencji.',
+                                 buckets=(1, 2, 4, 8, 16, 32))
+DB_ROWS = Counter('iot_db_rows', 'Liczba detekcji w kolejce zapisu według wyniku.', ['result'])
+QUEUE_DEPTH = Gauge('iot_queue_depth', 'Liczba elementów oczekujących w kolejce.', ['queue', 'camera'])
+CAMERA_ACTIVE = Gauge('iot_camera_active', 'Czy sesja przechwytywania kamery jest aktywna (1/0).', ['camera'])
+CAMERA_REMAINING = Gauge('iot_camera_remaining_seconds', 'Pozostały czas sesji kamery.', ['camera'])
+CAPTURE_INTERVAL = Gauge('iot_capture_interval_seconds', 'Aktualny interwał zdjęć kamery.', ['camera'])
+COMPONENT_UP = Gauge('iot_component_ready', 'Gotowość komponentu (1/0).', ['component'])
+
+def render_metrics():
+    """Metryki procesu w formacie tekstowym Prometheus."""
+    return REGISTRY.render()
+
+def instrument_flask_app(app):
+    """Mierzy czas obsługi każdego żądania aplikacji Flask (etykieta endpoint to nazwa trasy, nie adres)."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('metrics_request_started', None)
+        if started is not None:
+            # Strumienie (MJPEG, SSE, /detections) są mierzone do wysłania nagłówków
+            HTTP_LATENCY.observe(time.perf_counter() - started,
+                                 endpoint=request.endpoint or 'unknown',
+                                 method=request.method,
+                                 status=response.status_code)
+        return response
+
+    return app
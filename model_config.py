@@ -0,0 +1,198 @@
+import os
+import time
+import shutil
+import threading
+import numpy as np
+import importlib.util
+import logging
+from dotenv import load_dotenv
+from ultralytics import YOLO
+
+logger = logging.getLogger(__name__)
+
+MODEL_BACKENDS = ('openvino', 'onnx', 'torch')
+# Kolejność prób przy MODEL_BACKEND=auto - od najszybszego środowiska na CPU
+AUTO_BACKEND_ORDER = ('openvino', 'onnx', 'torch')
+# Pakiety potrzebne do uruchomienia wyeksportowanego modelu
+BACKEND_RUNTIME_PACKAGES = {
+    'openvino': 'openvino',
+    'onnx': 'onnxruntime'
+}
+
+def load_model_config(env_file_path=None):
+    """
+    Ładuje konfigurację modelu ze zmiennych środowiskowych (opcjonalnie z pliku .env).
+
+    - MODEL_VARIANT: nazwa wag bez rozszerzenia, np. yolo12n, yolo12s, yolo12x (domyślnie yolo12x)
+    - MODEL_IMGSZ: rozmiar wejścia modelu w pikselach (domyślnie 640)
+    - MODEL_BACKEND: auto, openvino, onnx lub torch (domyślnie auto)
+    - MODEL_DIR: katalog z wagami i wyeksportowanymi modelami (domyślnie katalog tego modułu)
+    """
+    if env_file_path:
+        load_dotenv(env_file_path)
+
+    backend = os.getenv('MODEL_BACKEND', 'auto').strip().lower()
+    if backend != 'auto' and backend not in MODEL_BACKENDS:
+        logger.warning(f"Nieznany backend modelu '{backend}'. Używam 'auto'.")
+        backend = 'auto'
+
+    try:
+        imgsz = int(os.getenv('MODEL_IMGSZ', '640'))
+    except ValueError:
+        logger.warning("Nieprawidłowa wartość MODEL_IMGSZ. Używam 640.")
+        imgsz = 640
+
+    return {
+        'variant': os.getenv('MODEL_VARIANT', 'yolo12x').strip(),
+        'imgsz': imgsz,
+        'backend': backend,
+        'model_dir': os.getenv('MODEL_DIR', os.path.dirname(os.path.abspath(__file__)))
+    }
+
+def backend_available(backend):
+    """Sprawdza, czy środowisko uruchomieniowe dla danego backendu jest zainstalowane."""
+    package = BACKEND_RUNTIME_PACKAGES.get(backend)
+    return package is None or importlib.util.find_spec(package) is not None
+
+def exported_model_path(weights_path, backend):
+    """Ścieżka wyeksportowanego modelu obok wag (taka sama, jaką tworzy eksport ultralytics)."""
+    stem, _ = os.path.splitext(weights_path)
+    if backend == 'openvino':
+        return f"{stem}_openvino_model"
+    if backend == 'onnx':
+        return f"{stem}.onnx"
+    return weights_path
+
+def export_model(weights_path, backend, imgsz):
+    """
+    Eksportuje wagi PyTorch do formatu backendu, jeśli nie ma go jeszcze obok wag.
+
+    Eksport jest wykonywany raz - kolejne uruchomienia używają zapisanego pliku (katalogu).
+    Model jest eksportowany z dynamicznym rozmiarem wejścia, więc obsługuje partie obrazów.
+    """
+    target_path = exported_model_path(weights_path, backend)
+    if os.path.exists(target_path):
+        return target_path
+
+    logger.info(f"Eksport modelu {weights_path} do formatu {backend} (jednorazowo)...")
+    exported_path = YOLO(weights_path).export(format=backend, imgsz=imgsz, dynamic=True, half=False)
+    exported_path = str(exported_path)
+    if os.path.abspath(exported_path) != os.path.abspath(target_path):
+        shutil.move(exported_path, target_path)
+    logger.info(f"Zapisano wyeksportowany model: {target_path}")
+    return target_path
+
+def load_model(config=None):
+    """
+    Ładuje model YOLO z najszybszym dostępnym backendem na CPU.
+
+    Przy backendzie auto próbowane są kolejno OpenVINO, ONNX Runtime i PyTorch; błąd eksportu lub
+    ładowania jednego backendu powoduje przejście do następnego. PyTorch jest zawsze ostatnią opcją.
+    Zwraca (model, informacje o modelu).
+    """
+    if config is None:
+        config = load_model_config()
+
+    weights_path = os.path.join(config['model_dir'], f"{config['variant']}.pt")
+    if config['backend'] == 'auto':
+        backends = list(AUTO_BACKEND_ORDER)
+    else:
+        backends = [config['backend']] + (['torch'] if config['backend'] != 'torch' else [])
+
+    for backend in backends:
+        if not backend_available(backend):
+            logger.warning(f"Backend {backend} niedostępny (brak pakietu {BACKEND_RUNTIME_PACKAGES[backend]}).")
+            continue
+        try:
+            model_path = export_model(weights_path, backend, config['imgsz']) if backend != 'torch' else weights_path
+            model = YOLO(model_path, task='detect')
+        except Exception as e:
+            logger.warning(f"Nie udało się załadować modelu z backendem {backend}: {e}")
+            continue
+        logger.info(f"Model YOLO {config['variant']} załadowany z: {model_path} (backend {backend}, imgsz {config['imgsz']})")
+        return model, {
+            'variant': config['variant'],
+            'backend': backend,
+            'imgsz': config['imgsz'],
+            'path': model_path
+        }
+
+    raise RuntimeError(f"Nie udało się załadować modelu {weights_path} z żadnym backendem.")
+
+class BackgroundModelLoader:
+    """
+    Ładuje model w wątku w tle i wykonuje jedną inferencję rozgrzewającą na pustej klatce.
+
+    Serwer może obsługiwać zapytania (np. /health) od razu po starcie, a pierwsze prawdziwe
+    zapytanie o detekcję nie płaci kosztu inicjalizacji modelu. Wątki potrzebujące modelu
+    czekają na niego przez get().
+    """
+
+    def __init__(self, config=None, warmup=True):
+        self.config = config
+        self.warmup = warmup
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self.model = None
+        self.info = None
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+
+    def start(self):
+        """Rozpoczyna ładowanie modelu w tle (wywołanie wielokrotne jest bezpieczne)."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def _load(self):
+        try:
+            started = time.monotonic()
+            model, info = load_model(self.config)
+            self.load_seconds = time.monotonic() - started
+            if self.warmup:
+                started = time.monotonic()
+                dummy_frame = np.zeros((info['imgsz'], info['imgsz'], 3), dtype=np.uint8)
+                model.predict(dummy_frame, imgsz=info['imgsz'], save=False, verbose=False)
+                self.warmup_seconds = time.monotonic() - started
+                logger.info(f"Rozgrzewka modelu zakończona w {self.warmup_seconds:.2f}s.")
+            self.model, self.info = model, info
+        except Exception as e:
+            logger.exception(f"Błąd ładowania modelu: {e}")
+            self.error = e
+        finally:
+            self._ready.set()
+
+    def is_ready(self):
+        """Czy model jest załadowany i rozgrzany."""
+        return self._ready.is_set() and self.model is not None
+
+    def get(self, timeout=None):
+        """Zwraca model, czekając najwyżej timeout sekund na zakończenie ładowania."""
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Model nie został załadowany w oczekiwanym czasie.")
+        if self.model is None:
+            raise RuntimeError(f"Model nie został załadowany: {self.error}")
+        return self.model
+
+    def status(self):
+        """Zwraca stan ładowania modelu (do raportowania w /ready)."""
+        if self.is_ready():
+            state = 'ready'
+        elif self.error is not None:
+            state = 'failed'
+        elif self._thread is not None:
+            state = 'loading'
+        else:
+            state = 'not_started'
+        return {
+            'state': state,
+            'info': self.info,
+            'error': str(self.error) if self.error is not None else None,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds
+        }
@@ -0,0 +1,130 @@
+import os
+import cv2
+import time
+import threading
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+MOTION_METHODS = ('diff', 'mog2')
+
+
+class MotionDetector:
+    """
+    Tani filtr ruchu przed modelem: porównuje zmniejszone klatki w skali szarości.
+
+    - method='diff': różnica względem poprzedniej klatki
+    - method='mog2': odejmowanie tła (cv2.createBackgroundSubtractorMOG2), odporniejsze na szum i zmiany światła
+
+    Ruch jest wykryty, gdy ułamek zmienionych pikseli (różnica jasności powyżej pixel_threshold)
+    w obszarze maski przekracza min_changed_ratio. Maska to obraz, w którym białe piksele oznaczają
+    obszar obserwowany. Przy max_skip_seconds klatka jest uznawana za ruch co najmniej raz na tyle
+    sekund, aby wynik detekcji nie był zbyt długo nieaktualny.
+    """
+
+    def __init__(self, method='diff', pixel_threshold=25, min_changed_ratio=0.01, downscale_width=160,
+                 mask_path=None, max_skip_seconds=60.0):
+        if method not in MOTION_METHODS:
+            raise ValueError(f"Nieznana metoda wykrywania ruchu: {method}")
+        self.method = method
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.downscale_width = downscale_width
+        self.mask_path = mask_path
+        self.max_skip_seconds = max_skip_seconds
+        self._mask_source = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE) if mask_path else None
+        if mask_path and self._mask_source is None:
+            logger.warning(f"Nie udało się wczytać maski ruchu {mask_path}. Obserwowana będzie cała klatka.")
+        self._mask = None
+        self._previous = None
+        self._subtractor = None
+        self._last_motion_time = None
+        self._lock = threading.Lock()
+        self.frames_checked = 0
+        self.frames_with_motion = 0
+        self.frames_skipped = 0
+        self.last_changed_ratio = 0.0
+
+    def _prepare(self, frame):
+        height = max(1, int(frame.shape[0] * self.downscale_width / frame.shape[1]))
+        small = cv2.resize(frame, (self.downscale_width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        if self._mask_source is not None and (self._mask is None or self._mask.shape != gray.shape):
+            resized = cv2.resize(self._mask_source, (gray.shape[1], gray.shape[0]), interpolation=cv2.INTER_NEAREST)
+            self._mask = resized > 127
+        return gray
+
+    def _changed_ratio(self, gray):
+        if self.method == 'mog2':
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(varThreshold=self.pixel_threshold, detectShadows=False)
+            changed = self._subtractor.apply(gray) > 0
+        else:
+            if self._previous is None or self._previous.shape != gray.shape:
+                self._previous = gray
+                return 1.0
+            changed = cv2.absdiff(gray, self._previous) > self.pixel_threshold
+            self._previous = gray
+
+        if self._mask is not None:
+            observed = np.count_nonzero(self._mask)
+            return float(np.count_nonzero(changed & self._mask)) / observed if observed else 0.0
+        return float(np.count_nonzero(changed)) / changed.size
+
+    def check(self, frame):
+        """Zwraca True, jeśli w klatce jest ruch (klatkę należy przeanalizować)."""
+        with self._lock:
+            now = time.monotonic()
+            changed_ratio = self._changed_ratio(self._prepare(frame))
+            self.frames_checked += 1
+            self.last_changed_ratio = changed_ratio
+            motion = bool(changed_ratio >= self.min_changed_ratio)
+            # Pierwsza klatka (po resecie) jest zawsze analizowana
+            if not motion and (self._last_motion_time is None or (
+                    self.max_skip_seconds and now - self._last_motion_time >= self.max_skip_seconds)):
+                motion = True
+            if motion:
+                self.frames_with_motion += 1
+                self._last_motion_time = now
+            else:
+                self.frames_skipped += 1
+            return motion
+
+    def reset(self):
+        """Zapomina klatkę odniesienia i model tła (np. na początku nowej sesji)."""
+        with self._lock:
+            self._previous = None
+            self._subtractor = None
+            self._last_motion_time = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'method': self.method,
+                'frames_checked': self.frames_checked,
+                'frames_with_motion': self.frames_with_motion,
+                'frames_skipped': self.frames_skipped,
+                'skip_ratio': self.frames_skipped / self.frames_checked if self.frames_checked else 0.0,
+                'last_changed_ratio': self.last_changed_ratio
+            }
+
+
+def create_motion_detector(motion_config, base_dir=None):
+    """
+    Tworzy MotionDetector z sekcji "motion" konfiguracji kamery lub zwraca None, gdy filtr jest wyłączony.
+
+    Ścieżka maski jest względna do base_dir.
+    """
+    if not motion_config.get('enabled', True):
+        return None
+    mask_path = motion_config.get('mask')
+    if mask_path and base_dir and not os.path.isabs(mask_path):
+        mask_path = os.path.join(base_dir, mask_path)
+    return MotionDetector(method=motion_config.get('method', 'diff'),
+                          pixel_threshold=motion_config.get('pixel_threshold', 25),
+                          min_changed_ratio=motion_config.get('min_changed_ratio', 0.01),
+                          downscale_width=motion_config.get('downscale_width', 160),
+                          mask_path=mask_path,
+                          max_skip_seconds=motion_config.get('max_skip_seconds', 60.0))
@@ -0,0 +1,187 @@
+import os
+import re
+import threading
+import logging
+from datetime import datetime
+from metrics import STAGE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+PHOTO_NAME_PATTERN = re.compile(r'^photo(\d+)\.jpg$')
+SHARD_NAME_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+# Numery zdjęć z wykrytymi obiektami (po jednym w wierszu) - przechowywane dłużej przez retencję
+DETECTIONS_FILE_NAME = '.detections'
+
+
+def photo_number(photo_path):
+    """Numer zdjęcia z nazwy pliku photo<numer>.jpg lub None dla innej nazwy."""
+    match = PHOTO_NAME_PATTERN.match(os.path.basename(photo_path))
+    return int(match.group(1)) if match is not None else None
+
+
+class PhotoIndex:
+    """
+    Indeks zdjęć w pamięci dla folderu kamery.
+
+    Budowany jednorazowo przy starcie (jedno przejście os.scandir), a potem aktualizowany przyrostowo
+    przez pętlę przechwytywania. Zwraca następny numer zdjęcia i najnowsze zdjęcie w czasie O(1),
+    bez globowania katalogu przy każdym zdjęciu i każdym zapytaniu.
+
+    Przy shard_by_date=True nowe zdjęcia trafiają do podkatalogów RRRR-MM-DD. Numeracja jest wspólna
+    dla wszystkich podkatalogów, a zdjęcia zapisane wcześniej bezpośrednio w folderze są nadal widoczne.
+    """
+
+    def __init__(self, folder, shard_by_date=False):
+        self.folder = folder
+        self.shard_by_date = shard_by_date
+        self._lock = threading.Lock()
+        # Skanowanie folderu trwa długo, więc odbywa się pod osobną blokadą - _lock chroni tylko stan indeksu
+        self._build_lock = threading.Lock()
+        self._photos = {}
+        self._max_num = 0
+        self._latest_num = None
+        self._total_bytes = 0
+        self._built = False
+        self._detections_path = os.path.join(folder, DETECTIONS_FILE_NAME)
+
+    def build(self):
+        """Skanuje folder (i podkatalogi dat) i buduje indeks od nowa."""
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        photos = {}
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+            logger.info(f"Utworzono katalog na zdjęcia z kamery: {self.folder}")
+
+        with STAGE_LATENCY.time(stage='photo_index_scan'), os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_dir() and SHARD_NAME_PATTERN.match(entry.name):
+                    with os.scandir(entry.path) as shard_entries:
+                        for shard_entry in shard_entries:
+                            self._scan_entry(shard_entry, entry.name, photos)
+                else:
+                    self._scan_entry(entry, None, photos)
+
+        for num in self._read_detection_marks():
+            if num in photos:
+                photos[num] = photos[num][:3] + (True,)
+
+        with self._lock:
+            self._photos = photos
+            self._total_bytes = sum(entry[2] for entry in photos.values())
+            # Zarezerwowane numery (pliki jeszcze zapisywane asynchronicznie) nie mogą zostać użyte ponownie
+            self._max_num = max(self._max_num, max(photos) if photos else 0)
+            self._latest_num = max(photos) if photos else None
+            self._built = True
+        logger.info(f"Zindeksowano {len(photos)} zdjęć w {self.folder}")
+
+    @staticmethod
+    def _scan_entry(entry, shard, photos):
+        match = PHOTO_NAME_PATTERN.match(entry.name)
+        if match is None or not entry.is_file():
+            return
+        relative_path = f"{shard}/{entry.name}" if shard else entry.name
+        stat = entry.stat()
+        photos[int(match.group(1))] = (relative_path, stat.st_mtime, stat.st_size, False)
+
+    def _read_detection_marks(self):
+        try:
+            with open(self._detections_path, 'r', encoding='utf-8') as f:
+                return {int(line) for line in f if line.strip().isdigit()}
+        except FileNotFoundError:
+            return set()
+
+    def _ensure_built(self):
+        # Pierwsze wywołania z kilku wątków (pętla przechwytywania, zapytania HTTP) skanują folder raz,
+        # a pozostałe czekają na gotowy indeks zamiast widzieć pusty
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self._build()
+
+    def next_path(self):
+        """Rezerwuje kolejny numer i zwraca pełną ścieżkę dla następnego zdjęcia."""
+        self._ensure_built()
+        with self._lock:
+            self._max_num += 1
+            num = self._max_num
+        filename = f"photo{num}.jpg"
+        if self.shard_by_date:
+            shard = datetime.now().strftime('%Y-%m-%d')
+            shard_dir = os.path.join(self.folder, shard)
+            os.makedirs(shard_dir, exist_ok=True)
+            return os.path.join(shard_dir, filename)
+        return os.path.join(self.folder, filename)
+
+    def add(self, photo_path, mtime=None, size=None, has_detections=False):
+        """Rejestruje zapisane zdjęcie w indeksie (has_detections: czy na zdjęciu wykryto obiekty)."""
+        self._ensure_built()
+        match = PHOTO_NAME_PATTERN.match(os.path.basename(photo_path))
+        if match is None:
+            logger.warning(f"Pominięto plik o nieprawidłowej nazwie: {photo_path}")
+            return
+        if mtime is None or size is None:
+            stat = os.stat(photo_path)
+            mtime, size = stat.st_mtime, stat.st_size
+        num = int(match.group(1))
+        relative_path = os.path.relpath(photo_path, self.folder).replace(os.sep, '/')
+        with self._lock:
+            previous = self._photos.get(num)
+            if previous is not None:
+                self._total_bytes -= previous[2]
+            self._photos[num] = (relative_path, mtime, size, has_detections)
+            self._total_bytes += size
+            self._max_num = max(self._max_num, num)
+            if self._latest_num is None or num > self._latest_num:
+                self._latest_num = num
+            if has_detections:
+                with open(self._detections_path, 'a', encoding='utf-8') as f:
+                    f.write(f"{num}\n")
+
+    def latest(self):
+        """Zwraca (ścieżka względna, mtime, pełna ścieżka) najnowszego zdjęcia lub (None, None, None)."""
+        self._ensure_built()
+        with self._lock:
+            entry = self._photos.get(self._latest_num) if self._latest_num is not None else None
+        if entry is None:
+            return None, None, None
+        relative_path, mtime = entry[0], entry[1]
+        full_path = os.path.join(self.folder, relative_path)
+        if not os.path.exists(full_path):
+            # Plik usunięty poza indeksem - odbudowa jest jednorazowym kosztem
+            logger.warning(f"Najnowsze zdjęcie {full_path} zniknęło z dysku. Przebudowa indeksu...")
+            self.build()
+            return self.latest()
+        return relative_path, mtime, full_path
+
+    def snapshot(self):
+        """Zwraca listę (numer, ścieżka względna, mtime, rozmiar, czy z detekcjami) wszystkich zdjęć oraz numer najnowszego."""
+        self._ensure_built()
+        with self._lock:
+            return [(num,) + entry for num, entry in self._photos.items()], self._latest_num
+
+    def remove(self, nums):
+        """Usuwa zdjęcia o podanych numerach z indeksu (pliki usuwa wywołujący). Najnowsze zdjęcie zostaje."""
+        with self._lock:
+            for num in nums:
+                if num == self._latest_num:
+                    continue
+                entry = self._photos.pop(num, None)
+                if entry is not None:
+                    self._total_bytes -= entry[2]
+            detection_nums = sorted(num for num, entry in self._photos.items() if entry[3])
+            # Przepisanie listy zdjęć z detekcjami, aby nie rosła bez końca
+            tmp_path = self._detections_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(f"{num}\n" for num in detection_nums)
+            os.replace(tmp_path, self._detections_path)
+
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes
+
+    def __len__(self):
+        with self._lock:
+            return len(self._photos)
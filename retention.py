@@ -0,0 +1,178 @@
+import os
+import time
+import shutil
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionManager:
+    """
+    Ogranicza miejsce zajmowane przez zdjęcia kamer: liczbę zdjęć, łączny rozmiar i wiek.
+
+    Działa w wątku w tle co interval sekund, na indeksach zdjęć (PhotoIndex) - bez skanowania katalogów
+    i bez udziału pętli przechwytywania. Pliki są usuwane partiami po batch_size z krótką przerwą
+    między partiami, aby nie blokować dysku zapisom nowych zdjęć.
+
+    Zasady:
+    - zdjęcia bez detekcji starsze niż max_age_days i zdjęcia z detekcjami starsze niż
+      detection_max_age_days są usuwane
+    - dopóki przekroczone są max_photos lub max_bytes (łącznie dla wszystkich kamer), usuwane są
+      najstarsze zdjęcia bez detekcji, a dopiero potem najstarsze zdjęcia z detekcjami
+    - najnowsze zdjęcie każdej kamery nigdy nie jest usuwane
+    Limit ustawiony na None jest wyłączony.
+
+    Parametry:
+    - get_indexes: funkcja zwracająca aktualną listę indeksów PhotoIndex (np. wszystkich kamer)
+    - base_folder: katalog, dla którego raportowane jest zajęcie dysku
+    """
+
+    def __init__(self, get_indexes, base_folder, max_photos=None, max_bytes=None, max_age_days=None,
+                 detection_max_age_days=None, interval=60.0, batch_size=200, batch_pause=0.05):
+        self.get_indexes = get_indexes
+        self.base_folder = base_folder
+        self.max_photos = max_photos
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.detection_max_age_days = detection_max_age_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+        self.runs = 0
+        self.photos_deleted = 0
+        self.detection_photos_deleted = 0
+        self.bytes_freed = 0
+        self.delete_failures = 0
+        self.last_run_seconds = None
+        self.last_run_at = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="photo-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.exception(f"Błąd podczas czyszczenia starych zdjęć: {e}")
+            self._stop_event.wait(self.interval)
+
+    def _select_for_deletion(self, photos):
+        """Wybiera zdjęcia do usunięcia. photos: lista (indeks, numer, ścieżka, mtime, rozmiar, z detekcjami)."""
+        now = time.time()
+        selected = []
+        remaining = []
+        for photo in photos:
+            _, _, _, mtime, _, has_detections = photo
+            max_age_days = self.detection_max_age_days if has_detections else self.max_age_days
+            if max_age_days is not None and now - mtime > max_age_days * 86400:
+                selected.append(photo)
+            else:
+                remaining.append(photo)
+
+        count = len(remaining)
+        total_bytes = sum(photo[4] for photo in remaining)
+        # Najpierw najstarsze zdjęcia bez detekcji, potem najstarsze z detekcjami
+        remaining.sort(key=lambda photo: (photo[5], photo[3]))
+        for photo in remaining:
+            over_count = self.max_photos is not None and count > self.max_photos
+            over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes
+            if not over_count and not over_bytes:
+                break
+            selected.append(photo)
+            count -= 1
+            total_bytes -= photo[4]
+        return selected
+
+    def run_once(self):
+        """Jedno przejście retencji. Zwraca liczbę usuniętych zdjęć."""
+        with self._run_lock:
+            started = time.monotonic()
+            photos = []
+            for index in self.get_indexes():
+                entries, latest_num = index.snapshot()
+                photos.extend((index,) + entry for entry in entries if entry[0] != latest_num)
+
+            selected = self._select_for_deletion(photos)
+            deleted = 0
+            for start in range(0, len(selected), self.batch_size):
+                if self._stop_event.is_set():
+                    break
+                deleted += self._delete_batch(selected[start:start + self.batch_size])
+                time.sleep(self.batch_pause)
+
+            self.runs += 1
+            self.last_run_seconds = time.monotonic() - started
+            self.last_run_at = time.time()
+            if deleted:
+                logger.info(f"Retencja zdjęć: usunięto {deleted} zdjęć w {self.last_run_seconds:.2f}s.")
+            return deleted
+
+    def _delete_batch(self, batch):
+        removed_by_index = {}
+        deleted = 0
+        for index, num, relative_path, _, size, has_detections in batch:
+            full_path = os.path.join(index.folder, relative_path)
+            try:
+                os.remove(full_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.delete_failures += 1
+                logger.warning(f"Nie udało się usunąć zdjęcia {full_path}: {e}")
+                continue
+            removed_by_index.setdefault(index, []).append(num)
+            deleted += 1
+            self.bytes_freed += size
+            if has_detections:
+                self.detection_photos_deleted += 1
+            shard_dir = os.path.dirname(full_path)
+            if os.path.abspath(shard_dir) != os.path.abspath(index.folder):
+                try:
+                    # Pusty podkatalog daty (przy shard_by_date) jest usuwany razem z ostatnim zdjęciem
+                    os.rmdir(shard_dir)
+                except OSError:
+                    pass
+        for index, nums in removed_by_index.items():
+            index.remove(nums)
+        self.photos_deleted += deleted
+        return deleted
+
+    def stats(self):
+        """Zwraca liczbę i rozmiar zdjęć, zajęcie dysku oraz liczniki usuniętych zdjęć."""
+        indexes = self.get_indexes()
+        try:
+            disk = shutil.disk_usage(self.base_folder)
+            disk_usage = {'total_bytes': disk.total, 'used_bytes': disk.used, 'free_bytes': disk.free}
+        except OSError:
+            disk_usage = None
+        return {
+            'photos': sum(len(index) for index in indexes),
+            'photos_bytes': sum(index.total_bytes() for index in indexes),
+            'max_photos': self.max_photos,
+            'max_bytes': self.max_bytes,
+            'max_age_days': self.max_age_days,
+            'detection_max_age_days': self.detection_max_age_days,
+            'disk': disk_usage,
+            'runs': self.runs,
+            'photos_deleted': self.photos_deleted,
+            'detection_photos_deleted': self.detection_photos_deleted,
+            'bytes_freed': self.bytes_freed,
+            'delete_failures': self.delete_failures,
+            'last_run_seconds': self.last_run_seconds,
+            'last_run_at': self.last_run_at
+        }
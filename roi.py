@@ -0,0 +1,158 @@
+import threading
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ROI_MODES = ('crop', 'tiles')
+
+
+class RegionOfInterest:
+    """
+    Obszary obserwowane przez kamerę (prostokąty i wielokąty) i przygotowanie klatek do inferencji.
+
+    Przed inferencją klatka jest przycinana do prostokąta obejmującego wszystkie obszary (mode='crop'),
+    a w trybie mode='tiles' ten prostokąt jest dodatkowo dzielony na zachodzące na siebie kafelki
+    tile_size x tile_size - małe, odległe obiekty zajmują wtedy więcej pikseli wejścia modelu.
+    Wycinki są widokami klatki (bez kopiowania). Ramki wyników są przeliczane na współrzędne pełnej
+    klatki, detekcje, których środek leży poza obszarami, są odrzucane, a w trybie kafelków powtórzenia
+    tego samego obiektu z sąsiednich kafelków są łączone (NMS).
+
+    Obszar to [x1, y1, x2, y2] (prostokąt) albo lista punktów [[x, y], ...] (wielokąt), w pikselach
+    klatki lub - przy relative=True - jako ułamki szerokości i wysokości (0-1).
+    imgsz to rozmiar wejścia modelu dla tej kamery (None - rozmiar modelu).
+    """
+
+    def __init__(self, regions, relative=False, mode='crop', imgsz=None, tile_size=640, tile_overlap=0.2,
+                 nms_threshold=0.5):
+        if mode not in ROI_MODES:
+            raise ValueError(f"Nieznany tryb obszaru zainteresowania: {mode}")
+        if not regions:
+            raise ValueError("Obszar zainteresowania wymaga co najmniej jednego prostokąta lub wielokąta")
+        self.polygons = [self._polygon(region) for region in regions]
+        self.relative = relative
+        self.mode = mode
+        self.imgsz = imgsz
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.nms_threshold = nms_threshold
+        self._geometry = {}
+        self._lock = threading.Lock()
+        self.detections_outside = 0
+
+    @staticmethod
+    def _polygon(region):
+        points = np.asarray(region, dtype=np.float64)
+        if points.shape == (4,):
+            x1, y1, x2, y2 = points
+            return np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]])
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+            raise ValueError(f"Nieprawidłowy obszar zainteresowania: {region}")
+        return points
+
+    def _frame_geometry(self, width, height):
+        """Maska obszarów i prostokąt je obejmujący (x1, y1, x2, y2) dla klatki danego rozmiaru."""
+        with self._lock:
+            geometry = self._geometry.get((width, height))
+            if geometry is not None:
+                return geometry
+            scale = np.array([width, height]) if self.relative else np.array([1.0, 1.0])
+            polygons = [np.round(polygon * scale).astype(np.int32) for polygon in self.polygons]
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, polygons, 255)
+            points = np.concatenate(polygons)
+            x1, y1 = np.clip(points.min(axis=0), 0, [width, height])
+            x2, y2 = np.clip(points.max(axis=0) + 1, 0, [width, height])
+            if x2 <= x1 or y2 <= y1:
+                logger.warning(f"Obszar zainteresowania leży poza klatką {width}x{height} - analizowana jest cała klatka.")
+                mask[:] = 255
+                x1, y1, x2, y2 = 0, 0, width, height
+            geometry = self._geometry[(width, height)] = (mask, (int(x1), int(y1), int(x2), int(y2)))
+            return geometry
+
+    @staticmethod
+    def _tile_starts(start, end, tile_size, step):
+        # Kafelki rozłożone równomiernie, z zakładką co najmniej tile_size - step
+        if end - start <= tile_size:
+            return [start]
+        count = -(-(end - start - tile_size) // step) + 1
+        return [start + round(index * (end - start - tile_size) / (count - 1)) for index in range(count)]
+
+    def views(self, frame):
+        """Wycinki klatki do inferencji: lista (obraz, (przesunięcie x, przesunięcie y))."""
+        height, width = frame.shape[:2]
+        _, (x1, y1, x2, y2) = self._frame_geometry(width, height)
+        if self.mode == 'crop':
+            return [(frame[y1:y2, x1:x2], (x1, y1))]
+        step = max(1, int(self.tile_size * (1 - self.tile_overlap)))
+        return [(frame[ty:min(ty + self.tile_size, y2), tx:min(tx + self.tile_size, x2)], (tx, ty))
+                for ty in self._tile_starts(y1, y2, self.tile_size, step)
+                for tx in self._tile_starts(x1, x2, self.tile_size, step)]
+
+    def map_detections(self, frame_shape, view_detections):
+        """
+        Łączy detekcje wycinków w detekcje pełnej klatki.
+
+        view_detections: lista (detekcje wycinka, przesunięcie) w kolejności z views(); detekcje to krotki
+        (obiekt, procent, (x1, y1, x2, y2)) we współrzędnych wycinka. Zwraca listę takich krotek we
+        współrzędnych klatki, tylko dla obiektów, których środek leży w obszarach.
+        """
+        height, width = frame_shape[:2]
+        mask, _ = self._frame_geometry(width, height)
+        detections = []
+        outside = 0
+        for view_result, (offset_x, offset_y) in view_detections:
+            for obiekt, procent, (bx1, by1, bx2, by2) in view_result:
+                box = (bx1 + offset_x, by1 + offset_y, bx2 + offset_x, by2 + offset_y)
+                center_x = min(width - 1, max(0, int((box[0] + box[2]) / 2)))
+                center_y = min(height - 1, max(0, int((box[1] + box[3]) / 2)))
+                if not mask[center_y, center_x]:
+                    outside += 1
+                    continue
+                detections.append((obiekt, procent, box))
+        if outside:
+            with self._lock:
+                self.detections_outside += outside
+        if len(view_detections) > 1:
+            detections = self._merge_duplicates(detections)
+        return detections
+
+    def _merge_duplicates(self, detections):
+        """NMS w obrębie każdego obiektu - ten sam obiekt wykryty w kilku zachodzących kafelkach."""
+        merged = []
+        for obiekt in dict.fromkeys(detection[0] for detection in detections):
+            same = [detection for detection in detections if detection[0] == obiekt]
+            boxes = [[x1, y1, x2 - x1, y2 - y1] for _, _, (x1, y1, x2, y2) in same]
+            scores = [float(procent) for _, procent, _ in same]
+            keep = cv2.dnn.NMSBoxes(boxes, scores, 0.0, self.nms_threshold)
+            merged.extend(same[int(index)] for index in np.asarray(keep).reshape(-1))
+        return merged
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'regions': len(self.polygons),
+                'imgsz': self.imgsz,
+                'detections_outside': self.detections_outside,
+                'frame_regions': {f"{width}x{height}": list(box) for (width, height), (_, box) in self._geometry.items()}
+            }
+
+
+def create_roi(roi_config):
+    """
+    Tworzy RegionOfInterest z sekcji "roi" konfiguracji kamery lub zwraca None, gdy jej nie ma
+    (analizowana jest cała klatka). Sekcja bez obszarów (np. tylko imgsz) obejmuje całą klatkę.
+    """
+    if not roi_config:
+        return None
+    regions = roi_config.get('regions') or [[0, 0, 1, 1]]
+    relative = roi_config.get('relative', False) if roi_config.get('regions') else True
+    return RegionOfInterest(regions,
+                            relative=relative,
+                            mode=roi_config.get('mode', 'crop'),
+                            imgsz=roi_config.get('imgsz'),
+                            tile_size=roi_config.get('tile_size', 640),
+                            tile_overlap=roi_config.get('tile_overlap', 0.2),
+                            nms_threshold=roi_config.get('nms_threshold', 0.5))
@@ -1,131 +1,126 @@
 import os
-import cv2
-import glob
-import time
-import platform
+import atexit
+import argparse
 import threading
-import traceback
-from ultralytics import YOLO
-from datetime import datetime
-from flask import Flask, render_template, send_from_directory, url_for, request, jsonify
-from db_connector import get_db_connection, insert_detected_object, create_table_if_not_exists
+import logging
+import cv2
+from flask import Flask, Response, render_template, send_from_directory, url_for, request, jsonify, stream_with_context
+from db_connector import get_connection_pool, ensure_table_exists, DetectionWriter
+from detection_cache import DetectionCache
+from detection_store import detections_response, detection_counts_response
+from image_server import ThumbnailCache, send_photo
+from inference_scheduler import InferenceScheduler
+from model_config import load_model_config, BackgroundModelLoader
+from frame_buffer import generate_mjpeg_stream
+from event_bus import EventBus, EventLog, generate_event_stream
+from stream_limit import DEFAULT_HTTP_THREADS, StreamLimiter, load_http_settings, too_many_streams
+from camera_worker import CameraWorker, CameraRegistry
+from camera_discovery import CameraDiscovery
+from motion_detector import create_motion_detector
+from roi import create_roi
+from retention import RetentionManager
+from camera_service import EVENT_POLL_TIMEOUT, load_camera_service_address, serve_camera_service
+from shared_frame import SharedFrameWriter, shared_frame_name
+from logging_config import configure_logging
+from metrics import (REGISTRY, QUEUE_DEPTH, CAMERA_ACTIVE, CAMERA_REMAINING, CAPTURE_INTERVAL, COMPONENT_UP,
+                     instrument_flask_app, render_metrics)
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__, template_folder='template', static_folder='template')
-
-# Inicjalizacja połączenia z bazą danych
-db_conn = get_db_connection()
-if db_conn:
-    create_table_if_not_exists(db_conn)
-    print("Połączenie z bazą danych PostgreSQL ustanowione pomyślnie.")
-else:
-    print("OSTRZEŻENIE: Nie można połączyć się z bazą danych PostgreSQL. Detekcje nie będą zapisywane.")
-
-# Tablica do śledzenia obiektów wykrytych w bieżącej sesji kamery
-detected_objects_in_session = []
-session_objects_lock = threading.Lock()
+instrument_flask_app(app)
+
+# Pula połączeń z bazą danych - każdy wątek pobiera własne połączenie na czas transakcji.
+# Połączenie i sprawdzenie schematu odbywają się przy starcie usług (start_services), a nie przy imporcie modułu.
+db_pool = get_connection_pool()
+
+# Buforowany zapis detekcji - wiele wierszy w jednej transakcji zamiast osobnego commitu dla każdego
+DB_BATCH_SIZE = 500
+DB_FLUSH_INTERVAL = 2.0
+DB_WRITER_QUEUE_SIZE = 50000
+detection_writer = DetectionWriter(batch_size=DB_BATCH_SIZE, flush_interval=DB_FLUSH_INTERVAL,
+                                   max_queue=DB_WRITER_QUEUE_SIZE, pool=db_pool)
+# Przy zamykaniu procesu detekcje z kolejki są zapisywane, zanim zostanie zamknięta pula połączeń
+atexit.register(db_pool.close)
+atexit.register(detection_writer.close)
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 CAMERA_FOLDER = os.path.join(current_dir, "kamera")
-MODEL_PATH = os.path.join(current_dir, "yolo12x.pt")
-
-# Załaduj model YOLO
-model = YOLO(MODEL_PATH)
-print(f"Model YOLO załadowany z: {MODEL_PATH}")
-
-camera_port = None
-global_cap = None
-global_capture_end_time = None
-
-capture_active = False
-capture_thread = None
-global_capture_active_lock = threading.Lock()
-
-def get_next_photo_filename():
-    """Generuje ścieżkę do następnego pliku zdjęcia w folderze CAMERA_FOLDER."""
-    if not os.path.exists(CAMERA_FOLDER):
-        os.makedirs(CAMERA_FOLDER)
-        print(f"Utworzono katalog na zdjęcia z kamery: {CAMERA_FOLDER}")
-    
-    existing_photos = glob.glob(os.path.join(CAMERA_FOLDER, "photo*.jpg"))
-    if not existing_photos:
-        return os.path.join(CAMERA_FOLDER, "photo1.jpg")
-    
-    max_num = 0
-    for photo_path in existing_photos:
-        try:
-            filename = os.path.basename(photo_path)
-            num_str = filename.replace("photo", "").replace(".jpg", "")
-            num = int(num_str)
-            if num > max_num:
-                max_num = num
-        except ValueError:
-            print(f"Pominięto plik o nieprawidłowej nazwie: {photo_path}")
-            pass
-    
-    next_num = max_num + 1
-    return os.path.join(CAMERA_FOLDER, f"photo{next_num}.jpg")
-
-def scan_usb_for_camera():
-    """Skanuje porty USB w poszukiwaniu podłączonej kamery."""
-    system = platform.system()
-    found_cameras = []
-    
-    if system == "Windows":
-        print("Skanowanie kamer (Windows)...")
-        for i in range(10):
-            cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-            if cap.isOpened():
-                print(f"Znaleziono kamerę na porcie {i}")
-                found_cameras.append(i)
-                cap.release()
-            else:
-                cap.release()
-    elif system == "Linux":
-        print("Skanowanie kamer (Linux)...")
-        devices = glob.glob('/dev/video*')
-        for device_path in devices:
-            try:
-                port_num = int(device_path.replace('/dev/video', ''))
-                cap = cv2.VideoCapture(port_num)
-                if cap.isOpened():
-                    print(f"Znaleziono kamerę na urządzeniu {device_path} (port {port_num})")
-                    found_cameras.append(port_num)
-                    cap.release()
-                else:
-                    cap.release()
-            except ValueError:
-                print(f"Nie można przetworzyć {device_path} jako portu kamery.")
-            except Exception as e:
-                print(f"Błąd podczas sprawdzania kamery {device_path}: {e}")
-                if 'cap' in locals() and cap.isOpened():
-                    cap.release()
-    
-    if found_cameras:
-        print(f"Lista znalezionych działających kamer: {found_cameras}")
-        return found_cameras[0]
-    else:
-        print("Nie znaleziono żadnej działającej kamery.")
-        return None
-
-def get_latest_photo_details():
-    """Zwraca nazwę pliku i czas modyfikacji najnowszego zdjęcia, oraz pełną ścieżkę lub (None, None, None)."""
-    if not os.path.exists(CAMERA_FOLDER):
-        return None, None, None
-    
-    photo_files = glob.glob(os.path.join(CAMERA_FOLDER, "photo*.jpg"))
-    if not photo_files:
-        return None, None, None
-        
-    latest_photo_path = max(photo_files, key=os.path.getmtime)
-    modification_time = os.path.getmtime(latest_photo_path)
-    return os.path.basename(latest_photo_path), modification_time, latest_photo_path
+CAMERA_CONFIG_PATH = os.path.join(current_dir, "cameras.json")
+
+# Model YOLO - wariant, rozmiar wejścia i backend (OpenVINO/ONNX/PyTorch) z model.env lub zmiennych środowiskowych.
+# Ładowany w tle (z rozgrzewką) po starcie usług, więc serwer odpowiada od razu, a /ready informuje o gotowości.
+model_config = load_model_config(os.path.join(current_dir, "model.env"))
+model_loader = BackgroundModelLoader(model_config)
+# Jak długo wątek inferencji czeka na załadowanie modelu, zanim zgłosi błąd
+MODEL_LOAD_TIMEOUT = 600
+MODEL_LOADING_MESSAGE = "Model jest ładowany. Analiza będzie dostępna za chwilę."
+
+# Cache wyników detekcji, aby odpytywanie o to samo zdjęcie nie uruchamiało ponownie modelu
+DETECTION_CACHE_SIZE = 256
+detection_cache = DetectionCache(max_entries=DETECTION_CACHE_SIZE)
+
+# Cache miniatur zdjęć (/kamera/<plik>?w=320), aby galeria nie skalowała tych samych zdjęć przy każdym odświeżeniu
+THUMBNAIL_CACHE_BYTES = 32 * 1024 * 1024
+thumbnail_cache = ThumbnailCache(max_bytes=THUMBNAIL_CACHE_BYTES)
+
+def predict_batch(sources, imgsz=None):
+    """Jedno wywołanie modelu dla partii obrazów (ścieżek lub klatek). Zwraca wynik dla każdego obrazu."""
+    model = model_loader.get(timeout=MODEL_LOAD_TIMEOUT)
+    return model.predict(sources, imgsz=imgsz or model_loader.info['imgsz'], save=False, classes=[0, 16], verbose=False)
+
+# Wszystkie wywołania modelu przechodzą przez jeden wątek, który łączy obrazy z wielu kamer i zapytań w partie
+INFERENCE_MAX_BATCH_SIZE = 8
+INFERENCE_MAX_WAIT_MS = 20
+INFERENCE_QUEUE_SIZE = 64
+inference_scheduler = InferenceScheduler(predict_batch,
+                                         max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                                         max_wait_ms=INFERENCE_MAX_WAIT_MS,
+                                         max_queue=INFERENCE_QUEUE_SIZE)
+atexit.register(inference_scheduler.stop)
+
+# Domyślne ustawienia kamer (mogą być nadpisane dla każdej kamery w cameras.json)
+DEFAULT_CAPTURE_INTERVAL = 3
+# Zakres interwału adaptacyjnego: szybciej przy ruchu i detekcjach, wolniej w spokojnej scenie.
+# Używany dla kamer bez "interval" w cameras.json (sam "interval" oznacza stały interwał)
+DEFAULT_MIN_CAPTURE_INTERVAL = 0.5
+DEFAULT_MAX_CAPTURE_INTERVAL = 10
+# Ile razy na sekundę dekodować najnowszą klatkę z kamery (strumień na żywo, zdjęcia na żądanie)
+CAMERA_DECODE_FPS = 10
+# Filtr ruchu przed modelem - domyślne ustawienia, nadpisywane sekcją "motion" kamery w cameras.json
+MOTION_DEFAULTS = {
+    'enabled': True,
+    'method': 'diff',
+    'pixel_threshold': 25,
+    'min_changed_ratio': 0.01,
+    'max_skip_seconds': 60,
+    'save_static_frames': False
+}
+# Indeks zdjęć w pamięci - przy True zdjęcia trafiają do podkatalogów RRRR-MM-DD
+PHOTO_SHARD_BY_DATE = False
+
+# Strumień na żywo - najnowsza klatka kamery kodowana raz niezależnie od liczby klientów
+STREAM_DEFAULT_FPS = 5
+STREAM_MAX_FPS = 15
+STREAM_MAX_WIDTH = 1280
+STREAM_IDLE_TIMEOUT = 30
+
+# Zdarzenia (nowe zdjęcie, zmiana detekcji, stan kamery) wysyłane do przeglądarek przez Server-Sent Events
+SSE_KEEPALIVE_INTERVAL = 15
+event_bus = EventBus()
+
+# Strumienie SSE i MJPEG trzymają wątek serwera przez cały czas połączenia - ich liczba jest ograniczona
+# (HTTP_THREADS, MAX_HTTP_STREAMS; zasady doboru w stream_limit.load_http_settings)
+http_threads, max_http_streams = load_http_settings()
+stream_limiter = StreamLimiter(max_http_streams)
 
 # Nowe funkcje dla analizy obrazu
 def process_detection_results(results):
-    """Przetwarza wyniki detekcji z modelu YOLO i zwraca statystyki oraz szczegóły."""
-    people_count = 0
-    dogs_count = 0
-    detection_details = []
+    """
+    Przetwarza wyniki detekcji z modelu YOLO i zwraca statystyki oraz szczegóły.
+
+    current_detections to lista krotek (obiekt, procent, (x1, y1, x2, y2)) z ramką w pikselach obrazu.
+    """
     current_detections = []
 
     for result in results:
@@ -133,41 +128,21 @@ def process_detection_results(results):
         for box in boxes:
             cls_id = int(box.cls[0])
             confidence = float(box.conf[0])
+            xyxy = tuple(float(value) for value in box.xyxy[0])
             
             if cls_id == 0:  # Osoba
-                people_count += 1
-                detection_details.append(f"Człowiek ({confidence*100:.0f}%)")
-                current_detections.append(("Człowiek", confidence*100))
+                current_detections.append(("Człowiek", confidence*100, xyxy))
             elif cls_id == 16:  # Pies
-                dogs_count += 1
-                detection_details.append(f"Pies ({confidence*100:.0f}%)")
-                current_detections.append(("Pies", confidence*100))
+                current_detections.append(("Pies", confidence*100, xyxy))
     
-    return people_count, dogs_count, detection_details, current_detections
-
-def update_session_detections(current_detections):
-    """Aktualizuje tablicę obiektów wykrytych w sesji na podstawie bieżących detekcji."""
-    with session_objects_lock:
-        for obj_type, confidence in current_detections:
-            # Sprawdź, czy obiekt już istnieje w tablicy
-            found = False
-            for obj in detected_objects_in_session:
-                if obj['obiekt'] == obj_type:
-                    found = True
-                    # Aktualizuj tylko jeśli nowa pewność jest większa
-                    if confidence > obj['procent']:
-                        obj['procent'] = confidence
-                        obj['czas'] = datetime.now()
-                    break
-            
-            # Jeśli nie znaleziono obiektu w tablicy, dodaj nowy
-            if not found:
-                detected_objects_in_session.append({
-                    'obiekt': obj_type,
-                    'procent': confidence,
-                    'czas': datetime.now()
-                })
-                print(f"Dodano nowy obiekt do sesji: {obj_type} ({confidence}%)")
+    return count_detections(current_detections) + (current_detections,)
+
+def count_detections(current_detections):
+    """Zwraca liczbę ludzi, liczbę psów i opisy detekcji dla listy (obiekt, procent, ramka)."""
+    people_count = sum(1 for obiekt, _, _ in current_detections if obiekt == "Człowiek")
+    dogs_count = sum(1 for obiekt, _, _ in current_detections if obiekt == "Pies")
+    detection_details = [f"{obiekt} ({procent:.0f}%)" for obiekt, procent, _ in current_detections]
+    return people_count, dogs_count, detection_details
 
 def format_detection_summary(people_count, dogs_count, detection_details):
     """Formatuje podsumowanie detekcji do wyświetlenia."""
@@ -181,222 +156,328 @@ def format_detection_summary(people_count, dogs_count, detection_details):
             summary.append(f"Psy: {dogs_count}")
         return f"Wykryto: {', '.join(summary)}. Szczegóły: {'; '.join(detection_details)}"
 
-def analyze_image_for_web(image_path):
-    """Analizuje obraz za pomocą YOLO i zwraca opis wykrytych obiektów."""
-    if not image_path or not os.path.exists(image_path):
-        return "Brak obrazu do analizy."
-
+def detect_objects(source, roi=None):
+    """
+    Uruchamia model na ścieżce do pliku lub klatce (ndarray).
+
+    Z roi (RegionOfInterest kamery) model analizuje tylko wycinki klatki z obserwowanym obszarem
+    (z rozmiarem wejścia roi.imgsz), a ramki detekcji są przeliczane na współrzędne pełnej klatki.
+    Zwraca słownik z podsumowaniem do wyświetlenia, liczbą ludzi i psów oraz listą detekcji z ramkami.
+    """
+    if roi is None:
+        result = inference_scheduler.predict(source)
+        people_count, dogs_count, detection_details, current_detections = process_detection_results([result])
+    else:
+        frame = cv2.imread(source) if isinstance(source, str) else source
+        if frame is None:
+            raise ValueError(f"Nie można odczytać obrazu {source}")
+        views = roi.views(frame)
+        # Wszystkie wycinki trafiają do kolejki od razu, więc harmonogram analizuje je w jednej partii
+        futures = [inference_scheduler.submit(view, roi.imgsz) for view, _ in views]
+        view_detections = [(process_detection_results([future.result()])[3], offset)
+                           for future, (_, offset) in zip(futures, views)]
+        current_detections = roi.map_detections(frame.shape, view_detections)
+        people_count, dogs_count, detection_details = count_detections(current_detections)
+
+    return {
+        'summary': format_detection_summary(people_count, dogs_count, detection_details),
+        'people_count': people_count,
+        'dogs_count': dogs_count,
+        'detections': current_detections
+    }
+
+def create_camera_worker(camera_id, port, folder, camera_config):
+    """Tworzy CameraWorker dla kamery z rejestru, z ustawieniami z cameras.json lub domyślnymi."""
+    motion_config = dict(MOTION_DEFAULTS, **camera_config.get('motion', {}))
+    # Kamera z samym "interval" (bez zakresu) ma stały interwał - domyślny zakres tylko bez interwału w konfiguracji
+    configured_interval = 'interval' in camera_config
+    default_min_interval = None if configured_interval else DEFAULT_MIN_CAPTURE_INTERVAL
+    default_max_interval = None if configured_interval else DEFAULT_MAX_CAPTURE_INTERVAL
+    return CameraWorker(camera_id, port, folder,
+                        detect_fn=detect_objects,
+                        detection_cache=detection_cache,
+                        detection_writer=detection_writer,
+                        event_bus=event_bus,
+                        interval=camera_config.get('interval', DEFAULT_CAPTURE_INTERVAL),
+                        min_interval=camera_config.get('min_interval', default_min_interval),
+                        max_interval=camera_config.get('max_interval', default_max_interval),
+                        width=camera_config.get('width', 1280),
+                        height=camera_config.get('height', 720),
+                        fps=camera_config.get('fps', 30),
+                        shard_by_date=PHOTO_SHARD_BY_DATE,
+                        motion_detector=create_motion_detector(motion_config, base_dir=current_dir),
+                        roi=create_roi(camera_config.get('roi')),
+                        save_static_frames=motion_config['save_static_frames'],
+                        max_decode_fps=camera_config.get('decode_fps', CAMERA_DECODE_FPS))
+
+# Wykrywanie kamer - urządzenia sprawdzane równolegle (najwyżej CAMERA_PROBE_TIMEOUT s), wyniki pamiętane
+# i odświeżane po podłączeniu lub odłączeniu kamery (inotify na /dev, bez niego co CAMERA_POLL_INTERVAL s)
+CAMERA_PROBE_TIMEOUT = 5.0
+CAMERA_POLL_INTERVAL = 30.0
+camera_discovery = CameraDiscovery(busy_ports=lambda: camera_registry.busy_ports(),
+                                   probe_timeout=CAMERA_PROBE_TIMEOUT, poll_interval=CAMERA_POLL_INTERVAL)
+
+# Rejestr kamer - jeden wątek przechwytywania i jedna sesja na urządzenie
+camera_registry = CameraRegistry(CAMERA_FOLDER, create_camera_worker, config_path=CAMERA_CONFIG_PATH,
+                                 discovery=camera_discovery)
+
+# Retencja zdjęć - folder kamer przestaje rosnąć po osiągnięciu limitów (None wyłącza limit)
+RETENTION_MAX_PHOTOS = 20000
+RETENTION_MAX_BYTES = 5 * 1024 ** 3
+RETENTION_MAX_AGE_DAYS = 7
+RETENTION_DETECTION_MAX_AGE_DAYS = 30
+RETENTION_INTERVAL = 60
+retention_manager = RetentionManager(lambda: [worker.photo_index for worker in camera_registry.all()],
+                                     CAMERA_FOLDER,
+                                     max_photos=RETENTION_MAX_PHOTOS,
+                                     max_bytes=RETENTION_MAX_BYTES,
+                                     max_age_days=RETENTION_MAX_AGE_DAYS,
+                                     detection_max_age_days=RETENTION_DETECTION_MAX_AGE_DAYS,
+                                     interval=RETENTION_INTERVAL)
+
+# Stan uruchamiania usług (model, zapis do bazy, kamery) - raportowany przez /ready
+services_started = False
+services_lock = threading.Lock()
+database_ready = False
+cameras_scanned = False
+
+def initialize_services_in_background():
+    """Sprawdza schemat bazy danych i skanuje kamery bez blokowania obsługi zapytań."""
+    global database_ready, cameras_scanned
     try:
-        results = model.predict(image_path, save=False, classes=[0, 16], verbose=False)
-        people_count, dogs_count, detection_details, current_detections = process_detection_results(results)
-        
-        # Aktualizacja tablicy obiektów wykrytych w sesji
-        update_session_detections(current_detections)
-        
-        return format_detection_summary(people_count, dogs_count, detection_details)
-
+        with db_pool.connection() as conn:
+            ensure_table_exists(conn)
+        database_ready = True
+        logger.info("Połączenie z bazą danych PostgreSQL ustanowione pomyślnie.")
     except Exception as e:
-        print(f"Błąd podczas analizy obrazu {image_path}: {e}")
-        traceback.print_exc()
-        return "Błąd analizy obrazu."
-
-# Funkcje związane z kamerą
-def open_camera_with_settings(port, width=1280, height=720, fps=30):
-    """Otwiera kamerę z określonymi ustawieniami."""
-    cap = None
-    try:
-        if platform.system() == "Windows":
-            cap = cv2.VideoCapture(port, cv2.CAP_DSHOW)
-        else:
-            cap = cv2.VideoCapture(port)
+        logger.warning(f"Nie można połączyć się z bazą danych PostgreSQL ({e}). Zapis detekcji będzie ponawiany po przywróceniu połączenia.")
 
-        if not cap.isOpened():
-            print(f"Nie można otworzyć kamery na porcie {port}.")
-            return None
+    os.makedirs(CAMERA_FOLDER, exist_ok=True)
+    logger.info("Inicjalne skanowanie w poszukiwaniu kamer...")
+    workers = camera_registry.scan()
+    if workers:
+        logger.info(f"Kamery dostępne przy starcie: {', '.join(worker.camera_id for worker in workers)}")
+    else:
+        logger.warning("Nie znaleziono kamery przy starcie serwera.")
+    cameras_scanned = True
+    camera_discovery.start()
+    # Pierwsze czyszczenie po zeskanowaniu kamer, gdy znane są już wszystkie indeksy zdjęć
+    retention_manager.start()
+
+def start_services():
+    """
+    Uruchamia usługi w tle: ładowanie i rozgrzewkę modelu, zapis detekcji, harmonogram inferencji,
+    sprawdzenie bazy danych i skanowanie kamer. Wywołanie wielokrotne jest bezpieczne.
+    """
+    global services_started
+    with services_lock:
+        if services_started:
+            return
+        services_started = True
+    model_loader.start()
+    detection_writer.start()
+    inference_scheduler.start()
+    threading.Thread(target=initialize_services_in_background, name="startup", daemon=True).start()
+
+def shutdown_services():
+    """Zatrzymuje kamery, zapisuje detekcje pozostałe w buforze i zamyka połączenia z bazą danych."""
+    retention_manager.stop()
+    camera_discovery.stop()
+    camera_registry.shutdown()
+    inference_scheduler.stop()
+    detection_writer.close()
+    db_pool.close()
+    logger.info("Połączenia z bazą danych zostały zamknięte.")
+
+@app.before_request
+def ensure_services_started():
+    # Przy uruchomieniu przez serwer WSGI (bez bloku __main__) usługi startują przy pierwszym zapytaniu
+    start_services()
+
+def describe_image(worker, image_path):
+    """Opis detekcji dla zdjęcia - bez czekania na model, jeśli jest jeszcze ładowany."""
+    if not model_loader.is_ready():
+        return MODEL_LOADING_MESSAGE
+    return worker.analyze_image_for_web(image_path)
+
+def get_camera_or_404(camera_id):
+    """Zwraca CameraWorker o podanym identyfikatorze albo odpowiedź 404."""
+    worker = camera_registry.get(camera_id)
+    if worker is None:
+        return None, (jsonify({'status': 'error', 'message': f'Nieznana kamera: {camera_id}.'}), 404)
+    return worker, None
+
+def get_latest_image_state(worker):
+    """Najnowsze zdjęcie kamery, opis detekcji i stan kamery (bez adresu URL - niezależne od kontekstu Flask)."""
+    image_filename, image_path = None, None
+    if worker is not None:
+        image_filename, _, image_path = worker.get_latest_photo_details()
+    detection_info = "Analiza nie przeprowadzona."
 
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-        cap.set(cv2.CAP_PROP_FPS, fps)
-        
-        actual_width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
-        actual_height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
-        actual_fps = cap.get(cv2.CAP_PROP_FPS)
-        print(f"Kamera otwarta na porcie {port}. Ustawienia: {width}x{height} @ {fps} FPS.")
-        print(f"Rzeczywiste ustawienia: {actual_width}x{actual_height} @ {actual_fps} FPS.")
+    if image_filename and image_path:
+        detection_info = describe_image(worker, image_path)
+        status_message = 'success'
+    elif image_filename:
+        detection_info = "Brak ścieżki do analizy obrazu."
+        status_message = 'success_no_analysis'
+    else:
+        detection_info = "Brak zdjęć."
+        status_message = 'info'
 
-        if actual_width == 0 or actual_height == 0:
-            print(f"Ostrzeżenie: Kamera na porcie {port} może nie wspierać zmiany rozdzielczości/FPS lub zwróciła nieprawidłowe wartości.")
+    camera_active_status, remaining_time_status = worker.get_camera_status() if worker is not None else (False, 0)
 
-        return cap
-    except Exception as e:
-        print(f"Błąd podczas otwierania lub konfigurowania kamery na porcie {port}: {e}")
-        traceback.print_exc()
-        if cap is not None:
-            cap.release()
-        return None
-
-def capture_image_from_camera_instance(cap_instance, output_path):
-    """Wykonuje zdjęcie z już otwartej instancji kamery."""
+    return {
+        'status': status_message, 
+        'camera_id': worker.camera_id if worker is not None else None,
+        'image_filename': image_filename,
+        'detection_info': detection_info,
+        'camera_active': camera_active_status,
+        'remaining_time': remaining_time_status,
+        'message': "Brak zdjęć." if status_message == 'info' else ""
+    }
+
+def build_latest_image_info(worker):
+    """Buduje odpowiedź z najnowszym zdjęciem kamery, opisem detekcji i stanem kamery."""
+    info = get_latest_image_state(worker)
+    image_filename = info['image_filename']
+    info['image_url'] = url_for('get_camera_image', filename=image_filename, _external=True) if image_filename else None
+    return info
+
+def run_camera_command(worker, data):
+    """
+    Wykonuje komendę ON/OFF (payload /TurnCameraON) dla danej kamery. Zwraca (odpowiedź, kod HTTP).
+
+    Payload ON: Time (czas sesji w s), opcjonalnie Interval (sam - stały interwał zdjęć, z zakresem -
+    interwał początkowy) oraz MinInterval i MaxInterval (zakres interwału adaptacyjnego w tej sesji).
+    """
+    data = data or {}
+    status = data.get('Status')
+    if status == 'ON':
+        try:
+            duration = int(data.get('Time', '30'))
+            interval, min_interval, max_interval = (float(data[key]) if data.get(key) is not None else None
+                                                    for key in ('Interval', 'MinInterval', 'MaxInterval'))
+        except (TypeError, ValueError):
+            return {'status': 'error', 'message': 'Nieprawidłowy format czasu.'}, 400
+        response, code = worker.turn_on(duration, interval, min_interval, max_interval)
+    elif status == 'OFF':
+        response, code = worker.turn_off()
+    else:
+        return {'status': 'error', 'message': 'Nieprawidłowy status. Użyj "ON" lub "OFF".'}, 400
+    response['camera_id'] = worker.camera_id
+    return response, code
+
+def handle_camera_command(worker, data):
+    """Obsługuje komendę ON/OFF z /TurnCameraON dla danej kamery."""
+    response, code = run_camera_command(worker, data)
+    return jsonify(response), code
+
+def live_stream_response(worker):
+    """
+    Strumień MJPEG (multipart/x-mixed-replace) z najnowszych klatek kamery.
+
+    Parametry zapytania:
+    - fps: maksymalna liczba klatek na sekundę dla tego klienta (domyślnie STREAM_DEFAULT_FPS)
+    - w: szerokość klatek w pikselach (zmniejszenie rozdzielczości, domyślnie oryginalna)
+    """
     try:
-        ret, frame = cap_instance.read()
-        if ret:
-            cv2.imwrite(output_path, frame)
-            print(f"Zdjęcie zapisane jako {output_path}")
-            return True
-        else:
-            print("Nie udało się przechwycić obrazu z otwartej kamery.")
-            return False
-    except Exception as e:
-        print(f"Błąd podczas przechwytywania obrazu z instancji kamery: {e}")
-        traceback.print_exc()
-        return False
-
-def capture_image_from_camera(port, output_path, width=1280, height=720, fps=30):
-    """Wykonuje zdjęcie z kamery i zapisuje je do pliku. Zarządza otwarciem i zamknięciem kamery."""
-    cap = None
-    try:
-        cap = open_camera_with_settings(port, width, height, fps)
-        if cap is None:
-            return False 
-
-        ret, frame = cap.read()
-        if ret:
-            cv2.imwrite(output_path, frame)
-            print(f"Zdjęcie zapisane jako {output_path}")
-            return True
-        else:
-            print(f"Nie udało się przechwycić obrazu z kamery na porcie {port}.")
-            return False
-    except Exception as e:
-        print(f"Błąd podczas przechwytywania obrazu z kamery {port}: {e}")
-        traceback.print_exc()
-        return False
-    finally:
-        if cap is not None:
-            cap.release()
-            print(f"Kamera na porcie {port} została zwolniona.")
-
-# Funkcje dla zarządzania sesją i bazą danych
-def save_session_objects_to_db():
-    """Zapisuje wszystkie wykryte obiekty z bieżącej sesji do bazy danych."""
-    with session_objects_lock:
-        if detected_objects_in_session:
-            print("Zapisywanie wykrytych obiektów do bazy danych:")
-            for obj in detected_objects_in_session:
-                if db_conn:
-                    insert_detected_object(obj['obiekt'], obj['procent'], obj['czas'], db_conn)
-                    print(f"- {obj['obiekt']}: {obj['procent']}% (czas: {obj['czas']})")
-                else:
-                    print(f"- {obj['obiekt']}: {obj['procent']}% (czas: {obj['czas']}) - BRAK POŁĄCZENIA Z BAZĄ")
-            return True
-        else:
-            print("Nie wykryto żadnych obiektów w tej sesji")
-            return False
-
-def reset_session_objects():
-    """Resetuje listę wykrytych obiektów w sesji."""
-    with session_objects_lock:
-        global detected_objects_in_session
-        detected_objects_in_session = []
-        print("Zresetowano listę wykrytych obiektów na początku nowej sesji")
-
-def get_camera_status():
-    """Zwraca aktualny status kamery i pozostały czas."""
-    with global_capture_active_lock:
-        camera_active_status = capture_active
-        remaining_time_status = 0
-        if global_capture_end_time and camera_active_status:
-            remaining_time_status = max(0, int(global_capture_end_time - time.time()))
-    return camera_active_status, remaining_time_status
-
-def photo_capture_loop(cap_instance, duration_seconds, interval_seconds):
-    global camera_port, capture_active, global_capture_active_lock, global_capture_end_time
-    
-    start_loop_time = time.time()
-    next_capture_time = start_loop_time
-
-    print(f"Rozpoczynanie pętli przechwytywania na {duration_seconds}s, interwał {interval_seconds}s")
-
-    active_in_this_run = True 
-
-    while active_in_this_run and (time.time() < start_loop_time + duration_seconds):
-        with global_capture_active_lock: 
-            if not capture_active:
-                active_in_this_run = False
-                print("Pętla przechwytywania zatrzymana przez flagę capture_active.")
-                break
-        
-        if not active_in_this_run: 
-            break
-
-        current_time = time.time()
-        if current_time >= next_capture_time:
-            if cap_instance and cap_instance.isOpened():
-                photo_path = get_next_photo_filename()
-                success = capture_image_from_camera_instance(cap_instance, photo_path)
-                if success:
-                    print(f"Zrobiono zdjęcie: {photo_path} o {time.strftime('%Y-%m-%d %H:%M:%S')}")
-                else:
-                    print(f"Nie udało się zrobić zdjęcia o {time.strftime('%Y-%m-%d %H:%M:%S')}")
-                next_capture_time = current_time + interval_seconds
-            else:
-                print("Kamera nie jest otwarta w pętli przechwytywania. Zatrzymywanie pętli.")
-                active_in_this_run = False 
-                break
-        
-        # Efektywne oczekiwanie
-        time_to_next_capture = next_capture_time - time.time()
-        sleep_duration = max(0, min(0.1, time_to_next_capture if time_to_next_capture > 0 else 0))
-        time.sleep(sleep_duration)
-    
-    print(f"Zakończono pętlę przechwytywania zdjęć. Czas trwania: {duration_seconds}s.")
-    with global_capture_active_lock:
-        if capture_active and not active_in_this_run:
-             pass
-        elif capture_active:
-            print("Pętla zakończona automatycznie (upłynął czas). Ustawiam capture_active na False.")
-            # Zapisanie wszystkich wykrytych obiektów do bazy danych przy automatycznym zakończeniu
-            save_session_objects_to_db()
-            capture_active = False
-            global_capture_end_time = time.time()
-            # Tutaj nie zwalniamy kamery, to zrobi inny kod, gdy wykryje zmianę capture_active
+        fps = max(0.1, min(float(request.args.get('fps', STREAM_DEFAULT_FPS)), STREAM_MAX_FPS))
+        width = request.args.get('w', type=int)
+        if width is not None:
+            width = max(16, min(width, STREAM_MAX_WIDTH))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Nieprawidłowe parametry strumienia.'}), 400
+
+    if not stream_limiter.acquire():
+        return too_many_streams()
+    stream = stream_limiter.wrap(generate_mjpeg_stream(worker.frame_buffer, max_fps=fps, width=width, idle_timeout=STREAM_IDLE_TIMEOUT))
+    response = Response(stream_with_context(stream), mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    return response
+
+def snapshot_response(worker):
+    """Najnowsza klatka kamery jako JPEG (parametr w: szerokość), bez odczytu z kamery."""
+    width = request.args.get('w', type=int)
+    if width is not None:
+        width = max(16, min(width, STREAM_MAX_WIDTH))
+    _, jpeg = worker.frame_buffer.get_jpeg(width)
+    if jpeg is None:
+        return jsonify({'status': 'error', 'message': 'Brak klatki z kamery. Włącz kamerę.'}), 404
+    response = Response(jpeg, mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    return response
 
 # Trasy Flask
 @app.route('/')
 def home():
     try:
-        image_filename, _, image_path = get_latest_photo_details()
+        worker = camera_registry.default()
+        image_filename, image_path = None, None
+        if worker is not None:
+            image_filename, _, image_path = worker.get_latest_photo_details()
         image_exists = image_filename is not None
         detection_info = None
         if image_exists and image_path:
-            detection_info = analyze_image_for_web(image_path)
+            detection_info = describe_image(worker, image_path)
             
-        camera_active_status, remaining_time_status = get_camera_status()
+        camera_active_status, remaining_time_status = worker.get_camera_status() if worker is not None else (False, 0)
 
         return render_template('index.html', 
                                image_exists=image_exists, 
                                image_filename=image_filename,
                                detection_info=detection_info,
                                camera_active=camera_active_status,
-                               remaining_time=remaining_time_status)
+                               remaining_time=remaining_time_status,
+                               camera_id=worker.camera_id if worker is not None else None)
     except Exception as e:
-        print(f"Błąd w home: {e}")
-        traceback.print_exc()
+        logger.exception(f"Błąd w home: {e}")
         return render_template('index.html', 
                                image_exists=False, 
                                image_filename=None,
                                detection_info="Błąd ładowania informacji.",
                                camera_active=False,
-                               remaining_time=0)
+                               remaining_time=0,
+                               camera_id=None)
 
 @app.route('/kamera/<path:filename>')
 def get_camera_image(filename):
+    """Zdjęcie z kamery lub jego miniatura (?w=szerokość) z nagłówkami ETag/Last-Modified i obsługą 304."""
     try:
-        return send_from_directory(CAMERA_FOLDER, filename, as_attachment=False)
+        response = send_photo(CAMERA_FOLDER, filename, thumbnail_cache)
     except Exception as e:
-        print(f"Błąd przy serwowaniu obrazu {filename}: {e}")
-        traceback.print_exc()
+        logger.exception(f"Błąd przy serwowaniu obrazu {filename}: {e}")
+        response = None
+    if response is None:
         return "Błąd serwowania obrazu", 404
+    return response
+
+@app.route('/stream')
+def live_stream():
+    """Strumień MJPEG domyślnej kamery (parametry jak w /cameras/<camera_id>/stream)."""
+    worker = camera_registry.default()
+    if worker is None:
+        return jsonify({'status': 'error', 'message': 'Brak zarejestrowanej kamery.'}), 404
+    return live_stream_response(worker)
+
+@app.route('/events')
+def events():
+    """
+    Strumień zdarzeń Server-Sent Events (text/event-stream).
+
+    Zdarzenia: 'camera' (stan kamery i pozostały czas), 'photo' (nowe zdjęcie z opisem detekcji),
+    'detections' (zmiana opisu detekcji). Każde zdarzenie zawiera camera_id.
+    Na start wysyłany jest aktualny stan wszystkich kamer.
+    """
+    if not stream_limiter.acquire():
+        return too_many_streams()
+    initial_events = [('camera', worker.get_camera_state_event()) for worker in camera_registry.all()]
+    stream = stream_limiter.wrap(generate_event_stream(event_bus,
+                                                       initial_events=initial_events,
+                                                       keepalive_interval=SSE_KEEPALIVE_INTERVAL))
+    response = Response(stream_with_context(stream), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/style.css')
 def css():
@@ -404,173 +485,297 @@ def css():
 
 @app.route('/scan-camera', methods=['GET'])
 def scan_camera():
-    """Endpoint do ręcznego skanowania portów USB w poszukiwaniu kamer."""
-    global camera_port
-    print("Rozpoczęto skanowanie kamer przez endpoint /scan-camera...")
-    found_port = scan_usb_for_camera()
+    """Endpoint do ręcznego skanowania portów USB w poszukiwaniu kamer (sprawdzane są nowe i zmienione urządzenia, nowe kamery są rejestrowane)."""
+    logger.info("Rozpoczęto skanowanie kamer przez endpoint /scan-camera...")
+    workers = camera_registry.scan()
     
-    if found_port is not None:
-        camera_port = found_port
-        return jsonify({'status': 'success', 'message': f'Znaleziono i ustawiono kamerę na porcie {camera_port}.', 'camera_port': camera_port})
+    if workers:
+        default_worker = workers[0]
+        return jsonify({'status': 'success',
+                        'message': f'Znaleziono kamery: {", ".join(worker.camera_id for worker in workers)}.',
+                        'camera_port': default_worker.port,
+                        'cameras': [worker.describe() for worker in workers]})
     else:
-        camera_port = None
         return jsonify({'status': 'error', 'message': 'Nie znaleziono żadnej działającej kamery.'}), 404 
 
+@app.route('/cameras', methods=['GET'])
+def list_cameras():
+    """Zwraca listę zarejestrowanych kamer wraz z ich stanem."""
+    return jsonify({'status': 'success', 'cameras': [worker.describe() for worker in camera_registry.all()]})
+
 @app.route('/get-latest-image-info', methods=['GET'])
 def get_latest_image_info():
-    image_filename, _, image_path = get_latest_photo_details()
-    detection_info = "Analiza nie przeprowadzona."
+    """Najnowsze zdjęcie i stan domyślnej kamery."""
+    return jsonify(build_latest_image_info(camera_registry.default()))
+
+@app.route('/cameras/<camera_id>/latest-image-info', methods=['GET'])
+def get_camera_latest_image_info(camera_id):
+    worker, error = get_camera_or_404(camera_id)
+    if error:
+        return error
+    return jsonify(build_latest_image_info(worker))
+
+@app.route('/cameras/<camera_id>/stream')
+def camera_live_stream(camera_id):
+    worker, error = get_camera_or_404(camera_id)
+    if error:
+        return error
+    return live_stream_response(worker)
+
+@app.route('/snapshot')
+def snapshot():
+    """Najnowsza klatka domyślnej kamery jako JPEG."""
+    worker = camera_registry.default()
+    if worker is None:
+        return jsonify({'status': 'error', 'message': 'Brak zarejestrowanej kamery.'}), 404
+    return snapshot_response(worker)
+
+@app.route('/cameras/<camera_id>/snapshot')
+def camera_snapshot(camera_id):
+    worker, error = get_camera_or_404(camera_id)
+    if error:
+        return error
+    return snapshot_response(worker)
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Sprawdzenie, czy proces serwera działa (nie czeka na model ani kamery)."""
+    return jsonify({'status': 'ok'})
+
+def get_ready_status():
+    """Stan gotowości usług. Zwraca (odpowiedź, kod HTTP)."""
+    model_status = model_loader.status()
+    is_ready = model_loader.is_ready() and cameras_scanned
+    response = {
+        'status': 'ready' if is_ready else 'starting',
+        'model': model_status,
+        'database_ready': database_ready,
+        'cameras_scanned': cameras_scanned,
+        'cameras': len(camera_registry.all())
+    }
+    if model_status['state'] == 'failed':
+        response['status'] = 'failed'
+    return response, 200 if is_ready else 503
+
+def collect_metrics():
+    """Ustawia metryki chwilowe (głębokości kolejek, stan kamer i usług) przed eksportem /metrics."""
+    QUEUE_DEPTH.set(inference_scheduler.stats()['queue_depth'], queue='inference', camera='')
+    QUEUE_DEPTH.set(detection_writer.stats()['queue_depth'], queue='db_writer', camera='')
+    for worker in camera_registry.all():
+        pipeline_stats = worker.pipeline.stats()
+        QUEUE_DEPTH.set(pipeline_stats['inference_queue'], queue='capture_inference', camera=worker.camera_id)
+        QUEUE_DEPTH.set(pipeline_stats['persist_queue'], queue='capture_persist', camera=worker.camera_id)
+        camera_active, remaining_time = worker.get_camera_status()
+        CAMERA_ACTIVE.set(int(camera_active), camera=worker.camera_id)
+        CAMERA_REMAINING.set(remaining_time, camera=worker.camera_id)
+        if worker.capture_interval is not None:
+            CAPTURE_INTERVAL.set(worker.capture_interval.interval, camera=worker.camera_id)
+    COMPONENT_UP.set(int(model_loader.is_ready()), component='model')
+    COMPONENT_UP.set(int(database_ready), component='database')
+    COMPONENT_UP.set(int(cameras_scanned), component='cameras_scanned')
+
+REGISTRY.add_collector(collect_metrics)
+
+def get_stats():
+    """Statystyki cache detekcji i miniatur, harmonogramu inferencji, kolejki zapisu do bazy danych, retencji zdjęć, wykrywania kamer oraz potoków kamer."""
+    return {
+        'model': model_loader.status(),
+        'detection_cache': detection_cache.stats(),
+        'thumbnail_cache': thumbnail_cache.stats(),
+        'inference': inference_scheduler.stats(),
+        'db_writer': detection_writer.stats(),
+        'retention': retention_manager.stats(),
+        'camera_discovery': camera_discovery.stats(),
+        'cameras': {worker.camera_id: worker.stats() for worker in camera_registry.all()}
+    }
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Gotowość do obsługi detekcji: model załadowany i rozgrzany, kamery przeskanowane (503, dopóki nie)."""
+    response, code = get_ready_status()
+    return jsonify(response), code
+
+@app.route('/detections', methods=['GET'])
+def detections():
+    """Historia detekcji z filtrami from/to/object/camera i stronicowaniem (parametr cursor)."""
+    return detections_response(db_pool)
+
+@app.route('/detections/counts', methods=['GET'])
+def detection_counts():
+    """Liczby detekcji w przedziałach minute/hour/day zliczone w bazie danych."""
+    return detection_counts_response(db_pool)
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Zwraca statystyki cache detekcji, harmonogramu inferencji, kolejki zapisu do bazy danych oraz potoków kamer."""
+    return jsonify(get_stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Metryki w formacie tekstowym Prometheus: czasy etapów, liczniki klatek i detekcji, kolejki."""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
-    if image_filename and image_path:
-        image_url = url_for('get_camera_image', filename=image_filename, _external=True)
-        detection_info = analyze_image_for_web(image_path)
-        status_message = 'success'
-    elif image_filename:
-        image_url = url_for('get_camera_image', filename=image_filename, _external=True)
-        detection_info = "Brak ścieżki do analizy obrazu."
-        status_message = 'success_no_analysis'
-    else:
-        image_url = None
-        detection_info = "Brak zdjęć."
-        status_message = 'info'
+@app.route('/TurnCameraON', methods=['POST'])
+def turn_camera_on():
+    """Włącza/wyłącza domyślną kamerę. Jeśli żadna kamera nie jest zarejestrowana, bierze ją z wyników wykrywania kamer."""
+    worker = camera_registry.default(scan_if_empty=True)
+    if worker is None:
+        logger.warning("Nie udało się automatycznie znaleźć kamery. Nie można włączyć.")
+        return jsonify({'status': 'error', 'message': 'Nie można włączyć kamery, port nieznany i nie udało się go znaleźć.'}), 500
+    return handle_camera_command(worker, request.get_json())
+
+@app.route('/cameras/<camera_id>/TurnCameraON', methods=['POST'])
+def turn_camera_on_by_id(camera_id):
+    worker, error = get_camera_or_404(camera_id)
+    if error:
+        return error
+    return handle_camera_command(worker, request.get_json())
+
+class CameraOwnerService:
+    """
+    Usługa procesu właściciela kamer i modelu (tryb --owner) dla procesów HTTP z http_worker.py.
+
+    Metody są wywoływane przez IPC i zwracają proste słowniki. Najnowsze klatki każdej kamery
+    są kopiowane do pamięci współdzielonej, skąd procesy HTTP czytają je dla strumienia MJPEG.
+    """
+
+    def __init__(self):
+        self.event_log = EventLog(event_bus)
+        self.event_log.start()
+        self._frame_writers = {}
+        self._lock = threading.Lock()
+
+    def attach_shared_frames(self, worker):
+        """Kopiuje klatki publikowane przez kamerę do jej segmentu pamięci współdzielonej."""
+        with self._lock:
+            if worker.camera_id in self._frame_writers:
+                return
+            writer = SharedFrameWriter(shared_frame_name(worker.camera_id), max_bytes=worker.width * worker.height * 3)
+            self._frame_writers[worker.camera_id] = writer
+        worker.frame_buffer.add_listener(writer.publish)
+
+    def close(self):
+        with self._lock:
+            for writer in self._frame_writers.values():
+                writer.close()
+            self._frame_writers = {}
+
+    def _get_worker(self, camera_id, scan_if_empty=False):
+        if camera_id is None:
+            return camera_registry.default(scan_if_empty=scan_if_empty)
+        return camera_registry.get(camera_id)
+
+    def list_cameras(self):
+        return [worker.describe() for worker in camera_registry.all()]
+
+    def scan_cameras(self):
+        return [worker.describe() for worker in camera_registry.scan()]
+
+    def default_camera_id(self):
+        worker = camera_registry.default()
+        return worker.camera_id if worker is not None else None
+
+    def latest_image_info(self, camera_id=None):
+        """Stan najnowszego zdjęcia kamery (domyślnej przy camera_id=None) lub None dla nieznanej kamery."""
+        worker = self._get_worker(camera_id)
+        if camera_id is not None and worker is None:
+            return None
+        return get_latest_image_state(worker)
 
-    camera_active_status, remaining_time_status = get_camera_status()
+    def camera_command(self, camera_id, data):
+        """Komenda ON/OFF dla kamery. Zwraca (odpowiedź, kod HTTP) lub None, gdy kamery nie ma."""
+        worker = self._get_worker(camera_id, scan_if_empty=camera_id is None)
+        if worker is None:
+            return None
+        return run_camera_command(worker, data)
 
-    return jsonify({
-        'status': status_message, 
-        'image_url': image_url, 
-        'image_filename': image_filename,
-        'detection_info': detection_info,
-        'camera_active': camera_active_status,
-        'remaining_time': remaining_time_status,
-        'message': "Brak zdjęć." if status_message == 'info' else ""
-    })
+    def camera_state_events(self):
+        return [worker.get_camera_state_event() for worker in camera_registry.all()]
 
-@app.route('/TurnCameraON', methods=['POST'])
-def turn_camera_on():
-    global camera_port, global_cap, capture_active, capture_thread, global_capture_end_time, global_capture_active_lock
-    data = request.get_json()
-    status = data.get('Status')
-    
-    with global_capture_active_lock:
-        if status == 'ON':
-            if not camera_port:
-                print("Port kamery nieustawiony. Próba skanowania...")
-                found_port = scan_usb_for_camera()
-                if found_port is not None:
-                    camera_port = found_port
-                    print(f"Automatycznie znaleziono i ustawiono kamerę na porcie {camera_port}.")
-                else:
-                    print("Nie udało się automatycznie znaleźć kamery. Nie można włączyć.")
-                    return jsonify({'status': 'error', 'message': 'Nie można włączyć kamery, port nieznany i nie udało się go znaleźć.'}), 500
-
-            if capture_active:
-                print("Próba włączenia kamery, gdy jest już aktywna. Najpierw wyłącz.")
-                return jsonify({'status': 'info', 'message': 'Kamera jest już włączona.'})
+    def ready_status(self):
+        return get_ready_status()
 
-            try:
-                duration = int(data.get('Time', '30')) 
-                interval = 3
-                
-                # Resetowanie tablicy wykrytych obiektów na początku nowej sesji
-                reset_session_objects()
-                
-                if global_cap is None: 
-                    global_cap = open_camera_with_settings(camera_port)
-                    if global_cap is None:
-                        print(f"Nie udało się otworzyć kamery na porcie {camera_port} przy próbie włączenia.")
-                        return jsonify({'status': 'error', 'message': f'Nie udało się otworzyć kamery na porcie {camera_port}.'}), 500
-                
-                capture_active = True
-                global_capture_end_time = time.time() + duration
-                
-                capture_thread = threading.Thread(target=photo_capture_loop, args=(global_cap, duration, interval))
-                capture_thread.daemon = True
-                capture_thread.start()
-                
-                print(f"Kamera włączona na {duration}s. Przechwytywanie w tle rozpoczęte.")
-                return jsonify({'status': 'success', 'message': f'Kamera włączona na {duration} sekund.'})
-            except ValueError:
-                return jsonify({'status': 'error', 'message': 'Nieprawidłowy format czasu.'}), 400
-            except Exception as e:
-                print(f"Błąd przy włączaniu kamery: {e}")
-                traceback.print_exc()
-                capture_active = False
-                if global_cap:
-                    global_cap.release()
-                    global_cap = None
-                return jsonify({'status': 'error', 'message': f'Wewnętrzny błąd serwera przy włączaniu kamery: {str(e)}'}), 500
-
-        elif status == 'OFF':
-            if not capture_active:
-                print("Próba wyłączenia kamery, gdy nie jest aktywna.")
-                return jsonify({'status': 'info', 'message': 'Kamera jest już wyłączona.'})
-
-            capture_active = False
-            global_capture_end_time = time.time()
-
-            # Sprawdzamy, czy mamy już zapisane dane w bazie (mogło to nastąpić przy automatycznym zakończeniu)
-            auto_ended = False
-            if capture_thread and not capture_thread.is_alive():
-                print("Wykryto, że wątek kamery już się zakończył (prawdopodobnie upłynął czas).")
-                auto_ended = True
-            
-            # Zapisanie wszystkich wykrytych obiektów do bazy danych, tylko jeśli nie zakończyło się automatycznie
-            if not auto_ended:
-                save_session_objects_to_db()
-            else:
-                print("Pomijam zapis do bazy danych, gdyż sesja zakończyła się automatycznie (dane już zapisane)")
+    def stats(self):
+        result = get_stats()
+        with self._lock:
+            result['shared_frames'] = {camera_id: {'frames_written': writer.frames_written,
+                                                   'frames_skipped': writer.frames_skipped}
+                                       for camera_id, writer in self._frame_writers.items()}
+        return result
 
-            if global_cap is not None:
-                print("Zwalnianie kamery po komendzie OFF...")
-                global_cap.release()
-                global_cap = None
-            
-            if capture_thread and capture_thread.is_alive():
-                print("Oczekiwanie na zakończenie wątku przechwytywania...")
-                capture_thread.join(timeout=5.0)
-                if capture_thread.is_alive():
-                    print("Wątek przechwytywania nie zakończył się w oczekiwanym czasie.")
-                else:
-                    print("Wątek przechwytywania zakończony.")
-            capture_thread = None 
-            
-            # Wyświetlenie podsumowania wykrytych obiektów w zakończonej sesji
-            print_detection_summary()
+    def metrics(self):
+        return render_metrics()
 
-            print("Kamera wyłączona.")
-            return jsonify({'status': 'success', 'message': 'Kamera wyłączona.'})
-        else:
-            return jsonify({'status': 'error', 'message': 'Nieprawidłowy status. Użyj "ON" lub "OFF".'}), 400
-
-def print_detection_summary():
-    """Wyświetla podsumowanie wykrytych obiektów w sesji."""
-    with session_objects_lock:
-        if detected_objects_in_session:
-            print("Podsumowanie wykrytych obiektów w sesji:")
-            for obj in detected_objects_in_session:
-                print(f"- {obj['obiekt']}: {obj['procent']}% (czas: {obj['czas']})")
-        else:
-            print("Nie wykryto żadnych obiektów w tej sesji")
+    def events_since(self, last_seq, timeout):
+        return self.event_log.events_since(last_seq, min(timeout, EVENT_POLL_TIMEOUT))
 
-if __name__ == '__main__':
-    print("Uruchamianie serwera, inicjalne skanowanie w poszukiwaniu kamery...")
-    initial_port = scan_usb_for_camera()
-    if initial_port is not None:
-        camera_port = initial_port 
-        print(f"Znaleziono kamerę przy starcie na porcie: {camera_port}")
-    else:
-        camera_port = None
-        print("Nie znaleziono kamery przy starcie serwera.")
-    
-    if not os.path.exists(CAMERA_FOLDER):
-        os.makedirs(CAMERA_FOLDER)
+def run_camera_owner():
+    """
+    Proces właściciela: jedyny proces, który otwiera kamery i ładuje model.
+
+    Procesy HTTP (http_worker.py) łączą się z nim przez IPC (CAMERA_SERVICE_HOST/PORT/AUTHKEY).
+    """
+    # Brak klucza IPC przerywa start, zanim zostaną otwarte kamery i załadowany model
+    address, authkey = load_camera_service_address()
+    service = CameraOwnerService()
+    create_worker = camera_registry.worker_factory
+
+    def create_shared_worker(camera_id, port, folder, camera_config):
+        worker = create_worker(camera_id, port, folder, camera_config)
+        service.attach_shared_frames(worker)
+        return worker
+
+    camera_registry.worker_factory = create_shared_worker
+    for worker in camera_registry.all():
+        service.attach_shared_frames(worker)
+    start_services()
 
-    print(f"Uruchamianie serwera Flask na http://0.0.0.0:8898 ...")
     try:
-        app.run(debug=True, host='0.0.0.0', port=8898)
+        serve_camera_service(service, address, authkey)
+    finally:
+        service.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serwer monitoringu z detekcją ludzi i psów.")
+    parser.add_argument('--production', action='store_true',
+                        help="tryb produkcyjny: bez trybu debug i bez automatycznego przeładowania")
+    # Każda karta panelu w trakcie sesji trzyma dwa wątki (/events i /stream) - wątków powinno być co najmniej
+    # dwa razy więcej niż strumieni (MAX_HTTP_STREAMS, domyślnie połowa wątków), czyli >= 4 x liczba kart
+    parser.add_argument('--threads', type=int, default=None,
+                        help=f"liczba wątków waitress w trybie produkcyjnym (domyślnie HTTP_THREADS lub {DEFAULT_HTTP_THREADS}); "
+                             f"połowa z nich może obsługiwać strumienie SSE/MJPEG (MAX_HTTP_STREAMS)")
+    parser.add_argument('--owner', action='store_true',
+                        help="proces właściciela kamer i modelu dla procesów HTTP z http_worker.py (bez serwera HTTP)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8898)
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    configure_logging()
+    args = parse_args()
+    if args.owner:
+        try:
+            run_camera_owner()
+        finally:
+            shutdown_services()
+        raise SystemExit(0)
+
+    # W trybie debug reloader uruchamia ten moduł ponownie w procesie potomnym (WERKZEUG_RUN_MAIN=true).
+    # Usługi (model, kamery) startują tylko w procesie, który obsługuje zapytania - nie w procesie nadzorującym.
+    if args.production or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_services()
+
+    http_threads, stream_limiter.max_streams = load_http_settings(args.threads)
+    logger.info(f"Uruchamianie serwera Flask na http://{args.host}:{args.port} ...")
+    try:
+        if args.production:
+            try:
+                from waitress import serve
+            except ImportError:
+                app.run(debug=False, use_reloader=False, threaded=True, host=args.host, port=args.port)
+            else:
+                serve(app, host=args.host, port=args.port, threads=http_threads)
+        else:
+            app.run(debug=True, host=args.host, port=args.port)
     finally:
-        # Zamknij połączenie z bazą danych przy zamykaniu serwera
-        if db_conn:
-            db_conn.close()
-            print("Połączenie z bazą danych zostało zamknięte.")
\ No newline at end of file
+        shutdown_services()
@@ -0,0 +1,138 @@
+import time
+import threading
+import numpy as np
+from datetime import datetime
+
+# Jeden rekord detekcji: numer klatki, czas (s od epoki), klasa (indeks nazwy), pewność (%), ramka xyxy (piksele)
+DETECTION_DTYPE = np.dtype([
+    ('frame', '<i8'),
+    ('time', '<f8'),
+    ('class', '<i2'),
+    ('confidence', '<f4'),
+    ('box', '<f4', (4,))
+])
+
+
+class SessionDetections:
+    """
+    Bufor wszystkich detekcji sesji kamery w tablicy numpy (rekordy DETECTION_DTYPE, ok. 40 B na detekcję).
+
+    Każda przeanalizowana klatka dostaje numer, a jej detekcje są dopisywane na koniec tablicy
+    (pojemność rośnie dwukrotnie). take_unflushed() zwraca detekcje jeszcze nieprzekazane do zapisu,
+    więc sesja może być zapisywana na bieżąco, a nie dopiero po jej zakończeniu. Podsumowanie
+    "najwyższa pewność dla każdego obiektu" jest wyliczane z tablicy w summary().
+
+    Klatka może mieć własny numer (np. numer zdjęcia, pod którym została zapisana) - bez niego numery
+    są nadawane kolejno i rosną przez cały czas życia bufora (nie są zerowane przy reset()).
+    """
+
+    def __init__(self, initial_capacity=1024):
+        self._records = np.empty(initial_capacity, dtype=DETECTION_DTYPE)
+        self._count = 0
+        self._flushed = 0
+        self._class_names = []
+        self._class_ids = {}
+        self._next_frame = 1
+        self._frames = 0
+        self._lock = threading.Lock()
+
+    def _class_id(self, name):
+        class_id = self._class_ids.get(name)
+        if class_id is None:
+            class_id = len(self._class_names)
+            self._class_names.append(name)
+            self._class_ids[name] = class_id
+        return class_id
+
+    def _ensure_capacity(self, needed):
+        if needed <= len(self._records):
+            return
+        capacity = len(self._records)
+        while capacity < needed:
+            capacity *= 2
+        records = np.empty(capacity, dtype=DETECTION_DTYPE)
+        records[:self._count] = self._records[:self._count]
+        self._records = records
+
+    def add_frame(self, detections, timestamp=None, frame_id=None):
+        """
+        Dopisuje detekcje jednej przeanalizowanej klatki. Zwraca numer klatki.
+
+        detections: lista krotek (obiekt, procent, (x1, y1, x2, y2)); ramka może być None.
+        timestamp: czas przechwycenia klatki (s od epoki), domyślnie teraz.
+        frame_id: numer klatki (np. numer zdjęcia), domyślnie kolejny numer bufora.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if frame_id is None:
+                frame_id = self._next_frame
+                self._next_frame += 1
+            self._frames += 1
+            self._ensure_capacity(self._count + len(detections))
+            for obiekt, procent, box in detections:
+                record = self._records[self._count]
+                record['frame'] = frame_id
+                record['time'] = timestamp
+                record['class'] = self._class_id(obiekt)
+                record['confidence'] = procent
+                record['box'] = box if box is not None else (np.nan, np.nan, np.nan, np.nan)
+                self._count += 1
+            return frame_id
+
+    def take_unflushed(self):
+        """
+        Zwraca detekcje dodane od ostatniego wywołania jako wiersze
+        (obiekt, procent, czas, klatka, x1, y1, x2, y2) i oznacza je jako przekazane do zapisu.
+        """
+        with self._lock:
+            records = self._records[self._flushed:self._count].copy()
+            self._flushed = self._count
+            names = list(self._class_names)
+        rows = []
+        for record in records:
+            box = [float(value) if not np.isnan(value) else None for value in record['box']]
+            rows.append((names[record['class']], round(float(record['confidence']), 2),
+                         datetime.fromtimestamp(float(record['time'])), int(record['frame']), *box))
+        return rows
+
+    def summary(self):
+        """
+        Najwyższa pewność i czas jej wystąpienia dla każdego obiektu wykrytego w sesji.
+
+        Zwraca listę słowników {'obiekt', 'procent', 'czas'} w kolejności pierwszego wykrycia obiektu.
+        """
+        with self._lock:
+            records = self._records[:self._count]
+            classes = records['class']
+            confidences = records['confidence']
+            class_ids, first_indices = np.unique(classes, return_index=True)
+            result = []
+            for class_id in class_ids[np.argsort(first_indices)]:
+                indices = np.flatnonzero(classes == class_id)
+                best = indices[np.argmax(confidences[indices])]
+                result.append({
+                    'obiekt': self._class_names[class_id],
+                    'procent': round(float(confidences[best]), 2),
+                    'czas': datetime.fromtimestamp(float(records['time'][best]))
+                })
+            return result
+
+    def reset(self):
+        """Czyści detekcje (np. na początku nowej sesji); niezapisane detekcje są tracone."""
+        with self._lock:
+            self._count = 0
+            self._flushed = 0
+            self._frames = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+    def stats(self):
+        with self._lock:
+            return {
+                'frames': self._frames,
+                'detections': self._count,
+                'unflushed': self._count - self._flushed,
+                'buffer_bytes': self._records.nbytes
+            }
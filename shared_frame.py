@@ -0,0 +1,183 @@
+import re
+import time
+import struct
+import threading
+import numpy as np
+import logging
+from multiprocessing import shared_memory, resource_tracker
+from frame_buffer import encode_jpeg
+
+logger = logging.getLogger(__name__)
+
+# Nagłówek segmentu: licznik sekwencji, wysokość, szerokość, liczba kanałów, czas publikacji
+HEADER = struct.Struct('<QIIId')
+HEADER_SIZE = 32
+
+def shared_frame_name(camera_id):
+    """Nazwa segmentu pamięci współdzielonej z najnowszą klatką danej kamery."""
+    return 'iot_frame_' + re.sub(r'[^A-Za-z0-9_]', '_', str(camera_id))
+
+def attach_shared_memory(name):
+    """Otwiera istniejący segment bez rejestrowania go w resource_tracker (segment należy do procesu właściciela)."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 - resource_tracker usunąłby segment przy zakończeniu procesu czytającego
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+
+class SharedFrameWriter:
+    """
+    Zapisuje najnowszą klatkę kamery do segmentu pamięci współdzielonej (proces właściciela kamery).
+
+    Zapis jest chroniony licznikiem sekwencji (seqlock): licznik jest nieparzysty w trakcie zapisu,
+    więc procesy czytające mogą wykryć i powtórzyć odczyt klatki zapisanej tylko częściowo.
+    Segment jest tworzony przy pierwszej klatce, z miejscem na max_bytes bajtów obrazu.
+    """
+
+    def __init__(self, name, max_bytes=0):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._segment = None
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.frames_written = 0
+        self.frames_skipped = 0
+
+    def _create(self, frame_bytes):
+        size = HEADER_SIZE + max(self.max_bytes, frame_bytes)
+        try:
+            segment = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            # Segment pozostawiony przez poprzedni proces właściciela
+            stale = attach_shared_memory(self.name)
+            stale.close()
+            stale.unlink()
+            segment = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        HEADER.pack_into(segment.buf, 0, 0, 0, 0, 0, 0.0)
+        logger.info(f"Utworzono pamięć współdzieloną {self.name} ({size} bajtów)")
+        return segment
+
+    def publish(self, frame):
+        """Kopiuje klatkę do pamięci współdzielonej."""
+        frame = np.ascontiguousarray(frame)
+        with self._lock:
+            if self._segment is None:
+                self._segment = self._create(frame.nbytes)
+            if HEADER_SIZE + frame.nbytes > self._segment.size:
+                self.frames_skipped += 1
+                return
+            height, width = frame.shape[:2]
+            channels = frame.shape[2] if frame.ndim == 3 else 1
+            buf = self._segment.buf
+            HEADER.pack_into(buf, 0, self._seq + 1, height, width, channels, time.time())
+            buf[HEADER_SIZE:HEADER_SIZE + frame.nbytes] = frame.reshape(-1).view(np.uint8)
+            self._seq += 2
+            HEADER.pack_into(buf, 0, self._seq, height, width, channels, time.time())
+            self.frames_written += 1
+
+    def close(self):
+        """Zamyka i usuwa segment pamięci współdzielonej."""
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment.unlink()
+                self._segment = None
+
+
+class SharedFrameReader:
+    """
+    Odczytuje najnowszą klatkę z pamięci współdzielonej (procesy HTTP).
+
+    Ma ten sam interfejs co LatestFrameBuffer (wait_for_frame, latest, get_jpeg), więc działa
+    z generate_mjpeg_stream. Nowe klatki są wykrywane przez odpytywanie licznika sekwencji co
+    poll_interval sekund; zakodowany JPEG jest zapamiętywany dla bieżącej klatki i szerokości.
+
+    Odczyty segmentu odbywają się pod blokadą, więc _detach() (np. po wygaśnięciu strumienia w innym
+    wątku) nie zamyka mapowania w trakcie odczytu klatki.
+    """
+
+    def __init__(self, name, jpeg_quality=80, poll_interval=0.02):
+        self.name = name
+        self.jpeg_quality = jpeg_quality
+        self.poll_interval = poll_interval
+        self._segment = None
+        # RLock - get_jpeg() czyta klatkę przez latest() z już założoną blokadą
+        self._lock = threading.RLock()
+        self._encoded = {}
+        self._encoded_seq = None
+        self.frames_encoded = 0
+
+    def _attach(self):
+        if self._segment is None:
+            try:
+                self._segment = attach_shared_memory(self.name)
+            except FileNotFoundError:
+                return None
+        return self._segment
+
+    def _detach(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def _read_seq(self):
+        with self._lock:
+            segment = self._attach()
+            if segment is None:
+                return 0
+            return HEADER.unpack_from(segment.buf, 0)[0] // 2
+
+    def wait_for_frame(self, last_seq, timeout=None):
+        """Czeka na klatkę nowszą niż last_seq. Zwraca jej numer lub None po upływie timeout."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            seq = self._read_seq()
+            if seq > last_seq:
+                return seq
+            if deadline is not None and time.monotonic() >= deadline:
+                # Właściciel mógł zostać uruchomiony ponownie z nowym segmentem - przy kolejnej próbie otwieramy go od nowa
+                self._detach()
+                return None
+            time.sleep(self.poll_interval)
+
+    def latest(self):
+        """Zwraca (numer, kopia klatki, czas publikacji) najnowszej klatki lub (0, None, None)."""
+        with self._lock:
+            segment = self._attach()
+            if segment is None:
+                return 0, None, None
+            for _ in range(10):
+                seq, height, width, channels, published_at = HEADER.unpack_from(segment.buf, 0)
+                if seq == 0:
+                    return 0, None, None
+                if seq % 2 == 1:
+                    time.sleep(0.001)
+                    continue
+                shape = (height, width, channels) if channels > 1 else (height, width)
+                nbytes = height * width * channels
+                frame = np.frombuffer(segment.buf, dtype=np.uint8, count=nbytes, offset=HEADER_SIZE).reshape(shape).copy()
+                if HEADER.unpack_from(segment.buf, 0)[0] == seq:
+                    return seq // 2, frame, published_at
+            return 0, None, None
+
+    def get_jpeg(self, width=None):
+        """Zwraca (numer klatki, bajty JPEG) najnowszej klatki, opcjonalnie przeskalowanej do szerokości width."""
+        with self._lock:
+            seq = self._read_seq()
+            if seq == self._encoded_seq and width in self._encoded:
+                return seq, self._encoded[width]
+            seq, frame, _ = self.latest()
+            if frame is None:
+                return seq, None
+            data = encode_jpeg(frame, width, self.jpeg_quality)
+            if data is None:
+                return seq, None
+            self.frames_encoded += 1
+            if seq != self._encoded_seq:
+                self._encoded, self._encoded_seq = {}, seq
+            self._encoded[width] = data
+        return seq, data
@@ -0,0 +1,97 @@
+import os
+import threading
+import logging
+from flask import jsonify
+
+logger = logging.getLogger(__name__)
+
+# Domyślna liczba wątków serwera HTTP (waitress) w jednym procesie
+DEFAULT_HTTP_THREADS = 64
+
+
+def load_http_settings(threads=None):
+    """
+    Liczba wątków serwera HTTP i limit jednoczesnych strumieni (SSE /events, MJPEG /stream) w procesie.
+
+    - HTTP_THREADS: liczba wątków (domyślnie DEFAULT_HTTP_THREADS); threads nadpisuje zmienną
+    - MAX_HTTP_STREAMS: limit strumieni (domyślnie połowa wątków)
+
+    Każdy strumień zajmuje wątek na cały czas połączenia, a karta panelu w trakcie sesji otwiera dwa
+    (zdarzenia i obraz na żywo). Limit musi być wyraźnie mniejszy od liczby wątków, żeby zostały wątki
+    dla zwykłych zapytań: wątki >= 2 x limit, limit >= 2 x liczba jednocześnie otwartych kart panelu.
+    """
+    if threads is None:
+        threads = int(os.getenv('HTTP_THREADS', DEFAULT_HTTP_THREADS))
+    max_streams = int(os.getenv('MAX_HTTP_STREAMS', max(1, threads // 2)))
+    if max_streams >= threads:
+        logger.warning(f"MAX_HTTP_STREAMS ({max_streams}) nie jest mniejszy od liczby wątków HTTP ({threads}) - "
+                       f"otwarte strumienie mogą zablokować pozostałe zapytania.")
+    return threads, max_streams
+
+
+class StreamLimiter:
+    """
+    Ogranicza liczbę jednocześnie otwartych długotrwałych odpowiedzi (SSE, MJPEG) w procesie HTTP.
+
+    acquire() nie czeka - gdy limit jest osiągnięty, zapytanie dostaje od razu 503 zamiast zająć
+    kolejny wątek serwera. Miejsce jest zwalniane, gdy serwer zamyka odpowiedź (koniec strumienia
+    lub rozłączenie klienta).
+    """
+
+    def __init__(self, max_streams):
+        self.max_streams = max_streams
+        self._active = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._active >= self.max_streams:
+                self.rejected += 1
+                return False
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+
+    def wrap(self, stream):
+        """Opakowuje strumień zajętym miejscem - zwalnia je przy zamknięciu odpowiedzi."""
+        return _LimitedStream(stream, self.release)
+
+    def stats(self):
+        with self._lock:
+            return {'active': self._active, 'max_streams': self.max_streams, 'rejected': self.rejected}
+
+
+class _LimitedStream:
+    # Klasa zamiast generatora - close() zwalnia miejsce także wtedy, gdy strumień nie został rozpoczęty
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+    def close(self):
+        try:
+            close = getattr(self._stream, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+def too_many_streams():
+    response = jsonify({'status': 'error', 'message': 'Zbyt wiele otwartych strumieni. Spróbuj ponownie za chwilę.'})
+    response.headers['Retry-After'] = '5'
+    return response, 503
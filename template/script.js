@@ -1,16 +1,193 @@
 let imageRefreshInterval = null;
 let autoRefreshActive = false;
+let liveStreamActive = false;
+const LIVE_STREAM_PARAMS = 'fps=5&w=960';
+const PHOTO_PARAMS = 'w=960';
+let currentCameraId = null;
+let eventSource = null;
+let countdownInterval = null;
+let remainingSeconds = 0;
+
+// Adres trasy dla wybranej kamery (bez wybranej kamery - trasy domyślnej kamery)
+function cameraUrl(path, legacyPath) {
+    return currentCameraId ? `/cameras/${encodeURIComponent(currentCameraId)}/${path}` : legacyPath;
+}
+
+// Adres zdjęcia w rozmiarze do podglądu. Każde zdjęcie ma własną nazwę, a serwer wysyła ETag
+// i Cache-Control: immutable, więc przeglądarka może je bezpiecznie trzymać w cache
+function photoUrl(imageUrl) {
+    return imageUrl + (imageUrl.includes('?') ? '&' : '?') + PHOTO_PARAMS;
+}
+
+// Zdarzenia z innych kamer niż wybrana są pomijane
+function isCurrentCameraEvent(data) {
+    return !currentCameraId || !data.camera_id || data.camera_id === currentCameraId;
+}
+
+// Pobiera listę kamer i wypełnia listę wyboru
+function loadCameras() {
+    const select = document.getElementById('camera-select');
+    if (!select) return;
+    currentCameraId = select.dataset.defaultCamera || null;
+    fetch('/cameras')
+        .then(response => response.json())
+        .then(data => {
+            select.innerHTML = '';
+            (data.cameras || []).forEach(camera => {
+                const option = document.createElement('option');
+                option.value = camera.camera_id;
+                option.textContent = `${camera.camera_id} (port ${camera.port})`;
+                select.appendChild(option);
+            });
+            if (currentCameraId) select.value = currentCameraId;
+            else if (select.options.length > 0) currentCameraId = select.value;
+        })
+        .catch(error => console.error('Błąd pobierania listy kamer:', error));
+}
+
+// Zmiana wybranej kamery - widok przełącza się na jej obraz i stan
+function selectCamera(cameraId) {
+    const imgElement = document.getElementById('camera-image');
+    stopLiveStream(imgElement);
+    stopCountdown();
+    if (imageRefreshInterval) {
+        clearInterval(imageRefreshInterval);
+        imageRefreshInterval = null;
+    }
+    autoRefreshActive = false;
+    currentCameraId = cameraId;
+    fetchLatestImage();
+}
+
+// Czy strumień zdarzeń (SSE) jest połączony - wtedy serwer sam wysyła zmiany i nie trzeba odpytywać
+function eventsConnected() {
+    return eventSource !== null && eventSource.readyState === EventSource.OPEN;
+}
+
+// Odpytywanie serwera co 3 s - używane tylko, gdy strumień zdarzeń jest niedostępny
+function schedulePolling() {
+    if (imageRefreshInterval) clearInterval(imageRefreshInterval);
+    imageRefreshInterval = null;
+    if (!eventsConnected()) {
+        imageRefreshInterval = setInterval(fetchLatestImage, 3000);
+    }
+}
+
+// Lokalne odliczanie pozostałego czasu sesji (bez zapytań do serwera)
+function startCountdown(seconds) {
+    const statusInfo = document.getElementById('status-info');
+    remainingSeconds = seconds;
+    if (countdownInterval) clearInterval(countdownInterval);
+    const render = () => {
+        statusInfo.textContent = `Kamera aktywna. Pozostało ok. ${remainingSeconds}s.`;
+        statusInfo.style.color = 'lime';
+    };
+    render();
+    countdownInterval = setInterval(() => {
+        remainingSeconds = Math.max(0, remainingSeconds - 1);
+        render();
+    }, 1000);
+}
+
+function stopCountdown() {
+    if (countdownInterval) {
+        clearInterval(countdownInterval);
+        countdownInterval = null;
+    }
+}
+
+function setDetectionInfo(text) {
+    const detectionInfoElement = document.getElementById('detection-info-text');
+    if (detectionInfoElement) {
+        detectionInfoElement.textContent = text || 'Oczekiwanie na analizę obrazu...';
+    }
+}
+
+// Subskrypcja zdarzeń serwera (Server-Sent Events) zamiast odpytywania co 3 s
+function connectEvents() {
+    if (!window.EventSource) return; // Przeglądarka bez SSE - zostaje odpytywanie
+
+    eventSource = new EventSource('/events');
+
+    eventSource.onopen = function() {
+        // Serwer będzie wysyłał zmiany sam - odpytywanie nie jest potrzebne
+        if (imageRefreshInterval) {
+            clearInterval(imageRefreshInterval);
+            imageRefreshInterval = null;
+        }
+    };
+
+    eventSource.onerror = function() {
+        // EventSource łączy się ponownie automatycznie; do tego czasu odpytujemy, jeśli kamera jest aktywna
+        if (autoRefreshActive && !imageRefreshInterval) {
+            imageRefreshInterval = setInterval(fetchLatestImage, 3000);
+        }
+    };
+
+    eventSource.addEventListener('camera', function(event) {
+        const data = JSON.parse(event.data);
+        if (!isCurrentCameraEvent(data)) return;
+        const toggleButton = document.getElementById('toggle-camera-button');
+        if (data.camera_active) {
+            if (!autoRefreshActive) {
+                startAutoRefresh(data.remaining_time > 0 ? data.remaining_time : 30, false);
+            }
+            toggleButton.textContent = 'Wyłącz kamerę (Auto)';
+            startCountdown(data.remaining_time);
+            showLiveStream(document.getElementById('camera-image'), document.querySelector('.no-image'));
+        } else if (autoRefreshActive) {
+            stopAutoRefresh(false);
+            fetchLatestImage(); // Jednorazowo: ostatnie zdjęcie i status "wyłączona"
+        }
+    });
+
+    eventSource.addEventListener('photo', function(event) {
+        const data = JSON.parse(event.data);
+        if (!isCurrentCameraEvent(data)) return;
+        const imgElement = document.getElementById('camera-image');
+        const noImageDiv = document.querySelector('.no-image');
+        if (!liveStreamActive && imgElement && data.image_url) {
+            imgElement.src = photoUrl(data.image_url);
+            imgElement.style.display = 'block';
+            if (noImageDiv) noImageDiv.style.display = 'none';
+        }
+        setDetectionInfo(data.detection_info);
+    });
+
+    eventSource.addEventListener('detections', function(event) {
+        const data = JSON.parse(event.data);
+        if (!isCurrentCameraEvent(data)) return;
+        setDetectionInfo(data.detection_info);
+    });
+}
+
+// Przełącza obraz na strumień MJPEG na żywo (gdy kamera jest aktywna) - jedno połączenie zamiast pobierania zdjęć
+function showLiveStream(imgElement, noImageDiv) {
+    if (!liveStreamActive) {
+        imgElement.src = cameraUrl('stream', '/stream') + '?' + LIVE_STREAM_PARAMS;
+        liveStreamActive = true;
+    }
+    imgElement.style.display = 'block';
+    if (noImageDiv) noImageDiv.style.display = 'none';
+}
+
+// Zamyka strumień na żywo (zmiana src zamyka połączenie z serwerem)
+function stopLiveStream(imgElement) {
+    if (liveStreamActive) {
+        liveStreamActive = false;
+        if (imgElement) imgElement.removeAttribute('src');
+    }
+}
 
 // Funkcja do pobierania i wyświetlania najnowszego obrazu
 function fetchLatestImage() {
-    fetch('/get-latest-image-info')
+    fetch(cameraUrl('latest-image-info', '/get-latest-image-info'))
         .then(response => response.json())
         .then(data => {
             const imgElement = document.getElementById('camera-image');
             const statusInfo = document.getElementById('status-info');
             const noImageDiv = document.querySelector('.no-image');
             const toggleButton = document.getElementById('toggle-camera-button');
-            const detectionInfoElement = document.getElementById('detection-info-text'); // Dodano
 
             // Aktualizacja stanu przycisku i informacji o statusie na podstawie danych z serwera
             if (data.camera_active) {
@@ -20,8 +197,7 @@ function fetchLatestImage() {
                     startAutoRefresh(durationFromServer, false); 
                 }
                 toggleButton.textContent = 'Wyłącz kamerę (Auto)';
-                statusInfo.textContent = `Kamera aktywna. Pozostało ok. ${data.remaining_time}s.`;
-                statusInfo.style.color = 'lime';
+                startCountdown(data.remaining_time);
             } else {
                 if (autoRefreshActive) { // Jeśli serwer mówi, że kamera jest OFF, a UI myśli, że ON
                     stopAutoRefresh(false); // Zatrzymaj odświeżanie UI bez wysyłania komendy OFF
@@ -31,9 +207,13 @@ function fetchLatestImage() {
                 // statusInfo.style.color = 'orange';
             }
 
-            if (data.status === 'success' && data.image_url) {
+            if (data.camera_active && imgElement) {
+                // Podczas aktywnej sesji obraz pochodzi ze strumienia na żywo
+                showLiveStream(imgElement, noImageDiv);
+            } else if (data.status === 'success' && data.image_url) {
+                stopLiveStream(imgElement);
                 if (imgElement) {
-                    imgElement.src = data.image_url + '?t=' + new Date().getTime(); // Dodaj timestamp, aby uniknąć cache'owania
+                    imgElement.src = photoUrl(data.image_url);
                     imgElement.style.display = 'block';
                 }
                 if (noImageDiv) noImageDiv.style.display = 'none';
@@ -43,6 +223,7 @@ function fetchLatestImage() {
                     statusInfo.style.color = 'orange';
                 }
             } else if (data.status === 'info' && data.message === 'Brak zdjęć.') {
+                stopLiveStream(imgElement);
                 if (imgElement) imgElement.style.display = 'none';
                 if (noImageDiv) {
                     noImageDiv.style.display = 'flex';
@@ -53,6 +234,7 @@ function fetchLatestImage() {
                     statusInfo.style.color = 'grey';
                 }
             } else { // Inne błędy lub statusy, np. success_no_analysis
+                stopLiveStream(imgElement);
                 if (imgElement) imgElement.style.display = 'none';
                 if (noImageDiv) {
                     noImageDiv.style.display = 'flex';
@@ -65,13 +247,7 @@ function fetchLatestImage() {
             }
 
             // Aktualizacja informacji o detekcji
-            if (detectionInfoElement) {
-                if (data.detection_info) {
-                    detectionInfoElement.textContent = data.detection_info;
-                } else {
-                    detectionInfoElement.textContent = 'Oczekiwanie na analizę obrazu...';
-                }
-            }
+            setDetectionInfo(data.detection_info);
 
         })
         .catch(error => {
@@ -103,7 +279,7 @@ function startAutoRefresh(durationSeconds, sendCommandToServer = true) {
     autoRefreshActive = true;
 
     if (sendCommandToServer) {
-        fetch('/TurnCameraON', {
+        fetch(cameraUrl('TurnCameraON', '/TurnCameraON'), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ Status: 'ON', Time: durationSeconds.toString() })
@@ -113,8 +289,7 @@ function startAutoRefresh(durationSeconds, sendCommandToServer = true) {
             if (data.status === 'success') {
                 console.log("Serwer potwierdził włączenie kamery.");
                 fetchLatestImage(); // Pobierz obraz od razu po potwierdzeniu
-                if (imageRefreshInterval) clearInterval(imageRefreshInterval); // Wyczyść stary interwał na wszelki wypadek
-                imageRefreshInterval = setInterval(fetchLatestImage, 3000); // Ustaw nowy interwał
+                schedulePolling(); // Odpytywanie tylko bez strumienia zdarzeń - inaczej serwer sam wyśle zmiany
             } else {
                 console.error("Serwer zwrócił błąd przy włączaniu kamery:", data.message);
                 document.getElementById('status-info').textContent = `Błąd serwera: ${data.message}`;
@@ -133,8 +308,7 @@ function startAutoRefresh(durationSeconds, sendCommandToServer = true) {
     } else {
         // Jeśli nie wysyłamy komendy (bo serwer już jest ON lub odświeżamy UI), tylko uruchamiamy odświeżanie UI
         fetchLatestImage(); // Pobierz obraz i status
-        if (imageRefreshInterval) clearInterval(imageRefreshInterval);
-        imageRefreshInterval = setInterval(fetchLatestImage, 3000); // Ustaw interwał odświeżania UI
+        schedulePolling(); // Odpytywanie tylko bez strumienia zdarzeń
         // Status i przycisk powinny być już ustawione przez fetchLatestImage
     }
 }
@@ -145,10 +319,11 @@ function stopAutoRefresh(userInitiated = true) {
         clearInterval(imageRefreshInterval);
         imageRefreshInterval = null;
     }
+    stopCountdown();
     autoRefreshActive = false;
 
     if (userInitiated) {
-        fetch('/TurnCameraON', {
+        fetch(cameraUrl('TurnCameraON', '/TurnCameraON'), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ Status: 'OFF' })
@@ -199,5 +374,9 @@ function toggleCamera() {
 
 // Ładuj najnowszy obraz przy starcie strony
 document.addEventListener('DOMContentLoaded', function() {
+    loadCameras();
+    const select = document.getElementById('camera-select');
+    if (select) select.addEventListener('change', () => selectCamera(select.value));
     fetchLatestImage();
+    connectEvents();
 });